@@ -0,0 +1,125 @@
+"""
+Verified input actions.
+
+The loop changes game state as soon as it clicks. A click that the game
+swallows would leave the state machine in the wrong state until some cooldown
+recovers it. Each click is therefore submitted with the effect it should have,
+and the next frames are checked for it:
+
+    verifier.submit("skill", perform=lambda: click_random_skill(layout),
+                    check=lambda result: not result.level_up_detected,
+                    on_failure=revert_state)
+    ...
+    verifier.update(result, now)  # once per processed frame
+
+If the effect doesn't show within the deadline, `perform` is called again (it
+draws fresh click noise each time), up to `retries` times. After that the
+action fails and `on_failure` runs, e.g. to put the previous game state back.
+Verification latency is recorded as the `verify_<name>` stage and retries and
+outcomes as counters.
+"""
+
+import threading
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("input.verify")
+
+
+class VerifiedAction:
+    """One submitted action waiting for its effect"""
+    __slots__ = ("name", "perform", "check", "on_success", "on_failure", "deadline", "retries",
+                 "attempts", "submitted_at", "attempted_at")
+
+    def __init__(self, name, perform, check, on_success, on_failure, deadline, retries, now):
+        self.name = name
+        self.perform = perform
+        self.check = check
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.deadline = deadline
+        self.retries = retries
+        self.attempts = 1
+        self.submitted_at = now
+        self.attempted_at = now
+
+
+class ActionVerifier:
+    """Performs actions and checks later frame results for their expected effect"""
+    def __init__(self, clock, deadline=1.5, retries=2):
+        self.clock = clock
+        self.deadline = deadline
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._pending = {}  # name -> VerifiedAction
+        self.stats = {}     # name -> {"verified", "failed", "retries", "latencies"}
+
+    def submit(self, name, perform, check, on_success=None, on_failure=None, deadline=None, retries=None):
+        """
+        Perform an action now and watch for its effect. `check(result)` gets each later
+        FrameResult and returns True once the effect is visible. A pending action with the
+        same name is replaced. Safe to call from the delayed click threads
+        """
+        perform()
+        action = VerifiedAction(name, perform, check, on_success, on_failure,
+                                self.deadline if deadline is None else deadline,
+                                self.retries if retries is None else retries, self.clock.time())
+        with self._lock:
+            self._pending[name] = action
+
+    def pending(self, name):
+        with self._lock:
+            return name in self._pending
+
+    def cancel(self, name):
+        with self._lock:
+            self._pending.pop(name, None)
+
+    def cancel_all(self):
+        with self._lock:
+            self._pending.clear()
+
+    def update(self, result, now):
+        """Check one frame's results against every pending action"""
+        with self._lock:
+            actions = list(self._pending.values())
+        for action in actions:
+            if action.check(result):
+                if self._finish(action, "verified", now) and action.on_success is not None:
+                    action.on_success()
+            elif now - action.attempted_at > action.deadline:
+                if action.attempts <= action.retries:
+                    action.attempts += 1
+                    action.attempted_at = now
+                    metrics.inc("action_retries_total", action=action.name)
+                    self._stats(action.name)["retries"] += 1
+                    log.info("No effect of %s click after %.1fs, retrying (attempt %d of %d)",
+                             action.name, action.deadline, action.attempts, action.retries + 1)
+                    action.perform()
+                elif self._finish(action, "failed", now):
+                    log.warning("%s click had no effect after %d attempts", action.name, action.attempts)
+                    if action.on_failure is not None:
+                        action.on_failure()
+
+    def _finish(self, action, outcome, now):
+        """Record the outcome. Returns False if a newer action with the same name replaced this one"""
+        with self._lock:
+            if self._pending.get(action.name) is not action:
+                return False
+            del self._pending[action.name]
+        metrics.inc("action_verifications_total", action=action.name, outcome=outcome)
+        stats = self._stats(action.name)
+        stats[outcome] += 1
+        if outcome == "verified":
+            latency = now - action.submitted_at
+            stats["latencies"].append(latency)
+            metrics.observe(f"verify_{action.name}", latency)
+            log.debug("%s click verified after %.2fs (%d attempts)", action.name, latency, action.attempts)
+        return True
+
+    def _stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = {"verified": 0, "failed": 0, "retries": 0, "latencies": []}
+        return stats
@@ -0,0 +1,137 @@
+"""
+Asynchronous, rate-limited logging for the capture / detection loop.
+
+Log calls only put a record on a bounded queue; a background listener thread
+does the console and file I/O. Each call site has its own logger under
+"archero." (for example "archero.loop.skills"), so levels can be tuned per
+site, and a disabled level costs a single cached level check:
+
+    log = async_logging.get_logger("loop.skills")
+    log.debug("Skills detected: %s", detected_skills)
+
+Repeated messages from the same call site are rate limited: at most `burst`
+records per `interval` seconds pass, the rest are counted and reported on
+the next record that gets through.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+
+ROOT_LOGGER = "archero"
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(site):
+    """Logger for one call site, e.g. get_logger("loop.state")"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{site}")
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `burst` records per call site through every `interval` seconds"""
+    def __init__(self, burst=3, interval=1.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}  # (logger, template) -> [window_start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = record.created
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring when the queue is full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} similar messages suppressed)"
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level="INFO", levels=None, log_file=None, burst=3, interval=1.0, queue_size=10000):
+    """
+    Route all "archero.*" loggers through a background writer thread.
+    `levels` maps call sites to levels, e.g. {"loop.skills": "DEBUG", "detector": "ERROR"}.
+    Calling it again only updates the levels.
+    """
+    global _listener, _queue_handler
+
+    with _setup_lock:
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level)
+        for site, site_level in (levels or {}).items():
+            get_logger(site).setLevel(site_level)
+
+        if _listener is not None:
+            return
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter("%(message)s"))
+        handlers = [console]
+        if log_file:
+            file_handler = logging.FileHandler(log_file, encoding="utf-8")
+            file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            handlers.append(file_handler)
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = _DroppingQueueHandler(log_queue)
+        _queue_handler.addFilter(RateLimitFilter(burst, interval))
+        root.addHandler(_queue_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def ensure_logging():
+    """Set up logging with defaults unless it was already configured"""
+    if _listener is None:
+        setup_logging()
+
+
+def shutdown_logging():
+    """Flush pending records and stop the writer thread"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+        if _queue_handler.dropped:
+            print(f"Logging queue overflowed, dropped {_queue_handler.dropped} messages")
+        _listener = None
+        _queue_handler = None
@@ -0,0 +1,423 @@
+"""
+Automatic calibration from a single screenshot.
+
+Instead of hovering over eight points, capture the BlueStacks window while the
+home screen (with the start button) is showing. Optionally add a level-up screen
+and a carousel screen. The calibrator then:
+  1. strips the window chrome (title bar, side bar, letterbox bars) to find the game area
+  2. places every region from a reference layout (region positions as fractions of
+     the game area) and refines it where the screenshot allows:
+       - start / carousel buttons by the start button detector's gold mask, or by
+         template matching against a saved start button crop
+       - the skill card area from the three bright cards on a level-up screen
+     The energy bar is only placed when the reference layout has one (--reference).
+  3. writes the same positions.json schema as calibration_tool.py
+
+Results are cached per window resolution, so later instances with the same
+window size calibrate without any image analysis. The start button crop is saved
+as a template for other resolutions.
+
+    python autocalibration.py                       # capture the live BlueStacks window
+    python autocalibration.py --home home.png --levelup levelup.png --origin 0,0
+    python autocalibration.py --reference positions_manual.json --output positions.json
+"""
+
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+from layout import CalibrationLayout, Rect
+from start_button_detector import StartButtonDetector
+from async_logging import get_logger, setup_logging
+
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = "calibration_cache.json"
+DEFAULT_TEMPLATE_PATH = "start_button_template.png"
+
+# Region positions as (x, y, w, h) fractions of the game area, for a 9:16 portrait layout.
+# A rough starting point only; pass a manual calibration with --reference for better fallbacks.
+DEFAULT_REFERENCE = {
+    "aspect": 9 / 16,
+    "start": (0.30, 0.80, 0.40, 0.07),
+    "carousel": (0.30, 0.70, 0.40, 0.07),
+    "skill_area": (0.05, 0.35, 0.90, 0.30),
+}
+
+CHROME_TOLERANCE = 12        # Max per-channel difference from the edge color for a chrome pixel
+CHROME_FRACTION = 0.75       # A row / column is chrome if this share of its pixels match the edge color
+CHROME_MAX_BRIGHTNESS = 70   # Only dark edges (emulator chrome, letterbox bars) are stripped
+SEARCH_MARGIN = 0.5          # Search band around a reference region, as a fraction of its size
+BUTTON_FILL = 0.85           # Detected button area / calibrated region area (detector accepts 0.7-0.99)
+MIN_SIZE_RATIO = 0.3         # Detected region must be within this factor of the reference size...
+MAX_SIZE_RATIO = 3.0         # ...and at most this factor
+TEMPLATE_THRESHOLD = 0.7
+TEMPLATE_SCALES = np.linspace(0.5, 2.0, 16)
+
+log = get_logger("autocalibration")
+
+
+def reference_from_layout(layout):
+    """Reference layout (fractions of the game area) from an existing calibration"""
+    width, height = layout.size
+
+    def fractions(rect):
+        return (rect.x / width, rect.y / height, rect.w / width, rect.h / height)
+
+    reference = {
+        "aspect": width / height,
+        "start": fractions(layout.start),
+        "carousel": fractions(layout.carousel),
+        "skill_area": fractions(layout.skill_area),
+    }
+    if layout.energy is not None:
+        reference["energy"] = fractions(layout.energy)
+    return reference
+
+
+def _scaled(fractions, width, height):
+    x, y, w, h = fractions
+    return Rect(round(x * width), round(y * height), round(w * width), round(h * height))
+
+
+def _expanded(rect, margin, width, height):
+    """Rect grown by `margin` times its size on every side, clipped to width x height"""
+    dx = int(rect.w * margin)
+    dy = int(rect.h * margin)
+    return Rect(rect.x - dx, rect.y - dy, rect.w + 2 * dx, rect.h + 2 * dy).clip(width, height)
+
+
+def _strip(line_at, start, stop, step):
+    """Advance from `start` towards `stop` while lines match the dark color of the outermost one"""
+    edge_color = np.median(line_at(start), axis=0)
+    if edge_color.max() > CHROME_MAX_BRIGHTNESS:
+        return start
+    while start != stop:
+        line = line_at(start)
+        if np.mean(np.max(np.abs(line - edge_color), axis=-1) <= CHROME_TOLERANCE) < CHROME_FRACTION:
+            break
+        start += step
+    return start
+
+
+def find_game_area(screenshot):
+    """
+    Strip dark uniform bars (title bar, side bar, letterbox) from each edge of a window screenshot.
+    Returns the game area as a Rect in screenshot coordinates
+    """
+    image = screenshot.astype(np.int16)
+    height, width = image.shape[:2]
+    top, bottom, left, right = 0, height, 0, width
+
+    # Bars can be stacked (e.g. title bar above a letterbox bar), so repeat until nothing changes
+    while True:
+        bounds = (top, bottom, left, right)
+        top = _strip(lambda y: image[y, left:right], top, bottom - 1, 1)
+        bottom = _strip(lambda y: image[y, left:right], bottom - 1, top, -1) + 1
+        left = _strip(lambda x: image[top:bottom, x], left, right - 1, 1)
+        right = _strip(lambda x: image[top:bottom, x], right - 1, left, -1) + 1
+        if (top, bottom, left, right) == bounds:
+            break
+
+    return Rect(left, top, right - left, bottom - top)
+
+
+def _plausible(found, expected):
+    ratio = (found.w * found.h) / max(1, expected.w * expected.h)
+    return MIN_SIZE_RATIO <= ratio <= MAX_SIZE_RATIO
+
+
+def _pad_button(button, width, height):
+    """Grow a tight button box so the button fills BUTTON_FILL of the region, as the detector expects"""
+    scale = (1.0 / BUTTON_FILL) ** 0.5
+    pad_x = int(round(button.w * (scale - 1) / 2))
+    pad_y = int(round(button.h * (scale - 1) / 2))
+    return Rect(button.x - pad_x, button.y - pad_y, button.w + 2 * pad_x, button.h + 2 * pad_y).clip(width, height)
+
+
+def locate_button_by_color(game, expected):
+    """Largest gold blob (start button detector color ranges) near the expected region, or None"""
+    height, width = game.shape[:2]
+    detector = StartButtonDetector()
+    found = expected
+
+    # The first pass may cut the button off at the edge of the search band, so search again around it
+    for _ in range(2):
+        band = _expanded(found, SEARCH_MARGIN, width, height)
+        if band.w == 0 or band.h == 0:
+            return None
+        hsv = cv2.cvtColor(game[band.slices], cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, detector.lower_orange, detector.upper_orange)
+        mask = cv2.bitwise_or(mask, cv2.inRange(hsv, detector.lower_yellow, detector.upper_yellow))
+        mask = cv2.bitwise_or(mask, cv2.inRange(hsv, detector.lower_gold, detector.upper_gold))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        found = Rect(band.x + x, band.y + y, w, h)
+    return found if _plausible(found, expected) else None
+
+
+def locate_button_by_template(game, expected, template):
+    """Best multi-scale template match near the expected region, or None"""
+    height, width = game.shape[:2]
+    # The whole button has to fit inside the band to match, so search a wider band than the color search
+    band = _expanded(expected, 2 * SEARCH_MARGIN, width, height)
+    search = cv2.cvtColor(game[band.slices], cv2.COLOR_BGR2GRAY)
+    gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) if template.ndim == 3 else template
+
+    best = None
+    # Scale the template so its width matches the expected region, then search around that scale
+    base = expected.w / gray_template.shape[1]
+    for scale in TEMPLATE_SCALES * base:
+        w = int(round(gray_template.shape[1] * scale))
+        h = int(round(gray_template.shape[0] * scale))
+        if w < 8 or h < 8 or w > search.shape[1] or h > search.shape[0]:
+            continue
+        scaled = cv2.resize(gray_template, (w, h), interpolation=cv2.INTER_AREA)
+        result = cv2.matchTemplate(search, scaled, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(result)
+        if best is None or score > best[0]:
+            best = (score, Rect(band.x + location[0], band.y + location[1], w, h))
+
+    if best is None or best[0] < TEMPLATE_THRESHOLD or not _plausible(best[1], expected):
+        return None
+    return best[1]
+
+
+def locate_skill_area(game, expected):
+    """Bounding box of the three skill cards on a level-up screen, or None"""
+    height, width = game.shape[:2]
+    band = _expanded(expected, SEARCH_MARGIN / 2, width, height)
+    hsv = cv2.cvtColor(game[band.slices], cv2.COLOR_BGR2HSV)
+    # Cards are saturated and bright on top of the dimmed level-up background
+    mask = cv2.inRange(hsv, (0, 80, 80), (180, 255, 255))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = sorted((cv2.boundingRect(contour) for contour in contours), key=lambda b: b[2] * b[3], reverse=True)[:3]
+    if len(boxes) < 3:
+        return None
+
+    # The three cards sit side by side with similar sizes
+    centers_y = [y + h / 2 for _, y, _, h in boxes]
+    areas = [w * h for _, _, w, h in boxes]
+    if max(centers_y) - min(centers_y) > min(h for _, _, _, h in boxes) / 2 or min(areas) < max(areas) / 2:
+        return None
+
+    x1 = min(x for x, _, _, _ in boxes)
+    y1 = min(y for _, y, _, _ in boxes)
+    x2 = max(x + w for x, _, w, _ in boxes)
+    y2 = max(y + h for _, y, _, h in boxes)
+    found = Rect(band.x + x1, band.y + y1, x2 - x1, y2 - y1)
+    return found if _plausible(found, expected) else None
+
+
+def auto_calibrate(home, levelup=None, carousel=None, origin=(0, 0), reference=None, template=None):
+    """
+    Calibrate from window screenshots.
+    `home` shows the home screen with the start button; `levelup` (skill cards) and
+    `carousel` (carousel start button) are optional. `origin` is the absolute screen
+    position of the screenshots' top-left corner.
+    Returns (CalibrationLayout, {region: "detected" | "template" | "reference"})
+    """
+    reference = reference or DEFAULT_REFERENCE
+
+    area = find_game_area(home)
+    aspect = area.w / area.h
+    if abs(aspect - reference["aspect"]) > 0.05 * reference["aspect"]:
+        log.warning("Game area %s has aspect %.3f, reference layout expects %.3f", area, aspect, reference["aspect"])
+    game = home[area.slices]
+    width, height = area.w, area.h
+    sources = {}
+
+    # Start button: gold mask (what the detector itself looks for), then template match, then reference position
+    # (the template is a crop of a calibrated region, so a match is used as is rather than padded)
+    expected = _scaled(reference["start"], width, height)
+    start = expected
+    sources["start"] = "reference"
+    button = locate_button_by_color(game, expected)
+    if button is not None:
+        start = _pad_button(button, width, height)
+        sources["start"] = "detected"
+    elif template is not None:
+        button = locate_button_by_template(game, expected, template)
+        if button is not None:
+            start = button
+            sources["start"] = "template"
+
+    # Carousel button: same search on a carousel screenshot, otherwise from the reference
+    expected = _scaled(reference["carousel"], width, height)
+    carousel_region = expected
+    sources["carousel"] = "reference"
+    if carousel is not None:
+        carousel_game = carousel[area.slices]
+        button = locate_button_by_color(carousel_game, expected)
+        if button is not None:
+            carousel_region = _pad_button(button, width, height)
+            sources["carousel"] = "detected"
+        elif template is not None:
+            button = locate_button_by_template(carousel_game, expected, template)
+            if button is not None:
+                carousel_region = button
+                sources["carousel"] = "template"
+
+    # Skill cards from a level-up screenshot, otherwise from the reference
+    expected = _scaled(reference["skill_area"], width, height)
+    skill_area = locate_skill_area(levelup[area.slices], expected) if levelup is not None else None
+    sources["skill_area"] = "detected" if skill_area is not None else "reference"
+    if skill_area is None:
+        skill_area = expected
+
+    # Energy bar: only from a reference that has one; a guessed region would misread the bar and hold up every run
+    energy = None
+    if "energy" in reference:
+        energy = _scaled(reference["energy"], width, height)
+        sources["energy"] = "reference"
+
+    layout = CalibrationLayout((origin[0] + area.x, origin[1] + area.y), (width, height),
+                               start, carousel_region, skill_area, energy)
+    return layout, sources
+
+
+class CalibrationCache:
+    """
+    Calibrations keyed by window resolution, stored relative to the window's top-left corner.
+    Each entry records which optional inputs (reference, levelup, carousel) it was built from,
+    and is only reused when no other inputs are given
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data.get("entries", {})
+
+    @staticmethod
+    def key(window_size):
+        return f"{window_size[0]}x{window_size[1]}"
+
+    def get(self, window_size, window_origin, inputs=()):
+        """Layout for a window of this size at this screen position, or None"""
+        entry = self.entries.get(self.key(window_size))
+        if entry is None or not set(inputs) <= set(entry.get("inputs", [])):
+            return None
+        layout = CalibrationLayout.from_dict(entry["layout"])
+        return CalibrationLayout(layout.to_screen(window_origin), layout.size, layout.start, layout.carousel,
+                                 layout.skill_area, layout.energy)
+
+    def put(self, window_size, window_origin, layout, sources=None, inputs=()):
+        offset = (layout.origin[0] - window_origin[0], layout.origin[1] - window_origin[1])
+        relative = CalibrationLayout(offset, layout.size, layout.start, layout.carousel,
+                                     layout.skill_area, layout.energy)
+        self.entries[self.key(window_size)] = {"layout": relative.to_dict(), "sources": sources or {},
+                                               "inputs": sorted(inputs), "created": time.time()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+def save_template(home, layout, origin, path=DEFAULT_TEMPLATE_PATH):
+    """Save the calibrated start button crop as a template for other resolutions"""
+    offset = (layout.origin[0] - origin[0], layout.origin[1] - origin[1])
+    start = layout.start
+    crop = home[offset[1] + start.y:offset[1] + start.y2, offset[0] + start.x:offset[0] + start.x2]
+    cv2.imwrite(path, crop)
+
+
+def write_positions(layout, path="positions.json"):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(layout.to_positions(), f, indent=4)
+
+
+def _read_image(path):
+    if path is None:
+        return None
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise Exception(f"Could not read image {path}")
+    return image
+
+
+def runAutoCalibration(output="positions.json", home_path=None, levelup_path=None, carousel_path=None,
+                       origin=None, reference_path=None, cache_path=DEFAULT_CACHE_PATH,
+                       template_path=DEFAULT_TEMPLATE_PATH, use_cache=True):
+    """Calibrate from screenshot files or a live capture of the BlueStacks window and write positions.json"""
+    cache = CalibrationCache(cache_path) if cache_path else None
+    # A cached calibration built from fewer screenshots than given now would hide what they add
+    inputs = [name for name, path in (("reference", reference_path), ("levelup", levelup_path),
+                                      ("carousel", carousel_path)) if path is not None]
+
+    if home_path is not None:
+        home = _read_image(home_path)
+        origin = origin or (0, 0)
+    else:
+        # Capture the whole window (no ROI) of the live emulator
+        from window_capture import BlueStacksCapture
+        capture = BlueStacksCapture()
+        window = capture.find_bluestacks_window()
+        origin = (window.left, window.top)
+        if cache is not None and use_cache:
+            layout = cache.get((window.width, window.height), origin, inputs)
+            if layout is not None:
+                write_positions(layout, output)
+                print(f"Using cached calibration for {window.width}x{window.height}, saved to {output}")
+                return layout
+        home = capture.capture_frame()
+        if home is None:
+            raise Exception("Could not capture the BlueStacks window")
+    window_size = (home.shape[1], home.shape[0])
+
+    if cache is not None and use_cache and home_path is not None:
+        layout = cache.get(window_size, origin, inputs)
+        if layout is not None:
+            write_positions(layout, output)
+            print(f"Using cached calibration for {window_size[0]}x{window_size[1]}, saved to {output}")
+            return layout
+
+    reference = None
+    if reference_path is not None:
+        from layout import load_layout
+        reference = reference_from_layout(load_layout(reference_path))
+    template = _read_image(template_path) if template_path and os.path.exists(template_path) else None
+
+    layout, sources = auto_calibrate(home, _read_image(levelup_path), _read_image(carousel_path),
+                                     origin, reference, template)
+    write_positions(layout, output)
+    if cache is not None:
+        cache.put(window_size, origin, layout, sources, inputs)
+    if template_path and sources["start"] == "detected":
+        save_template(home, layout, origin, template_path)
+
+    print(f"Game area: {layout.size[0]}x{layout.size[1]} at {layout.top_left}")
+    for region, source in sources.items():
+        print(f"  {region}: {source}")
+    print(f"Calibration saved to {output}")
+    return layout
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate positions.json from a single screenshot")
+    parser.add_argument("--home", default=None, help="Home screen screenshot (default: capture the live window)")
+    parser.add_argument("--levelup", default=None, help="Optional level-up screenshot to locate the skill cards")
+    parser.add_argument("--carousel", default=None, help="Optional carousel screenshot to locate its start button")
+    parser.add_argument("--origin", default=None, help="Screen position X,Y of the screenshots' top-left corner")
+    parser.add_argument("--reference", default=None, help="Existing positions.json / layout used as reference layout")
+    parser.add_argument("--output", default="positions.json")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Per-resolution cache file ('' to disable)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE_PATH, help="Start button template image")
+    parser.add_argument("--no-cache", action="store_true", help="Recalibrate even if the resolution is cached")
+    args = parser.parse_args()
+    setup_logging()
+
+    origin = tuple(int(value) for value in args.origin.split(",")) if args.origin else None
+    runAutoCalibration(args.output, args.home, args.levelup, args.carousel, origin, args.reference,
+                       args.cache or None, args.template or None, not args.no_cache)
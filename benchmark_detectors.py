@@ -0,0 +1,227 @@
+"""
+Micro-benchmarks of the per-frame hot functions, with allocation budgets.
+
+Times each function per call and measures the peak bytes it allocates per call
+(tracemalloc), on synthetic frames (see synthetic_frames.py) at several
+resolutions of a reference layout:
+
+    BlueStacksCapture.capture_frame        against a stand-in grabber, no screen involved
+    StartButtonDetector.detect_start_button
+    StartButtonDetector.get_detection_masks
+    StartButtonDetector._get_gold_pixel_ratio
+    StartButtonDetector.detect_with_template_matching
+    analyze_skill_color_with_area
+    analyze_energy_level
+    create_skill_regions
+    process_frame_for_skills
+
+The first run stores the results as the baseline. Later runs compare against it
+and exit with status 1 when a function got slower than --time-tolerance or
+allocates more than --alloc-tolerance beyond its baseline. Re-record the
+baseline with --update-baseline after an intended change or on new hardware.
+
+Usage:
+    python benchmark_detectors.py                       # compare with benchmark_detectors_baseline.json
+    python benchmark_detectors.py --scales 0.5 1 2 --update-baseline
+"""
+
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+
+# Game area of a 540x960 portrait BlueStacks window, in positions.json format
+REFERENCE_POSITIONS = {
+    "top-left": [0, 0], "bottom-right": [540, 960],
+    "start-tl": [135, 800], "start-br": [405, 880],
+    "carousel-tl": [135, 135], "carousel-br": [405, 200],
+    "skill-area-tl": [27, 320], "skill-area-br": [513, 560],
+    "energy-tl": [160, 24], "energy-br": [380, 56],
+}
+BASELINE_FILE = "benchmark_detectors_baseline.json"
+# Changes this small never count as a regression: timer noise on the tiniest functions, small Python objects
+TIME_SLACK_US = 5.0
+ALLOC_SLACK_BYTES = 4096
+
+
+class StaticGrabber:
+    """Stand-in for an mss instance: grab() returns the same BGRA pixels for any monitor"""
+    def __init__(self, frame):
+        import cv2
+        self.pixels = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+
+    def grab(self, monitor):
+        return self.pixels[:monitor["height"], :monitor["width"]]
+
+
+def build_cases(layout, generator):
+    """name -> zero-argument callable running one call of a hot function on frames for `layout`"""
+    from replay_capture import ReplayWindow
+    from skillSelection import (analyze_energy_level, analyze_skill_color_with_area, create_skill_regions,
+                                process_frame_for_skills)
+    from start_button_detector import StartButtonDetector
+    from window_capture import BlueStacksCapture
+
+    home, truth = generator.render("home")
+    cards, _ = generator.render("skill_cards", colors=("gold", "blue", "purple"))
+
+    capture = BlueStacksCapture(grabber=StaticGrabber(home))
+    capture.window = ReplayWindow(*layout.size)
+    capture.roi_coordinates = {"left": 0, "top": 0, "width": layout.size[0], "height": layout.size[1]}
+
+    detector = StartButtonDetector(debug_name="benchmark", region=layout.start)
+    start_roi = home[layout.start.slices]
+    x, y, w, h = truth["main_start_button"]
+    template = home[y:y + h, x:x + w].copy()
+    card_roi = cards[layout.cards[0].slices]
+    positions = {"skill_regions": [card.bbox for card in layout.cards]}
+    skill_area = layout.skill_area
+
+    return {
+        "capture_frame": capture.capture_frame,
+        "detect_start_button": lambda: detector.detect_start_button(home),
+        "get_detection_masks": lambda: detector.get_detection_masks(home),
+        "_get_gold_pixel_ratio": lambda: detector._get_gold_pixel_ratio(start_roi),
+        "detect_with_template_matching": lambda: detector.detect_with_template_matching(home, template),
+        "analyze_skill_color_with_area": lambda: analyze_skill_color_with_area(card_roi),
+        "analyze_energy_level": lambda: analyze_energy_level(home, layout.energy),
+        "create_skill_regions": lambda: create_skill_regions(skill_area.tl, skill_area.br, (0, 0)),
+        "process_frame_for_skills": lambda: process_frame_for_skills(cards, positions),
+    }
+
+
+def batch_size(func, min_batch_time=0.01):
+    """Calls per timing batch so that one batch takes at least `min_batch_time`"""
+    func()
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        if time.perf_counter() - started >= min_batch_time:
+            return calls
+        calls *= 2
+
+
+def seconds_per_call(cases, rounds=15):
+    """
+    Time per call of every case. Batches of all cases take turns for `rounds` rounds so a burst of
+    load on the machine can't hit all batches of one case, and like timeit the fastest batch is kept
+    """
+    sizes = {name: batch_size(func) for name, func in cases.items()}
+    best = {name: float("inf") for name in cases}
+    for _ in range(rounds):
+        for name, func in cases.items():
+            calls = sizes[name]
+            started = time.perf_counter()
+            for _ in range(calls):
+                func()
+            best[name] = min(best[name], (time.perf_counter() - started) / calls)
+    return best
+
+
+def bytes_per_call(func, calls=5):
+    """Largest peak of traced allocations over `calls` calls, above what was allocated before each call"""
+    func()
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return int(max(peaks))
+
+
+def run_suite(layout, scales, names=None):
+    """{"<function>@<scale>": {"us_per_call", "bytes_per_call"}} for every case and scale"""
+    from synthetic_frames import SyntheticFrameGenerator
+    results = {}
+    for scale in scales:
+        scaled = layout.scaled(scale) if scale != 1 else layout
+        cases = {name: func for name, func in build_cases(scaled, SyntheticFrameGenerator(scaled)).items()
+                 if not names or name in names}
+        timings = seconds_per_call(cases)
+        for name, func in cases.items():
+            results[f"{name}@{scale:g}"] = {
+                "frame": list(scaled.size),
+                "us_per_call": timings[name] * 1e6,
+                "bytes_per_call": bytes_per_call(func),
+            }
+    return results
+
+
+def compare(results, baseline, time_tolerance, alloc_tolerance):
+    """Regression messages of `results` against `baseline`"""
+    regressions = []
+    for key, entry in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if entry["us_per_call"] > base["us_per_call"] * (1 + time_tolerance) + TIME_SLACK_US:
+            regressions.append(f"{key}: {entry['us_per_call']:.1f}us per call, baseline {base['us_per_call']:.1f}us")
+        if entry["bytes_per_call"] > base["bytes_per_call"] * (1 + alloc_tolerance) + ALLOC_SLACK_BYTES:
+            regressions.append(f"{key}: {entry['bytes_per_call']} bytes per call, baseline {base['bytes_per_call']}")
+    return regressions
+
+
+def main():
+    from layout import as_layout, load_layout
+
+    parser = argparse.ArgumentParser(description="Hot-function micro-benchmarks with time and allocation budgets")
+    parser.add_argument("--positions", default=None, help="Layout to benchmark (default: a 540x960 reference)")
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.5, 1.0, 2.0],
+                        help="Frame sizes relative to the layout")
+    parser.add_argument("--only", nargs="+", default=None, help="Benchmark only these functions")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Stored results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.3, help="Allowed slowdown (0.3 = 30%%)")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1, help="Allowed extra allocation (0.1 = 10%%)")
+    parser.add_argument("--output", default="benchmark_detectors.json", help="Where to write this run's results")
+    args = parser.parse_args()
+
+    layout = load_layout(args.positions) if args.positions else as_layout(REFERENCE_POSITIONS)
+    results = run_suite(layout, args.scales, args.only)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "results": results}, f, indent=4)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    print("\n=== Detector micro-benchmarks ===")
+    for key, entry in results.items():
+        line = f"{key:<40} {entry['us_per_call']:>10.1f}us {entry['bytes_per_call']:>10} B"
+        if baseline is not None and key in baseline:
+            base = baseline[key]
+            line += (f"   ({entry['us_per_call'] / base['us_per_call'] - 1:+.0%} time, "
+                     f"{entry['bytes_per_call'] - base['bytes_per_call']:+d} B)")
+        print(line)
+    print(f"Results written to {args.output}")
+
+    if baseline is None:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": time.time(), "results": results}, f, indent=4)
+        print(f"Baseline stored in {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.time_tolerance, args.alloc_tolerance)
+    if regressions:
+        print("Regressions against the baseline:")
+        for message in regressions:
+            print("  " + message)
+        raise SystemExit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
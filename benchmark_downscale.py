@@ -0,0 +1,165 @@
+"""
+Accuracy parity and throughput of downscaled analysis.
+
+Runs the per-frame detection work of the skill selection loop (brightness, both
+start button detectors, skill card classification) on every frame of recorded
+sessions at full resolution and at each --scales factor, with boxes mapped back
+to full resolution. It reports how often each scale agrees with full resolution
+and how long a frame takes at each scale, and exits with status 1 when any
+agreement rate is below --min-agreement. Skill colours are only compared on
+frames labelled "skill_cards", the only frames the loop classifies cards on.
+A scale that is slower than a larger one is reported as a timing regression.
+
+Usage:
+    python benchmark_downscale.py recordings/session1 --positions positions.json --scales 0.5 0.25
+"""
+
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+
+from layout import load_layout, downscale, iou, scale_bbox
+from replay_capture import load_session
+from start_button_detector import StartButtonDetector
+from skillSelection import classify_skill_regions, map_skill_results
+from benchmark_reaction import percentile_summary
+
+
+# Brightness bands of BrightnessLevelUpDetector (levelup_detectors.py)
+BRIGHTNESS_BANDS = (("normal", 120, 140), ("skill", 75, 95))
+LEVELUP_LABEL = "skill_cards"
+
+
+def brightness_band(brightness):
+    for name, low, high in BRIGHTNESS_BANDS:
+        if low <= brightness <= high:
+            return name
+    return "other"
+
+
+def analyze_frames(frames, layout, scale):
+    """Run the per-frame detection work at one scale. Returns (outputs, seconds_per_frame)"""
+    analysis_layout = layout.scaled(scale) if scale != 1 else layout
+    to_full = 1.0 / scale
+    start_detector = StartButtonDetector(debug_name="start_button", region=analysis_layout.start)
+    carousel_detector = StartButtonDetector(debug_name="carousel_button", region=analysis_layout.carousel)
+
+    outputs = []
+    durations = []
+    for frame in frames:
+        started = time.perf_counter()
+        analysis_frame = downscale(frame, scale)
+        brightness = float(np.mean(cv2.cvtColor(analysis_frame, cv2.COLOR_BGR2GRAY)))
+        start = scale_bbox(start_detector.detect_start_button(analysis_frame), to_full)
+        carousel = scale_bbox(carousel_detector.detect_start_button(analysis_frame), to_full)
+        skills = map_skill_results(classify_skill_regions(analysis_frame, analysis_layout.cards), layout, scale)
+        durations.append(time.perf_counter() - started)
+        outputs.append({"brightness": brightness, "start": start, "carousel": carousel,
+                        "colors": [skill['color'] for skill in skills]})
+    return outputs, durations
+
+
+def compare(reference, outputs, labels):
+    """
+    Agreement of one scale's outputs with the full-resolution outputs. Skill colours
+    are compared on level-up frames only; elsewhere the loop never classifies cards
+    """
+    totals = {"start": 0, "carousel": 0, "skill_colors": 0, "brightness_band": 0}
+    agreement = dict.fromkeys(totals, 0)
+    ious = []
+    brightness_diff = []
+    for ref, out, label in zip(reference, outputs, labels):
+        keys = ["start", "carousel", "brightness_band"] + (["skill_colors"] if label == LEVELUP_LABEL else [])
+        for key in keys:
+            totals[key] += 1
+        for key in ("start", "carousel"):
+            if (ref[key] is None) == (out[key] is None):
+                agreement[key] += 1
+                if ref[key] is not None:
+                    ious.append(iou(ref[key], out[key]))
+        if label == LEVELUP_LABEL:
+            agreement["skill_colors"] += ref["colors"] == out["colors"]
+        agreement["brightness_band"] += brightness_band(ref["brightness"]) == brightness_band(out["brightness"])
+        brightness_diff.append(abs(ref["brightness"] - out["brightness"]))
+    return {
+        "agreement": {key: count / totals[key] for key, count in agreement.items() if totals[key]},
+        "levelup_frames": totals["skill_colors"],
+        "button_iou_mean": float(np.mean(ious)) if ious else None,
+        "button_iou_min": float(np.min(ious)) if ious else None,
+        "brightness_abs_diff_max": float(np.max(brightness_diff)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downscaled analysis parity and throughput")
+    parser.add_argument("sessions", nargs="+", help="Recorded session directories")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recordings")
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.5, 0.25], help="Analysis scales to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the frames for timing")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Fail below this agreement rate")
+    parser.add_argument("--output", default="downscale_benchmark.json", help="Where to write the results")
+    args = parser.parse_args()
+
+    layout = load_layout(args.positions)
+    frames = []
+    labels = []
+    for session_dir in args.sessions:
+        for _, label, frame in load_session(session_dir):
+            frames.append(frame)
+            labels.append(label)
+    print(f"Loaded {len(frames)} frames")
+
+    report = {"timestamp": time.time(), "frames": len(frames), "scales": {}}
+    reference = None
+    failed = False
+    for scale in [1.0] + [scale for scale in args.scales if scale != 1]:
+        durations = []
+        for _ in range(args.repeat):
+            outputs, pass_durations = analyze_frames(frames, layout, scale)
+            durations.extend(pass_durations)
+        timing = percentile_summary(durations)
+        entry = {"ms_per_frame": {key: value * 1000 for key, value in timing.items() if key != "count"},
+                 "frames_per_second": 1.0 / timing["mean"]}
+        if reference is None:
+            reference = outputs
+        else:
+            entry.update(compare(reference, outputs, labels))
+            failed = failed or min(entry["agreement"].values()) < args.min_agreement
+        report["scales"][str(scale)] = entry
+
+    # A smaller scale should never cost more per frame than a larger one
+    regressions = []
+    by_scale = sorted(((float(scale), entry) for scale, entry in report["scales"].items()), reverse=True)
+    for (larger, larger_entry), (smaller, smaller_entry) in zip(by_scale, by_scale[1:]):
+        if smaller_entry["ms_per_frame"]["p50"] > larger_entry["ms_per_frame"]["p50"]:
+            smaller_entry["slower_than"] = larger
+            regressions.append((smaller, larger))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    full_rate = report["scales"]["1.0"]["frames_per_second"]
+    print("\n=== Downscaled analysis ===")
+    for scale, entry in report["scales"].items():
+        line = (f"scale {scale}: p50={entry['ms_per_frame']['p50']:.2f}ms/frame "
+                f"({entry['frames_per_second'] / full_rate:.2f}x full resolution throughput)")
+        if "agreement" in entry:
+            agreement = ", ".join(f"{key}={value:.1%}" for key, value in entry["agreement"].items())
+            iou_mean = entry["button_iou_mean"]
+            line += f"\n    agreement: {agreement}"
+            line += f"\n    button IoU mean: {iou_mean:.3f}" if iou_mean is not None else "\n    button IoU mean: n/a"
+            line += f", brightness max diff: {entry['brightness_abs_diff_max']:.2f}"
+        print(line)
+    for smaller, larger in regressions:
+        print(f"Timing regression: scale {smaller} is slower per frame than scale {larger}; don't use it on this machine")
+    print(f"Results written to {args.output}")
+
+    if failed:
+        print(f"Parity below {args.min_agreement:.0%} at some scale")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Detection latency and false positives of the level-up detectors on recorded sessions.
+
+Feeds every frame of each session, in order, to each level-up method (see
+levelup_detectors.py), with the start button detectors running alongside as in
+the skill selection loop. A level up is every run of frames labelled
+"skill_cards". For each method it reports:
+
+    latency_frames   frames from the first level-up frame to the "started" event
+                     (0 = fired on the first level-up frame)
+    missed           level ups that never fired
+    end_lag_frames   frames from the end of a level up to the "ended" event
+    false_positives  "started" events outside any level up, also per 1000
+                     non-level-up frames
+
+Usage:
+    python benchmark_levelup.py recordings/session1 recordings/session2 --positions positions.json
+"""
+
+import argparse
+import json
+import time
+
+from layout import load_layout, downscale
+from levelup_detectors import LEVELUP_METHODS, create_levelup_detector
+from replay_capture import load_session
+from start_button_detector import StartButtonDetector
+from benchmark_reaction import percentile_summary
+
+
+LEVELUP_LABEL = "skill_cards"
+
+
+def detect_events(frames, layout, method, scale=1.0):
+    """Run one level-up method over (t, label, frame) entries. Returns (events, seconds_per_frame)"""
+    analysis_layout = layout.scaled(scale) if scale != 1 else layout
+    detector = create_levelup_detector(method, analysis_layout)
+    start_detector = StartButtonDetector(debug_name="start_button", region=analysis_layout.start)
+    carousel_detector = StartButtonDetector(debug_name="carousel_button", region=analysis_layout.carousel)
+
+    events = []
+    durations = []
+    for _, _, frame in frames:
+        analysis_frame = downscale(frame, scale)
+        any_start_button_detected = (start_detector.detect_start_button(analysis_frame) is not None
+                                     or carousel_detector.detect_start_button(analysis_frame) is not None)
+        started = time.perf_counter()
+        event = detector.update(detector.features(analysis_frame), any_start_button_detected)
+        durations.append(time.perf_counter() - started)
+        events.append(event)
+    return events, durations
+
+
+def level_up_episodes(labels):
+    """(first, end) frame indices of every run of level-up frames, end exclusive"""
+    episodes = []
+    first = None
+    for i, label in enumerate(labels + [None]):
+        if label == LEVELUP_LABEL and first is None:
+            first = i
+        elif label != LEVELUP_LABEL and first is not None:
+            episodes.append((first, i))
+            first = None
+    return episodes
+
+
+def score(labels, events):
+    """Latency, misses, end lag and false positives of one event sequence against the labels"""
+    episodes = level_up_episodes(labels)
+    latencies, end_lags = [], []
+    missed = 0
+    in_episode = [False] * len(labels)
+    for first, end in episodes:
+        for i in range(first, end):
+            in_episode[i] = True
+        fired = next((i for i in range(first, end) if events[i] == "started"), None)
+        if fired is None:
+            missed += 1
+            continue
+        latencies.append(fired - first)
+        ended = next((i for i in range(end, len(events)) if events[i] == "ended"), None)
+        if ended is not None:
+            end_lags.append(ended - end)
+
+    false_positives = sum(1 for i, event in enumerate(events) if event == "started" and not in_episode[i])
+    other_frames = in_episode.count(False)
+    return {
+        "level_ups": len(episodes),
+        "latency_frames": latencies,
+        "missed": missed,
+        "end_lag_frames": end_lags,
+        "false_positives": false_positives,
+        "other_frames": other_frames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Level-up detector latency and false positives")
+    parser.add_argument("sessions", nargs="+", help="Recorded session directories with labels")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recordings")
+    parser.add_argument("--methods", nargs="+", choices=LEVELUP_METHODS, default=list(LEVELUP_METHODS),
+                        help="Level-up methods to compare")
+    parser.add_argument("--analysis-scale", type=float, default=1.0, help="Detection resolution (1, 0.5 or 0.25)")
+    parser.add_argument("--output", default="levelup_benchmark.json", help="Where to write the results")
+    args = parser.parse_args()
+
+    layout = load_layout(args.positions)
+    sessions = [(session_dir, load_session(session_dir)) for session_dir in args.sessions]
+
+    report = {"timestamp": time.time(), "analysis_scale": args.analysis_scale, "methods": {}}
+    for method in args.methods:
+        totals = {"level_ups": 0, "latency_frames": [], "missed": 0, "end_lag_frames": [], "false_positives": 0,
+                  "other_frames": 0}
+        durations = []
+        for _, frames in sessions:
+            events, session_durations = detect_events(frames, layout, method, args.analysis_scale)
+            durations.extend(session_durations)
+            result = score([label for _, label, _ in frames], events)
+            for key, value in result.items():
+                totals[key] += value
+        other = totals["other_frames"]
+        report["methods"][method] = {
+            "level_ups": totals["level_ups"],
+            "missed": totals["missed"],
+            "latency_frames": percentile_summary(totals["latency_frames"]),
+            "end_lag_frames": percentile_summary(totals["end_lag_frames"]),
+            "false_positives": totals["false_positives"],
+            "false_positives_per_1000_frames": 1000.0 * totals["false_positives"] / other if other else None,
+            "ms_per_frame": {key: value * 1000 for key, value in percentile_summary(durations).items()
+                             if key != "count"},
+        }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    print("\n=== Level-up detection ===")
+    for method, entry in report["methods"].items():
+        latency = entry["latency_frames"]
+        line = f"{method}: {entry['level_ups'] - entry['missed']}/{entry['level_ups']} level ups detected"
+        if latency is not None:
+            line += f", latency p50={latency['p50']:.0f} max={latency['max']:.0f} frames"
+        rate = entry["false_positives_per_1000_frames"]
+        line += f", false positives={entry['false_positives']}"
+        if rate is not None:
+            line += f" ({rate:.2f} per 1000 frames)"
+        line += f", {entry['ms_per_frame']['p50']:.3f}ms/frame"
+        print(line)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
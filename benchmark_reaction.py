@@ -0,0 +1,242 @@
+"""
+End-to-end reaction latency benchmark.
+
+Feeds recorded sessions (see replay_capture.py for the format) through the real
+skillSelection loop with the capture and input replaced by local stand-ins, then
+measures:
+  - level_up: first frame showing skill cards -> click_random_skill fires
+  - results:  first frame of the results screen -> WAITING_FOR_START auto-click
+  - CPU time the decision loop (including its detector threads) spends per processed frame
+
+Sessions run on a simulated clock by default, so an hour of recording replays in
+seconds with the same decisions as a live run. Timing constants can be swept with
+--timing, e.g. --timing skill_selection_delay=1.0.
+
+Usage:
+    python benchmark_reaction.py recordings/session1 recordings/session2 --output reaction.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+import numpy as np
+
+from clock import SystemClock, VirtualClock
+from replay_capture import ReplayCapture, RecordingInput, click_targets
+from frame_results import ResultPublisher
+from layout import as_layout
+from skillSelection import skillSelection, DEFAULT_TIMING
+from async_logging import setup_logging
+
+
+# Which label starts which transition, and which kind of click (RecordingInput action) reacts to it
+TRANSITIONS = {
+    "skill_cards": ("level_up", "skill"),
+    "results": ("results", "start"),
+}
+CLICK_JITTER = 4 * 25  # Clicks get N(0, 25px) noise around their target; 4 std devs past the target still counts
+
+
+def percentile_summary(values):
+    """p50/p95/p99/mean/max of a list of values, or None if empty"""
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(arr.size),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "mean": float(arr.mean()),
+        "max": float(arr.max()),
+    }
+
+
+def _is_reaction(click, action, targets):
+    """True for a click of kind `action` on one of the `targets`, within the click jitter"""
+    _, x, y, click_action = click
+    return click_action == action and any(
+        rect.x - CLICK_JITTER <= x <= rect.x2 + CLICK_JITTER and rect.y - CLICK_JITTER <= y <= rect.y2 + CLICK_JITTER
+        for rect in targets)
+
+
+def measure_latencies(published, clicks, positions):
+    """
+    Pair every transition onset with the first click after it of the reacting kind on
+    its target (a skill click on a card, a start click on the Start button).
+    Returns ({transition: [latency_s, ...]}, {transition: missed_count})
+    """
+    targets = click_targets(as_layout(positions))
+    latencies = {name: [] for name, _ in TRANSITIONS.values()}
+    missed = {name: 0 for name, _ in TRANSITIONS.values()}
+
+    onsets = []
+    previous_label = None
+    for _, label, publish_time in published:
+        if label != previous_label and label in TRANSITIONS:
+            onsets.append((publish_time, label))
+        previous_label = label
+
+    for i, (onset_time, label) in enumerate(onsets):
+        name, action = TRANSITIONS[label]
+        next_onset = onsets[i + 1][0] if i + 1 < len(onsets) else float("inf")
+        reaction = next((click for click in clicks
+                         if onset_time <= click[0] < next_onset and _is_reaction(click, action, targets[action])),
+                        None)
+        if reaction is None:
+            missed[name] += 1
+        else:
+            latencies[name].append(reaction[0] - onset_time)
+
+    return latencies, missed
+
+
+def run_session(session_dir, positions, tail=5.0, seed=None, realtime=False, timing=None, analysis_scale=1.0,
+                detector_workers=None, levelup_method="brightness"):
+    """Replay one session through skillSelection and collect raw measurements"""
+    if seed is not None:
+        np.random.seed(seed)
+
+    # The virtual clock must be created on the thread that runs the loop
+    clock = SystemClock() if realtime else VirtualClock()
+    capture = ReplayCapture.from_directory(session_dir, clock=clock)
+    recorder = RecordingInput(clock=clock, layout=as_layout(positions))
+    publisher = ResultPublisher()
+    stop_flag = {'stop': False}
+
+    # CPU time of the decision loop between consecutive published frames
+    cpu_per_frame = []
+    last_cpu = [None]
+
+    def on_result(result):
+        now = time.process_time()
+        if last_cpu[0] is not None:
+            cpu_per_frame.append(now - last_cpu[0])
+        last_cpu[0] = now
+        # Stop once the last frame has been on screen for `tail` seconds
+        if result.timestamp - capture.start_time > capture.duration + tail:
+            stop_flag['stop'] = True
+
+    publisher.subscribe(on_result)
+
+    wall_start = time.time()
+    loop_cpu_start = time.process_time()
+    skillSelection(positions, stop_flag, publisher=publisher, capture=capture,
+                   input_device=recorder, show_debug=False, clock=clock, headless=True, timing=timing,
+                   analysis_scale=analysis_scale, detector_workers=detector_workers, levelup_method=levelup_method)
+    loop_cpu = time.process_time() - loop_cpu_start
+    wall_time = time.time() - wall_start
+
+    latencies, missed = measure_latencies(capture.published, recorder.clicks, positions)
+    return {
+        "session": session_dir,
+        "frames_replayed": len(capture.published),
+        "frames_processed": len(cpu_per_frame) + (1 if last_cpu[0] is not None else 0),
+        "loop_cpu_s": loop_cpu,
+        "wall_time_s": wall_time,
+        "session_duration_s": capture.duration,
+        "cpu_per_frame": cpu_per_frame,
+        "latencies": latencies,
+        "missed": missed,
+        "clicks": len(recorder.clicks),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Level-up / results reaction latency benchmark")
+    parser.add_argument("sessions", nargs="+", help="Recorded session directories")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recordings")
+    parser.add_argument("--output", default="reaction_benchmark.json", help="Where to write the results")
+    parser.add_argument("--build", default=None, help="Build label stored with the results (defaults to git revision)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for click noise and delays")
+    parser.add_argument("--tail", type=float, default=5.0, help="Seconds to keep running after the last frame")
+    parser.add_argument("--realtime", action="store_true", help="Replay in real time instead of on a simulated clock")
+    parser.add_argument("--timing", action="append", default=[], metavar="NAME=SECONDS",
+                        help="Override a timing constant from skillSelection.DEFAULT_TIMING (repeatable)")
+    parser.add_argument("--analysis-scale", type=float, default=1.0, help="Detection resolution (1, 0.5 or 0.25)")
+    parser.add_argument("--detector-workers", type=int, default=None,
+                        help="Detector thread pool size (default: one per core, at most 4; 1 runs inline)")
+    parser.add_argument("--levelup-method", choices=["brightness", "motion"], default="brightness",
+                        help="Level-up detector used by the replayed loop")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the replayed loop")
+    args = parser.parse_args()
+    setup_logging(args.log_level.upper())
+
+    timing = {}
+    for override in args.timing:
+        name, _, value = override.partition("=")
+        if name not in DEFAULT_TIMING:
+            parser.error(f"Unknown timing constant '{name}'")
+        timing[name] = float(value)
+
+    with open(args.positions, "r") as f:
+        positions = json.load(f)
+
+    all_latencies = {name: [] for name, _ in TRANSITIONS.values()}
+    all_missed = {name: 0 for name, _ in TRANSITIONS.values()}
+    all_cpu = []
+    sessions = []
+
+    for session_dir in args.sessions:
+        print(f"Replaying {session_dir}...")
+        run = run_session(session_dir, positions, tail=args.tail, seed=args.seed,
+                          realtime=args.realtime, timing=timing, analysis_scale=args.analysis_scale,
+                          detector_workers=args.detector_workers, levelup_method=args.levelup_method)
+        for name in all_latencies:
+            all_latencies[name].extend(run["latencies"][name])
+            all_missed[name] += run["missed"][name]
+        all_cpu.extend(run["cpu_per_frame"])
+        sessions.append({
+            "session": os.path.basename(os.path.normpath(session_dir)),
+            "frames_replayed": run["frames_replayed"],
+            "frames_processed": run["frames_processed"],
+            "loop_cpu_s": run["loop_cpu_s"],
+            "wall_time_s": run["wall_time_s"],
+            "session_duration_s": run["session_duration_s"],
+            "clicks": run["clicks"],
+            "missed": run["missed"],
+        })
+
+    report = {
+        "build": args.build or _git_revision(),
+        "timestamp": time.time(),
+        "seed": args.seed,
+        "clock": "realtime" if args.realtime else "virtual",
+        "timing": dict(DEFAULT_TIMING, **timing),
+        "analysis_scale": args.analysis_scale,
+        "detector_workers": args.detector_workers,
+        "levelup_method": args.levelup_method,
+        "sessions": sessions,
+        "latency_s": {name: percentile_summary(values) for name, values in all_latencies.items()},
+        "missed": all_missed,
+        "cpu_per_frame_s": percentile_summary(all_cpu),
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    print("\n=== Reaction latency ===")
+    for name, summary in report["latency_s"].items():
+        if summary is None:
+            print(f"{name}: no transitions measured (missed: {all_missed[name]})")
+        else:
+            print(f"{name}: n={summary['count']} p50={summary['p50']:.3f}s p95={summary['p95']:.3f}s "
+                  f"p99={summary['p99']:.3f}s (missed: {all_missed[name]})")
+    cpu = report["cpu_per_frame_s"]
+    if cpu is not None:
+        print(f"CPU per frame: p50={cpu['p50'] * 1000:.2f}ms p95={cpu['p95'] * 1000:.2f}ms p99={cpu['p99'] * 1000:.2f}ms")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Startup benchmark.
+
+Every measurement runs in a fresh interpreter, the way a restarted instance does:
+  - import time of each entry module, and which heavy modules it pulled in
+  - time from process launch to the first processed frame, feeding a recorded
+    session (see replay_capture.py) through skillSelection with a real clock
+
+Decoding the recorded frames is a cost a live instance doesn't have, so it is
+timed separately and left out of the startup figure. Exits with status 1 when
+the p95 startup time is over --budget.
+
+Usage:
+    python benchmark_startup.py recordings/session1 --positions positions.json --runs 10
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+IMPORT_TARGETS = ("main", "skillSelection", "window_capture", "replay_capture")
+HEAVY_MODULES = ("cv2", "numpy", "mss", "pygetwindow", "pyautogui", "keyboard", "yaml")
+
+IMPORT_SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "heavy": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure_import(module):
+    """Import one module in a fresh interpreter. Returns {'import_s', 'heavy'}"""
+    snippet = IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, "-c", snippet])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def run_child(session_dir, positions_path):
+    """Child process: import the loop, replay a session and stop at the first processed frame"""
+    import_start = time.perf_counter()
+    from clock import SystemClock
+    from replay_capture import ReplayCapture, RecordingInput
+    from frame_results import ResultPublisher
+    from skillSelection import skillSelection
+    from async_logging import setup_logging
+    import_s = time.perf_counter() - import_start
+
+    setup_logging("WARNING")
+    with open(positions_path, "r") as f:
+        positions = json.load(f)
+
+    load_start = time.perf_counter()
+    clock = SystemClock()
+    capture = ReplayCapture.from_directory(session_dir, clock=clock)
+    session_load_s = time.perf_counter() - load_start
+    publisher = ResultPublisher()
+    stop_flag = {'stop': False}
+    first_frame = {}
+
+    def on_result(result):
+        if result.frame is not None and not first_frame:
+            first_frame["wall"] = time.time()
+            first_frame["loop_s"] = time.perf_counter() - loop_start
+            stop_flag['stop'] = True
+
+    publisher.subscribe(on_result)
+    loop_start = time.perf_counter()
+    skillSelection(positions, stop_flag, publisher=publisher, capture=capture,
+                   input_device=RecordingInput(clock=clock), show_debug=False, clock=clock, headless=True)
+
+    print(json.dumps({"import_s": import_s, "session_load_s": session_load_s, "first_frame_wall": first_frame.get("wall"),
+                      "loop_to_first_frame_s": first_frame.get("loop_s")}))
+
+
+def measure_first_frame(session_dir, positions_path):
+    """Launch a child process and time it from launch to its first processed frame"""
+    launch = time.time()
+    output = subprocess.check_output([sys.executable, __file__, session_dir, "--positions", positions_path, "--child"])
+    child = json.loads(output.decode().strip().splitlines()[-1])
+    if child["first_frame_wall"] is None:
+        return None
+    launch_to_first_frame = child["first_frame_wall"] - launch
+    return {
+        "startup_s": launch_to_first_frame - child["session_load_s"],
+        "launch_to_first_frame_s": launch_to_first_frame,
+        "import_s": child["import_s"],
+        "session_load_s": child["session_load_s"],
+        "loop_to_first_frame_s": child["loop_to_first_frame_s"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-frame benchmark")
+    parser.add_argument("session", help="Recorded session directory to replay")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recording")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--budget", type=float, default=1.0, help="Allowed p95 startup time in seconds")
+    parser.add_argument("--output", default="startup_benchmark.json", help="Where to write the results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.session, args.positions)
+        return
+
+    # Imported here so the child processes only load what the loop itself needs
+    from benchmark_reaction import percentile_summary
+
+    imports = {}
+    for module in IMPORT_TARGETS:
+        samples = [measure_import(module) for _ in range(args.runs)]
+        imports[module] = {
+            "import_s": percentile_summary([sample["import_s"] for sample in samples]),
+            "heavy_modules": samples[-1]["heavy"],
+        }
+
+    runs = [measure_first_frame(args.session, args.positions) for _ in range(args.runs)]
+    missed = sum(1 for run in runs if run is None)
+    runs = [run for run in runs if run is not None]
+    first_frame = {key: percentile_summary([run[key] for run in runs])
+                   for key in ("startup_s", "launch_to_first_frame_s", "import_s", "session_load_s",
+                               "loop_to_first_frame_s")}
+
+    report = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "imports": imports,
+        "first_frame": first_frame,
+        "missed": missed,
+        "budget_s": args.budget,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    print("=== Import time (fresh interpreter) ===")
+    for module, entry in imports.items():
+        heavy = ", ".join(entry["heavy_modules"]) or "none"
+        print(f"{module}: p50={entry['import_s']['p50'] * 1000:.1f}ms  heavy modules: {heavy}")
+
+    print("\n=== Time to first processed frame ===")
+    startup = first_frame["startup_s"]
+    if startup is None:
+        print("No run reached a processed frame")
+        sys.exit(1)
+    print(f"startup (launch -> first frame, excluding session load): "
+          f"p50={startup['p50']:.3f}s p95={startup['p95']:.3f}s max={startup['max']:.3f}s")
+    print(f"  imports: p50={first_frame['import_s']['p50']:.3f}s  "
+          f"loop start -> first frame: p50={first_frame['loop_to_first_frame_s']['p50']:.3f}s  "
+          f"(session load: p50={first_frame['session_load_s']['p50']:.3f}s)")
+    print(f"Results written to {args.output}")
+
+    if startup["p95"] > args.budget:
+        print(f"Over budget: p95 {startup['p95']:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
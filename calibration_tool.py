@@ -10,7 +10,9 @@ def runCalibration():
     print("Move mouse and press SPACE to save position")
     print("Press ESC to finish\n")
 
-    possiblePos = ["top-left", "bottom-right", "start-tl", "start-br", "skill-area-tl", "skill-area-br", "carousel-tl", "carousel-br"]
+    possiblePos = ["top-left", "bottom-right", "start-tl", "start-br", "skill-area-tl", "skill-area-br", "carousel-tl", "carousel-br",
+                   "energy-tl", "energy-br"]
+    requiredPos = 8  # The energy bar is optional; without it runs aren't gated on energy
     index = 0
 
     space_was_down = False
@@ -25,6 +27,8 @@ def runCalibration():
     print("     6. Skill Area Bottom Right")
     print("     7. Carousel Top Left")
     print("     8. Carousel Bottom Right")
+    print("     9. Energy Bar Top Left (optional, on the home screen)")
+    print("    10. Energy Bar Bottom Right (optional)")
 
     while True:
         # ESC quits immediately
@@ -40,7 +44,10 @@ def runCalibration():
                 positions[possiblePos[index]] = [x, y]
                 print(f"Saved {possiblePos[index]}: x={x}, y={y}")
                 index += 1
-                if len(positions) == len(possiblePos):
+                if len(positions) == requiredPos:
+                    print("\nRequired positions calibrated.")
+                    print("     Press ESC to finish without the energy bar, or save its two corners.")
+                elif len(positions) == len(possiblePos):
                     print("\nAll positions calibrated.")
                     print("     Press ESC to finish calibration.")
                     print("     Press space to restart the calibration process.")
@@ -52,9 +59,12 @@ def runCalibration():
         space_was_down = space_down
         time.sleep(0.05)  # prevents CPU burn
 
-    if len(positions) < len(possiblePos):
+    if len(positions) < requiredPos:
         print("Calibration incomplete. Exiting without saving.")
         exit()
+    if len(positions) == requiredPos + 1:
+        print("Only one energy bar corner saved, leaving the energy bar out.")
+        del positions["energy-tl"]
 
     with open("positions.json", "w", encoding="utf-8") as f:
         json.dump(positions, f, indent=4)
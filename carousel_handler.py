@@ -0,0 +1,84 @@
+"""
+Feedback-driven carousel clicking.
+
+The carousel Start button is clicked with a random 0.8-1.2s pause between
+clicks, but only while it is still on screen. The loop feeds the handler every
+frame's detections, and the handler stops as soon as the carousel has resolved:
+
+    carousel = CarouselHandler(click, timing)
+    carousel.start(now)
+    ...
+    outcome = carousel.update(carousel_button, main_button, level_up, now)
+    if outcome is not None:  # "button_gone", "result", "max_clicks"
+        ...
+
+The carousel counts as resolved when its button has been missing for a few
+frames in a row, or when a result shows up, either the level-up cards or the
+main Start button of the results screen.
+"""
+
+import numpy as np
+import metrics
+from async_logging import get_logger
+
+
+log_carousel = get_logger("loop.carousel")
+
+
+class CarouselHandler:
+    """Clicks the carousel button until it goes away or a result is shown"""
+    def __init__(self, click, timing, max_clicks=6, gone_frames=2):
+        """
+        `click(button_bbox)` clicks the carousel button once with fresh noise. `timing` provides
+        carousel_gap_min / carousel_gap_max. Gives up after `max_clicks` clicks; the button counts
+        as gone after `gone_frames` frames without a detection
+        """
+        self.click = click
+        self.timing = timing
+        self.max_clicks = max_clicks
+        self.gone_frames = gone_frames
+        self.active = False
+
+    def start(self, now):
+        self.active = True
+        self.started_at = now
+        self.clicks = 0
+        self.next_click_at = now
+        self.missing_frames = 0
+        log_carousel.info("Carousel handler started")
+
+    def cancel(self):
+        self.active = False
+
+    def update(self, carousel_button, main_button, level_up, now):
+        """Feed one frame's detections. Returns why the carousel ended, or None while it continues"""
+        if not self.active:
+            return None
+
+        if level_up or main_button is not None:
+            return self._finish("result", now)
+        if carousel_button is None:
+            self.missing_frames += 1
+            if self.missing_frames >= self.gone_frames:
+                return self._finish("button_gone", now)
+        else:
+            self.missing_frames = 0
+
+        if now >= self.next_click_at:
+            if self.clicks >= self.max_clicks:
+                return self._finish("max_clicks", now)
+            if carousel_button is not None:
+                self.click(carousel_button)
+                self.clicks += 1
+                log_carousel.info("Carousel click %d completed", self.clicks)
+                self.next_click_at = now + np.random.uniform(self.timing["carousel_gap_min"],
+                                                             self.timing["carousel_gap_max"])
+        return None
+
+    def _finish(self, reason, now):
+        self.active = False
+        duration = now - self.started_at
+        log_carousel.info("Carousel ended (%s) after %d clicks in %.1fs", reason, self.clicks, duration)
+        metrics.observe("carousel", duration)
+        metrics.inc("carousels_total", outcome=reason)
+        return reason
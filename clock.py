@@ -0,0 +1,157 @@
+"""
+Clock abstraction used by the capture, detection, state and input code.
+
+SystemClock is the real wall clock. VirtualClock is a simulated clock that
+jumps straight to the next wake-up time whenever every thread it manages is
+sleeping, so recorded sessions replay as fast as the CPU allows while every
+decision sees exactly the same timestamps it would have seen live.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class SystemClock:
+    """Real time: thin wrapper around the time module"""
+    simulated = False
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def start_thread(self, target, args=()):
+        """Start a daemon thread running target(*args)"""
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def join(self, thread, timeout=None):
+        thread.join(timeout)
+
+
+class VirtualClock:
+    """
+    Simulated time for faster-than-real-time replays.
+
+    Exactly one managed thread runs at a time: the thread that created the
+    clock plus every thread started with start_thread(). When the running
+    thread sleeps, the clock hands control to the next thread in wake-up
+    order and advances time to its wake-up instantly. Threads are always
+    resumed in the same order, so a replay with the same random seed makes
+    the same decisions every time.
+
+    Managed threads must only block through this clock (sleep/join), never on
+    other threads for long, or the simulation will stall.
+    """
+    # Start far from zero like a real epoch timestamp, so code that uses 0 as
+    # "never happened" behaves exactly as it does on the system clock
+    DEFAULT_START_TIME = 1_000_000_000.0
+    simulated = True
+
+    def __init__(self, start_time=DEFAULT_START_TIME):
+        self._now = float(start_time)
+        self._cond = threading.Condition()
+        self._running = 1           # The creating thread is running
+        self._sleepers = []         # Heap of (wake_time, token)
+        self._waiters = []          # [(token, predicate)] for join()
+        self._released = set()
+        self._finished = set()
+        self._tokens = itertools.count()
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        with self._cond:
+            token = next(self._tokens)
+            heapq.heappush(self._sleepers, (self._now + max(0.0, seconds), token))
+            self._block(token)
+
+    def start_thread(self, target, args=()):
+        """Start a managed daemon thread; it first runs when the caller next sleeps"""
+        with self._cond:
+            token = next(self._tokens)
+            heapq.heappush(self._sleepers, (self._now, token))
+
+        def run():
+            with self._cond:
+                self._wait_released(token)
+            try:
+                target(*args)
+            finally:
+                with self._cond:
+                    self._finished.add(token)
+                    self._running -= 1
+                    self._schedule()
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.clock_token = token
+        thread.start()
+        return thread
+
+    def join(self, thread, timeout=None):
+        """
+        Wait for a managed thread to finish without stalling simulated time. With a
+        timeout, the caller resumes after `timeout` simulated seconds even if the
+        thread is still running, as thread.join(timeout) would
+        """
+        token = getattr(thread, 'clock_token', None)
+        if token is None:
+            thread.join(timeout)
+            return
+        with self._cond:
+            if token in self._finished:
+                return
+            waiter = next(self._tokens)
+            entry = (waiter, lambda: token in self._finished)
+            self._waiters.append(entry)
+            if timeout is not None:
+                heapq.heappush(self._sleepers, (self._now + max(0.0, timeout), waiter))
+            self._block(waiter)
+            # Woken by one of the two; withdraw the other before anything else runs
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            remaining = [sleeper for sleeper in self._sleepers if sleeper[1] != waiter]
+            if len(remaining) != len(self._sleepers):
+                self._sleepers = remaining
+                heapq.heapify(self._sleepers)
+
+    def _block(self, token):
+        """Give up the run slot until `token` is released. Caller holds the lock"""
+        self._running -= 1
+        self._schedule()
+        self._wait_released(token)
+
+    def _wait_released(self, token):
+        while token not in self._released:
+            self._cond.wait()
+        self._released.discard(token)
+
+    def _schedule(self):
+        """If nothing is running, release the next thread in line. Caller holds the lock"""
+        if self._running > 0:
+            return
+        for i, (token, predicate) in enumerate(self._waiters):
+            if predicate():
+                del self._waiters[i]
+                self._release(token)
+                return
+        if self._sleepers:
+            wake_time, token = heapq.heappop(self._sleepers)
+            self._now = max(self._now, wake_time)
+            self._release(token)
+
+    def _release(self, token):
+        self._running += 1
+        self._released.add(token)
+        self._cond.notify_all()
+
+
+SYSTEM_CLOCK = SystemClock()
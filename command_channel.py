@@ -0,0 +1,80 @@
+"""
+Lightweight local command channel for controlling a headless instance.
+
+The skill selection loop polls a non-blocking UDP socket bound to localhost once
+per iteration, so there is no keyboard hook and no extra thread. Send commands
+from another shell:
+
+    python command_channel.py stop --port 47800
+    python command_channel.py snapshot
+    python command_channel.py click
+    python command_channel.py home
+"""
+
+import argparse
+import socket
+from async_logging import get_logger
+
+
+DEFAULT_PORT = 47800
+COMMANDS = ("stop", "snapshot", "click", "home")
+log = get_logger("command_channel")
+
+
+class CommandChannel:
+    """Non-blocking UDP command socket bound to localhost"""
+    def __init__(self, port=DEFAULT_PORT, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        log.info("Listening for commands on udp://%s:%d", host, port)
+
+    def poll(self):
+        """Return all pending (command, sender_address) pairs without blocking"""
+        commands = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # Windows reports ICMP port-unreachable from earlier replies as an error on recv
+                break
+            command = data.decode("utf-8", errors="ignore").strip().lower()
+            if command:
+                commands.append((command, address))
+        return commands
+
+    def reply(self, address, message):
+        """Send a short reply to the sender of a command"""
+        try:
+            self.sock.sendto(message.encode("utf-8"), address)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
+
+
+def send_command(command, port=DEFAULT_PORT, host="127.0.0.1", timeout=2.0):
+    """Send a command to a running instance and return its reply, or None on timeout"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.sendto(command.encode("utf-8"), (host, port))
+        try:
+            data, _ = sock.recvfrom(4096)
+            return data.decode("utf-8", errors="ignore")
+        except socket.timeout:
+            return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a command to a headless skill selection instance")
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    response = send_command(args.command, args.port)
+    print(response if response is not None else "No reply (is the instance running on this port?)")
@@ -0,0 +1,293 @@
+"""
+Auto-labelled frame dataset.
+
+Samples published frames during normal operation and stores them with the
+detector outputs and game state as labels. The output directory is a recorded
+session (see replay_capture.py), so a dataset can be replayed through the loop
+or through the benchmarks as it is:
+
+    builder = DatasetBuilder("datasets/run1", interval=1.0, max_bytes=500 * 2**20)
+    publisher.subscribe(builder.submit)
+    ...
+    builder.close()
+
+Each line of labels.jsonl holds the usual "file", "t" and "label" plus the
+detections: game state, level-up flag, brightness, button boxes, skill colours
+and the frame's perceptual hash.
+
+submit() only checks the sampling interval and hands the frame to a small
+worker pool, so the loop never waits for disk. The workers compute a 64-bit
+difference hash and skip frames within `hash_distance` bits of a stored frame
+with the same label. The hash ignores brightness, so a dimmed level-up screen
+would otherwise count as a copy of the gameplay behind it. They then encode the image (JPEG or PNG) and append its label line. If the pool falls
+behind, new samples are dropped rather than queued. When the stored images
+exceed `max_bytes`, the oldest are deleted until the dataset is 90% of the cap.
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import cv2
+import numpy as np
+import metrics
+from async_logging import get_logger
+from replay_capture import LABELS_FILE
+
+
+log = get_logger("dataset")
+
+
+def dhash(frame):
+    """64-bit difference hash of a BGR frame: which neighbouring pixels of a 9x8 thumbnail get brighter"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return int(np.packbits(thumb[:, 1:] > thumb[:, :-1]).view(">u8")[0])
+
+
+def frame_label(result):
+    """Screen label in the replay_capture.py vocabulary, from one frame's detections"""
+    if result.level_up_detected:
+        return "skill_cards"
+    if result.main_start_button is not None:
+        return "results" if result.game_state == "DETECTING_LEVELUPS" else "home"
+    if result.carousel_start_button is not None:
+        return "carousel"
+    return "gameplay"
+
+
+class HashIndex:
+    """Perceptual hashes of the stored frames, searchable by Hamming distance"""
+    def __init__(self):
+        self.hashes = np.zeros(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def nearest(self, value):
+        """Smallest Hamming distance from `value` to a stored hash (65 when empty)"""
+        if not len(self.hashes):
+            return 65
+        diff = (self.hashes ^ np.uint64(value)).view(np.uint8).reshape(-1, 8)
+        return int(np.unpackbits(diff, axis=1).sum(axis=1).min())
+
+    def add(self, value):
+        self.hashes = np.append(self.hashes, np.uint64(value))
+
+    def remove(self, value):
+        matches = np.flatnonzero(self.hashes == np.uint64(value))
+        if len(matches):
+            self.hashes = np.delete(self.hashes, matches[0])
+
+
+class DatasetBuilder:
+    """Samples, deduplicates and stores labelled frames in the background"""
+    def __init__(self, directory, interval=1.0, hash_distance=4, max_bytes=500 * 2**20, image_format=".jpg",
+                 jpeg_quality=90, workers=2, max_pending=4):
+        """
+        Keeps at most one frame per `interval` seconds. Frames whose hash is within `hash_distance`
+        bits of a stored one are skipped. `image_format` is ".jpg" or ".png". At most `max_pending`
+        frames wait for the `workers` encoding threads; anything beyond that is dropped
+        """
+        if image_format not in (".jpg", ".png"):
+            raise ValueError(f"Unsupported image format '{image_format}', expected .jpg or .png")
+        self.directory = directory
+        self.interval = interval
+        self.hash_distance = hash_distance
+        self.max_bytes = max_bytes
+        self.image_format = image_format
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality] if image_format == ".jpg" else []
+        self.max_pending = max_pending
+
+        self._lock = Lock()
+        self._pending = 0
+        self._last_sample_at = None
+        self._records = []  # Label records of the stored frames, oldest first
+        self._indexes = {}  # label -> HashIndex
+        self.bytes = 0
+        self.counts = {"saved": 0, "duplicate": 0, "dropped": 0, "evicted": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dataset")
+
+    def _load_existing(self):
+        """Resume a dataset: index the frames already on disk and continue numbering after them"""
+        path = os.path.join(self.directory, LABELS_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    file_path = os.path.join(self.directory, record["file"])
+                    if not os.path.exists(file_path):
+                        continue
+                    self._records.append(record)
+                    self.bytes += os.path.getsize(file_path)
+                    if "hash" in record:
+                        self._index(record["label"]).add(int(record["hash"], 16))
+        self._next_id = max((int(os.path.splitext(record["file"])[0]) for record in self._records
+                             if os.path.splitext(record["file"])[0].isdigit()), default=-1) + 1
+        self._time_offset = max((record["t"] for record in self._records), default=-1.0) + 1.0
+        self._first_timestamp = None
+        if self._records:
+            log.info("Resuming dataset %s with %d frames (%.1f MB)", self.directory, len(self._records),
+                     self.bytes / 2**20)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    def _index(self, label):
+        index = self._indexes.get(label)
+        if index is None:
+            index = self._indexes[label] = HashIndex()
+        return index
+
+    def submit(self, result):
+        """ResultPublisher subscriber. Returns immediately; the work happens on the pool"""
+        if result.frame is None:
+            return
+        with self._lock:
+            if self._last_sample_at is not None and result.timestamp - self._last_sample_at < self.interval:
+                return
+            self._last_sample_at = result.timestamp
+            if self._pending >= self.max_pending:
+                self._count("dropped")
+                return
+            self._pending += 1
+        self._executor.submit(self._store, result)
+
+    def _store(self, result):
+        try:
+            frame_hash = dhash(result.frame)
+            label = frame_label(result)
+            with self._lock:
+                index = self._index(label)
+                if index.nearest(frame_hash) <= self.hash_distance:
+                    self._count("duplicate")
+                    return
+                # Reserve the hash and file name so concurrent workers skip near-copies of this frame
+                index.add(frame_hash)
+                filename = f"{self._next_id:06d}{self.image_format}"
+                self._next_id += 1
+                if self._first_timestamp is None:
+                    self._first_timestamp = result.timestamp
+                t = self._time_offset + result.timestamp - self._first_timestamp
+
+            with metrics.stage("dataset_encode"):
+                ok, encoded = cv2.imencode(self.image_format, result.frame, self.encode_params)
+            if not ok:
+                log.warning("Could not encode frame %s", result.seq)
+                with self._lock:
+                    index.remove(frame_hash)
+                return
+            with open(os.path.join(self.directory, filename), "wb") as f:
+                f.write(encoded.tobytes())
+
+            record = {
+                "file": filename,
+                "t": round(t, 4),
+                "label": label,
+                "game_state": result.game_state,
+                "level_up": bool(result.level_up_detected),
+                "brightness": None if result.brightness is None else round(float(result.brightness), 2),
+                "main_start_button": _plain(result.main_start_button),
+                "carousel_start_button": _plain(result.carousel_start_button),
+                "skills": [skill['color'] for skill in result.skill_results],
+                "hash": f"{frame_hash:016x}",
+            }
+            with self._lock:
+                self._records.append(record)
+                self.bytes += len(encoded)
+                with open(os.path.join(self.directory, LABELS_FILE), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+                self._count("saved")
+                if self.max_bytes is not None and self.bytes > self.max_bytes:
+                    self._evict()
+        except Exception as e:
+            log.error("Could not store dataset frame %s: %s", result.seq, e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _evict(self):
+        """Delete the oldest frames down to 90% of max_bytes and rewrite labels.jsonl. Called with the lock held"""
+        target = self.max_bytes * 0.9
+        evicted = 0
+        while self._records and self.bytes > target:
+            record = self._records.pop(0)
+            path = os.path.join(self.directory, record["file"])
+            try:
+                self.bytes -= os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+            if "hash" in record:
+                self._index(record["label"]).remove(int(record["hash"], 16))
+            evicted += 1
+        labels_path = os.path.join(self.directory, LABELS_FILE)
+        with open(labels_path + ".tmp", "w", encoding="utf-8") as f:
+            for record in self._records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(labels_path + ".tmp", labels_path)
+        self._count("evicted", evicted)
+        log.info("Dataset over %.1f MB, removed the %d oldest frames", self.max_bytes / 2**20, evicted)
+
+    def _count(self, outcome, amount=1):
+        self.counts[outcome] += amount
+        metrics.inc("dataset_samples_total", amount, outcome=outcome)
+
+    def close(self):
+        """Wait for the frames still being encoded"""
+        self._executor.shutdown(wait=True)
+        log.info("Dataset %s: %d frames, %.1f MB (%s)", self.directory, len(self._records), self.bytes / 2**20,
+                 ", ".join(f"{outcome} {count}" for outcome, count in self.counts.items()))
+
+
+def _plain(bbox):
+    return None if bbox is None else [int(value) for value in bbox]
+
+
+def build_from_replay(session_dir, positions, builder, levelup_method="brightness"):
+    """Run the loop on a recorded session as fast as possible and feed every result to `builder`"""
+    from clock import VirtualClock
+    from frame_results import ResultPublisher
+    from replay_capture import ReplayCapture, RecordingInput
+    from skillSelection import skillSelection
+
+    clock = VirtualClock()
+    capture = ReplayCapture.from_directory(session_dir, clock=clock)
+    publisher = ResultPublisher()
+    stop_flag = {'stop': False}
+
+    def stop_at_end(result):
+        stop_flag['stop'] = capture.is_finished()
+
+    publisher.subscribe(builder.submit)
+    publisher.subscribe(stop_at_end)
+    skillSelection(positions, stop_flag, publisher=publisher, capture=capture, input_device=RecordingInput(clock=clock),
+                   clock=clock, headless=True, levelup_method=levelup_method)
+
+
+if __name__ == "__main__":
+    from async_logging import setup_logging
+    from layout import load_layout
+
+    parser = argparse.ArgumentParser(description="Build a labelled, deduplicated frame dataset from a recorded session")
+    parser.add_argument("session", help="Recorded session directory")
+    parser.add_argument("output", help="Dataset directory (resumed if it exists)")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recording")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds of session time between samples")
+    parser.add_argument("--hash-distance", type=int, default=4, help="Frames this many hash bits apart are duplicates")
+    parser.add_argument("--max-mb", type=float, default=500, help="Disk cap; the oldest frames are evicted beyond it")
+    parser.add_argument("--format", choices=[".jpg", ".png"], default=".jpg")
+    args = parser.parse_args()
+    setup_logging("INFO")
+    dataset = DatasetBuilder(args.output, args.interval, args.hash_distance, int(args.max_mb * 2**20), args.format,
+                             max_pending=64)
+    build_from_replay(args.session, load_layout(args.positions), dataset)
+    dataset.close()
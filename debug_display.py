@@ -0,0 +1,189 @@
+import cv2
+import numpy as np
+import time
+from threading import Thread, Lock
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("debug_display")
+
+
+SKILL_COLOR_BGR = {"green": (0, 255, 0), "blue": (255, 0, 0), "purple": (255, 0, 255),
+                   "gold": (0, 255, 255), "none": (128, 128, 128)}
+
+
+class DebugRenderer:
+    """
+    Debug stream window that draws the detection results published by the main loop.
+    It never runs detectors itself: it keeps only the newest result, renders at its own
+    (lower) rate and silently drops any results it did not get to in time.
+    """
+    def __init__(self, layout, window_name="Archero ROI Stream", fps=10, scale_factor=0.8):
+        self.layout = layout  # CalibrationLayout (see layout.py)
+        self.window_name = window_name
+        self.fps = fps
+        self.scale_factor = scale_factor
+
+        self.running = False
+        self.render_thread = None
+        self._pending = None
+        self._pending_lock = Lock()
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+
+    def submit(self, result):
+        """Publisher callback - store the newest result, replacing any unrendered one"""
+        with self._pending_lock:
+            if self._pending is not None:
+                self.frames_dropped += 1
+            self._pending = result
+
+    def start(self):
+        """Start the render thread"""
+        if self.running:
+            return
+        self.running = True
+        self.render_thread = Thread(target=self._render_loop)
+        self.render_thread.daemon = True
+        self.render_thread.start()
+        log.info("Started debug display at %s FPS", self.fps)
+
+    def stop(self):
+        """Stop the render thread"""
+        self.running = False
+        if self.render_thread is not None:
+            self.render_thread.join(timeout=1.0)
+
+    def _render_loop(self):
+        """Render the newest result at most `fps` times per second"""
+        frame_time = 1.0 / self.fps
+
+        while self.running:
+            start_time = time.time()
+
+            with self._pending_lock:
+                result = self._pending
+                self._pending = None
+
+            if result is not None and result.frame is not None:
+                display_frame = self.render(result)
+                if self.scale_factor != 1.0:
+                    display_frame = cv2.resize(display_frame, None, fx=self.scale_factor, fy=self.scale_factor,
+                                               interpolation=cv2.INTER_AREA)
+                cv2.imshow(self.window_name, display_frame)
+                self.frames_rendered += 1
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            elapsed = time.time() - start_time
+            time.sleep(max(0, frame_time - elapsed))
+
+        cv2.destroyAllWindows()
+
+    @metrics.timed("render_overlay")
+    def render(self, result):
+        """Draw a FrameResult onto a copy of its frame"""
+        display_frame = result.frame.copy()
+
+        # Color detection masks as overlays (red for main start, green for carousel start)
+        _overlay_mask(display_frame, result.main_mask, 2, result.analysis_scale)
+        _overlay_mask(display_frame, result.carousel_mask, 1, result.analysis_scale)
+
+        # Draw main start button detection
+        if result.main_start_button:
+            _draw_button(display_frame, result.main_start_button, "MAIN START BUTTON", (255, 255, 0))
+
+        # Draw carousel start button detection
+        if result.carousel_start_button:
+            _draw_button(display_frame, result.carousel_start_button, "CAROUSEL START BUTTON", (0, 255, 0))
+
+        # Show status information
+        level_up_detected = result.level_up_detected
+        brightness = result.brightness if result.brightness is not None else 0.0
+        cv2.putText(display_frame, f"Brightness: {brightness:.1f}", (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(display_frame, f"Home Screen: {result.main_start_button is not None}", (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(display_frame, f"Main Start: {result.main_start_button is not None}", (10, 90),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(display_frame, f"Carousel Start: {result.carousel_start_button is not None}", (10, 120),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(display_frame, f"Skill Selection: {level_up_detected}", (10, 150),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0) if level_up_detected else (255, 255, 255), 2)
+        if result.game_state:
+            cv2.putText(display_frame, f"State: {result.game_state}", (10, 180),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        if result.energy is not None:
+            cv2.putText(display_frame, f"Energy: {result.energy:.0%}", (10, 210),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        # Only show skill regions if level up detected and we're in skill selection
+        if level_up_detected and result.skill_regions is not None:
+            self._draw_skill_selection(display_frame, result)
+
+        return display_frame
+
+    def _draw_skill_selection(self, display_frame, result):
+        """Draw skill area, division lines and per-region color analysis"""
+        # Total color areas from all regions, using the results the main loop already computed
+        color_areas = {"green": 0, "blue": 0, "purple": 0, "gold": 0, "none": 0}
+        for skill in result.skill_results:
+            if skill['color'] in color_areas:
+                color_areas[skill['color']] += skill['area']
+
+        # Display debug info and color areas on the right side
+        frame_width = display_frame.shape[1]
+        y_pos = 30
+        cv2.putText(display_frame, f"Regions: {len(result.skill_results)}/3",
+                   (frame_width - 180, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        y_pos += 25
+        for color, area in color_areas.items():
+            cv2.putText(display_frame, f"{color.upper()}: {area}px",
+                       (frame_width - 180, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, SKILL_COLOR_BGR[color], 2)
+            y_pos += 25
+
+        # Show skill area outline when in skill selection
+        skill_area = self.layout.skill_area
+        cv2.rectangle(display_frame, skill_area.tl, skill_area.br, (255, 0, 255), 2)
+        cv2.putText(display_frame, "SKILL SELECTION ACTIVE", (skill_area.x, skill_area.y - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 1)
+
+        # Draw the card division lines (at 1/3 and 2/3) and card centers
+        for card in self.layout.cards[1:]:
+            cv2.line(display_frame, (card.x, skill_area.y), (card.x, skill_area.y2), (255, 0, 255), 2)
+        for card in self.layout.cards:
+            cv2.circle(display_frame, card.center, 6, (255, 0, 255), -1)
+
+        # Show the 3 skill regions
+        for card in result.skill_regions:
+            cv2.rectangle(display_frame, card.tl, card.br, (0, 255, 255), 2)
+
+        for skill in result.skill_results:
+            x, y, _, _ = skill['bbox']
+            cv2.putText(display_frame, f"SKILL {skill['region']}: {skill['color']} ({skill['area']}px)",
+                       (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+
+def _overlay_mask(display_frame, mask_entry, channel, analysis_scale=1.0):
+    """Blend a detector ROI mask into one color channel of the frame, in place"""
+    if mask_entry is None:
+        return
+    (x1, y1), roi_mask = mask_entry
+    if analysis_scale != 1:
+        roi_mask = cv2.resize(roi_mask, None, fx=1.0 / analysis_scale, fy=1.0 / analysis_scale,
+                              interpolation=cv2.INTER_NEAREST)
+    h, w = roi_mask.shape[:2]
+    roi = display_frame[y1:y1 + h, x1:x1 + w]
+    mask_colored = np.zeros_like(roi)
+    mask_colored[:, :, channel] = roi_mask[:roi.shape[0], :roi.shape[1]]
+    roi[:] = cv2.addWeighted(roi, 0.8, mask_colored, 0.2, 0)
+
+
+def _draw_button(display_frame, bbox, label, color):
+    """Draw a detected button with its center point and label"""
+    x, y, w, h = bbox
+    cv2.rectangle(display_frame, (x, y), (x + w, y + h), color, 3)
+    cv2.circle(display_frame, (x + w // 2, y + h // 2), 8, color, -1)
+    cv2.putText(display_frame, label, (x, y - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
@@ -0,0 +1,100 @@
+"""
+Runs the independent per-frame analyses (brightness, start / carousel detectors,
+skill card classification) concurrently on a bounded thread pool.
+
+OpenCV releases the GIL inside cvtColor, inRange, morphologyEx and findContours,
+so on a multi-core host a frame takes about as long as its slowest detector
+instead of the sum of all of them:
+
+    executor = DetectorExecutor(max_workers=4)
+    results = executor.run({
+        "start": (start_detector.detect_start_button, (frame,)),
+        "brightness": (frame_brightness, (frame,)),
+    }, deadline=0.08)
+    results.get("start")  # missing if the detector failed or missed the deadline
+
+A detector that misses the deadline keeps running in the background; it is not
+submitted again until it has finished, so a detector object is never used by
+two threads at once.
+
+On a simulated clock (clock.VirtualClock) the deadline is ignored and every
+detector is waited for: pool threads run in real time, so whether one made a
+wall-clock deadline would change from one replay to the next.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("detector_executor")
+
+
+def default_workers():
+    """Pool size: one thread per core, at most 4 (the loop has at most 6 independent analyses)"""
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class DetectorExecutor:
+    """Bounded thread pool for per-frame analyses with a per-frame deadline"""
+    def __init__(self, max_workers=None, clock=None):
+        self.max_workers = default_workers() if max_workers is None else max_workers
+        # Replays on a simulated clock must not depend on how fast the pool threads happen to run
+        self.use_deadline = not (clock is not None and clock.simulated)
+        # With a single worker everything runs inline on the calling thread
+        self.pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="detector") if self.max_workers > 1 else None
+        self._pending = {}  # name -> future still running from an earlier frame
+        self.deadline_misses = 0
+
+    def run(self, tasks, deadline=None):
+        """
+        Run {name: (function, args)} and return {name: result} for the tasks that finished
+        within `deadline` seconds. Failed and late tasks are left out. On a simulated
+        clock every task is waited for.
+        """
+        results = {}
+        if self.pool is None:
+            for name, (function, args) in tasks.items():
+                try:
+                    results[name] = function(*args)
+                except Exception as e:
+                    log.error("Detector %s failed: %s", name, e)
+            return results
+
+        futures = {}
+        for name, (function, args) in tasks.items():
+            previous = self._pending.get(name)
+            if previous is not None and not previous.done():
+                metrics.inc("detector_skipped_total", detector=name)
+                continue
+            futures[name] = self.pool.submit(function, *args)
+
+        with metrics.stage("detector_join"):
+            wait(futures.values(), timeout=deadline if self.use_deadline else None)
+
+        for name, future in futures.items():
+            self._pending.pop(name, None)
+            if not future.done():
+                # Still running; keep it so the same detector isn't submitted again next frame
+                self._pending[name] = future
+                self.deadline_misses += 1
+                metrics.inc("detector_deadline_missed_total", detector=name)
+                log.warning("Detector %s missed the %.0fms frame deadline", name, deadline * 1000)
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                log.error("Detector %s failed: %s", name, e)
+        return results
+
+    def reset(self):
+        """Replace the pool after a stall; threads stuck in a detector are abandoned"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="detector")
+        self._pending = {}
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
@@ -0,0 +1,214 @@
+"""
+Slow-frame forensics.
+
+Watches how long the loop takes to process each frame. When a frame exceeds its
+budget, the monitor saves evidence into a bounded ring of directories on disk:
+
+    slow_frames/slow_000042/
+        frame.png      the raw captured frame
+        info.json      total and per-stage times, game state, detections, detectors that missed the deadline
+        stacks.txt     sampled stacks of the loop thread, one "frame;frame;... count" line per stack
+
+The loop brackets each frame:
+
+    monitor.begin()
+    ... monitor.mark("analysis") ...
+    monitor.end(result, analysis_tasks, analyses)
+
+On a frame within budget this costs the begin/mark timestamps, one comparison
+in end() and arming and disarming the sampler. The stacks come from a sampler
+thread that sleeps until begin() arms it. It then waits for half the frame's
+budget, and returns to sleep as soon as end() disarms it. Only a frame still
+running at that point gets its loop thread's stack (sys._current_frames)
+sampled every `sample_interval`. The dump itself is written on a background
+thread. At most one frame per `min_dump_interval` seconds is dumped, so an
+overloaded machine doesn't fill the disk, and only the newest `max_dumps` are
+kept.
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("frame_budget")
+
+
+class _NullFrameMonitor:
+    """No-op stand-in used by the loop when no monitor is configured"""
+    __slots__ = ()
+
+    def begin(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def end(self, result, tasks=None, analyses=None):
+        return False
+
+
+NULL_FRAME_MONITOR = _NullFrameMonitor()
+
+
+def collapse_stack(frame):
+    """Python stack as "module:function:line;..." from the outermost call inwards"""
+    entries = []
+    while frame is not None:
+        code = frame.f_code
+        entries.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(entries))
+
+
+class FrameBudgetMonitor:
+    """Dumps the frame, stage timings, state and sampled stacks of frames over budget"""
+    def __init__(self, directory="slow_frames", budget=0.15, max_dumps=20, sample_interval=0.005,
+                 min_dump_interval=5.0, max_samples=500):
+        self.directory = directory
+        self.budget = budget
+        self.max_dumps = max_dumps
+        self.sample_interval = sample_interval
+        self.min_dump_interval = min_dump_interval
+        self.max_samples = max_samples
+
+        self._frame_started = None  # perf_counter of the frame in progress, None between frames
+        self._thread_id = None
+        self._marks = []
+        self._samples = []          # (frame start, collapsed stack) taken by the sampler thread
+        self._last_dump_at = None
+        self.slow_frames = 0
+        self.dumps = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._ring = sorted(name for name in os.listdir(directory) if name.startswith("slow_"))
+        self._next_id = max((int(name[5:]) for name in self._ring if name[5:].isdigit()), default=-1) + 1
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="frame_dump")
+        self._stop = False
+        self._armed = threading.Event()       # Set by begin(): a frame started
+        self._frame_done = threading.Event()  # Set by end(): cancels the pending sampling
+        self._sampler = threading.Thread(target=self._sample_loop, name="frame_sampler")
+        self._sampler.daemon = True
+        self._sampler.start()
+
+    def begin(self):
+        """Start timing a frame; call on the loop thread"""
+        if self._marks:
+            self._marks = []
+        self._thread_id = threading.get_ident()
+        self._frame_started = time.perf_counter()
+        self._frame_done.clear()
+        self._armed.set()
+
+    def mark(self, name):
+        """End of the stage `name` within the current frame"""
+        self._marks.append((name, time.perf_counter()))
+
+    def end(self, result, tasks=None, analyses=None):
+        """Finish the frame. Returns True if it was over budget"""
+        started = self._frame_started
+        self._frame_started = None
+        self._frame_done.set()
+        if started is None:
+            return False
+        finished = time.perf_counter()
+        if finished - started <= self.budget:
+            if self._samples:
+                self._samples = []
+            return False
+
+        samples, self._samples = self._samples, []
+        self.slow_frames += 1
+        metrics.inc("slow_frames_total", state=result.game_state)
+        if self._last_dump_at is not None and finished - self._last_dump_at < self.min_dump_interval:
+            return True
+        self._last_dump_at = finished
+
+        stages = {}
+        previous = started
+        for name, at in self._marks:
+            stages[name] = round((at - previous) * 1000, 3)
+            previous = at
+        info = {
+            "seq": result.seq,
+            "wall_time": time.time(),
+            "elapsed_ms": round((finished - started) * 1000, 3),
+            "budget_ms": self.budget * 1000,
+            "stages_ms": stages,
+            "game_state": result.game_state,
+            "level_up_detected": result.level_up_detected,
+            "brightness": None if result.brightness is None else float(result.brightness),
+            "main_start_button": _plain(result.main_start_button),
+            "carousel_start_button": _plain(result.carousel_start_button),
+            "skills": [skill['color'] for skill in result.skill_results],
+            "missed_detectors": sorted(set(tasks or ()) - set(analyses or ())),
+        }
+        stacks = Counter(stack for frame_started, stack in samples if frame_started == started)
+        self._writer.submit(self._write, result.frame, info, stacks)
+        return True
+
+    def _sample_loop(self):
+        half_budget = self.budget / 2
+        while True:
+            self._armed.wait()
+            self._armed.clear()
+            if self._stop:
+                return
+            started = self._frame_started
+            if started is None:
+                continue
+            # Sleeps through frames that end within half their budget
+            if self._frame_done.wait(started + half_budget - time.perf_counter()):
+                continue
+            while len(self._samples) < self.max_samples and self._frame_started == started:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None:
+                    self._samples.append((started, collapse_stack(frame)))
+                if self._frame_done.wait(self.sample_interval):
+                    break
+
+    def _write(self, frame, info, stacks):
+        import cv2
+        name = f"slow_{self._next_id:06d}"
+        self._next_id += 1
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(path, exist_ok=True)
+            if frame is not None:
+                cv2.imwrite(os.path.join(path, "frame.png"), frame)
+            info["samples"] = sum(stacks.values())
+            info["sample_interval_ms"] = self.sample_interval * 1000
+            info["top_stacks"] = [[stack, count] for stack, count in stacks.most_common(5)]
+            with open(os.path.join(path, "info.json"), "w", encoding="utf-8") as f:
+                json.dump(info, f, indent=4)
+            with open(os.path.join(path, "stacks.txt"), "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            log.error("Could not write slow frame dump %s: %s", path, e)
+            return
+        self.dumps += 1
+        metrics.inc("slow_frame_dumps_total")
+        log.warning("Frame %s took %.0fms (budget %.0fms) in %s, evidence saved to %s",
+                    info["seq"], info["elapsed_ms"], info["budget_ms"], info["game_state"], path)
+        self._ring.append(name)
+        while len(self._ring) > self.max_dumps:
+            shutil.rmtree(os.path.join(self.directory, self._ring.pop(0)), ignore_errors=True)
+
+    def close(self):
+        self._stop = True
+        self._frame_done.set()
+        self._armed.set()
+        self._writer.shutdown(wait=True)
+
+
+def _plain(bbox):
+    return None if bbox is None else [int(value) for value in bbox]
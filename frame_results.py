@@ -0,0 +1,56 @@
+import threading
+
+
+class FrameResult:
+    """Detection results the skill selection loop produced for one captured frame"""
+    def __init__(self, seq, frame, timestamp):
+        self.seq = seq                      # Capture sequence number of the frame
+        self.frame = frame                  # BGR frame the results were computed on (treat as read-only)
+        self.timestamp = timestamp
+        self.brightness = None
+        self.main_start_button = None       # (x, y, w, h) or None
+        self.carousel_start_button = None   # (x, y, w, h) or None
+        self.main_mask = None               # (origin, roi_mask) from the start detector
+        self.carousel_mask = None           # (origin, roi_mask) from the carousel detector
+        self.analysis_scale = 1.0           # Resolution of the masks relative to frame; boxes are full resolution
+        self.level_up_detected = False
+        self.skill_regions = None           # Layout card Rects while a level up is shown
+        self.skill_results = []             # One entry per skill region, see classify_skill_regions
+        self.energy = None                  # Energy bar fill level (0-1), read while waiting to start a run
+        self.game_state = None
+
+
+class ResultPublisher:
+    """
+    Hands the latest FrameResult to any number of subscribers.
+    Subscribers are called on the publishing thread, so they must only store
+    the result and return - any heavy work belongs on their own thread.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = None
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Register a callable that receives every published FrameResult"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a previously registered callable"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, result):
+        """Publish a result to all subscribers"""
+        with self._lock:
+            self._latest = result
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(result)
+
+    def latest(self):
+        """Get the most recently published result, or None"""
+        with self._lock:
+            return self._latest
@@ -0,0 +1,264 @@
+"""
+Calibration layout compiled once from positions.json.
+
+positions.json stores eight absolute screen points, plus optionally the two
+corners of the energy bar ("energy-tl", "energy-br"). The layout turns them into
+validated integer rectangles relative to the captured game area, with NumPy
+slice tuples, the three skill card sub-rectangles and the click centres worked
+out up front, so the per-frame code never re-derives coordinates:
+
+    layout = CalibrationLayout.from_positions(positions)
+    roi = frame[layout.start.slices]
+    card_roi = frame[layout.cards[1].slices]
+    x, y = layout.card_clicks[1]  # absolute screen point of the middle card
+"""
+
+import json
+
+
+LAYOUT_VERSION = 1
+POSITION_KEYS = ("top-left", "bottom-right", "start-tl", "start-br",
+                 "skill-area-tl", "skill-area-br", "carousel-tl", "carousel-br")
+ENERGY_KEYS = ("energy-tl", "energy-br")  # Optional; calibrations without them don't read the energy bar
+
+
+class Rect:
+    """Integer rectangle (x, y, w, h) with precomputed slices and centre"""
+    __slots__ = ("x", "y", "w", "h", "x2", "y2", "slices", "center")
+
+    def __init__(self, x, y, w, h):
+        self.x, self.y, self.w, self.h = int(x), int(y), int(w), int(h)
+        self.x2 = self.x + self.w
+        self.y2 = self.y + self.h
+        self.slices = (slice(self.y, self.y2), slice(self.x, self.x2))
+        self.center = (self.x + self.w // 2, self.y + self.h // 2)
+
+    @classmethod
+    def from_corners(cls, top_left, bottom_right):
+        return cls(top_left[0], top_left[1], bottom_right[0] - top_left[0], bottom_right[1] - top_left[1])
+
+    @property
+    def bbox(self):
+        return (self.x, self.y, self.w, self.h)
+
+    @property
+    def tl(self):
+        return (self.x, self.y)
+
+    @property
+    def br(self):
+        return (self.x2, self.y2)
+
+    def scaled(self, factor):
+        """Copy of this rectangle in a frame resized by `factor` (e.g. 0.5 for half resolution)"""
+        x1, y1 = int(round(self.x * factor)), int(round(self.y * factor))
+        x2, y2 = int(round(self.x2 * factor)), int(round(self.y2 * factor))
+        return Rect(x1, y1, x2 - x1, y2 - y1)
+
+    def clip(self, width, height):
+        """Copy of this rectangle clipped to a width x height frame"""
+        x1 = max(0, min(self.x, width))
+        y1 = max(0, min(self.y, height))
+        x2 = max(x1, min(self.x2, width))
+        y2 = max(y1, min(self.y2, height))
+        return Rect(x1, y1, x2 - x1, y2 - y1)
+
+    def __iter__(self):
+        return iter(self.bbox)
+
+    def __eq__(self, other):
+        return isinstance(other, Rect) and self.bbox == other.bbox
+
+    def __hash__(self):
+        return hash(self.bbox)
+
+    def __repr__(self):
+        return f"Rect{self.bbox}"
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    overlap_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    overlap = overlap_w * overlap_h
+    union = aw * ah + bw * bh - overlap
+    return overlap / union if union else 1.0
+
+
+def split_cards(area):
+    """Split the skill area into 3 cards at 1/3 and 2/3 of its width; the last card takes any remainder"""
+    third = int(area.w / 3.0)
+    two_thirds = int(area.w * 2.0 / 3.0)
+    return (Rect(area.x, area.y, third, area.h),
+            Rect(area.x + third, area.y, third, area.h),
+            Rect(area.x + two_thirds, area.y, area.w - two_thirds, area.h))
+
+
+class CalibrationLayout:
+    """
+    Calibrated regions relative to the captured game area.
+    `origin` is the absolute screen position of the game area's top-left corner and
+    `size` its (width, height); all rectangles are clipped to the game area.
+    `energy` is the energy bar region, or None when it isn't calibrated.
+    """
+    def __init__(self, origin, size, start, carousel, skill_area, energy=None):
+        self.origin = (int(origin[0]), int(origin[1]))
+        self.size = (int(size[0]), int(size[1]))
+        if self.size[0] <= 0 or self.size[1] <= 0:
+            raise ValueError(f"Game area must have a positive size, got {self.size}")
+
+        self.start = self._validate("start", start)
+        self.carousel = self._validate("carousel", carousel)
+        self.skill_area = self._validate("skill area", skill_area)
+        self.cards = split_cards(self.skill_area)
+        if min(card.w for card in self.cards) <= 0:
+            raise ValueError(f"Skill area is too narrow to split into 3 cards: {self.skill_area}")
+        self.energy = self._validate("energy bar", energy) if energy is not None else None
+
+        # Absolute screen points
+        self.top_left = self.origin
+        self.bottom_right = (self.origin[0] + self.size[0], self.origin[1] + self.size[1])
+        self.start_click = self.to_screen(self.start.center)
+        self.carousel_click = self.to_screen(self.carousel.center)
+        self.card_clicks = tuple(self.to_screen(card.center) for card in self.cards)
+
+    def _validate(self, name, rect):
+        if not isinstance(rect, Rect):
+            rect = Rect(*rect)
+        if rect.w <= 0 or rect.h <= 0:
+            raise ValueError(f"Calibrated {name} region is empty or inverted: {rect}")
+        clipped = rect.clip(*self.size)
+        if clipped.w <= 0 or clipped.h <= 0:
+            raise ValueError(f"Calibrated {name} region {rect} lies outside the game area {self.size}")
+        return clipped
+
+    def scaled(self, factor):
+        """
+        Layout of the same screen regions in a frame resized by `factor`, for analysis at
+        reduced resolution. Its click points are meaningless; click with the full layout
+        """
+        size = (int(round(self.size[0] * factor)), int(round(self.size[1] * factor)))
+        return CalibrationLayout(self.origin, size, self.start.scaled(factor), self.carousel.scaled(factor),
+                                 self.skill_area.scaled(factor),
+                                 self.energy.scaled(factor) if self.energy is not None else None)
+
+    @property
+    def frame_shape(self):
+        """Shape of a captured BGR frame of the game area"""
+        return (self.size[1], self.size[0], 3)
+
+    def to_screen(self, point):
+        """Game-area point -> absolute screen point"""
+        return (self.origin[0] + point[0], self.origin[1] + point[1])
+
+    def to_frame(self, point):
+        """Absolute screen point -> game-area point"""
+        return (point[0] - self.origin[0], point[1] - self.origin[1])
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Compile a layout from the absolute points stored in positions.json"""
+        missing = [key for key in POSITION_KEYS if key not in positions]
+        if missing:
+            raise ValueError(f"positions.json is missing {', '.join(missing)}. Run calibration again.")
+
+        origin = positions["top-left"]
+        size = (positions["bottom-right"][0] - origin[0], positions["bottom-right"][1] - origin[1])
+
+        def relative(tl_key, br_key):
+            tl, br = positions[tl_key], positions[br_key]
+            return Rect(tl[0] - origin[0], tl[1] - origin[1], br[0] - tl[0], br[1] - tl[1])
+
+        energy = relative(*ENERGY_KEYS) if all(key in positions for key in ENERGY_KEYS) else None
+        return cls(origin, size, relative("start-tl", "start-br"), relative("carousel-tl", "carousel-br"),
+                   relative("skill-area-tl", "skill-area-br"), energy)
+
+    def to_positions(self):
+        """Absolute points in the positions.json format"""
+        positions = {"top-left": list(self.top_left), "bottom-right": list(self.bottom_right)}
+        for prefix, rect in (("start", self.start), ("skill-area", self.skill_area), ("carousel", self.carousel)):
+            positions[f"{prefix}-tl"] = list(self.to_screen(rect.tl))
+            positions[f"{prefix}-br"] = list(self.to_screen(rect.br))
+        if self.energy is not None:
+            positions["energy-tl"] = list(self.to_screen(self.energy.tl))
+            positions["energy-br"] = list(self.to_screen(self.energy.br))
+        return positions
+
+    def to_dict(self):
+        data = {
+            "version": LAYOUT_VERSION,
+            "origin": list(self.origin),
+            "size": list(self.size),
+            "start": list(self.start.bbox),
+            "carousel": list(self.carousel.bbox),
+            "skill_area": list(self.skill_area.bbox),
+        }
+        if self.energy is not None:
+            data["energy"] = list(self.energy.bbox)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        version = data.get("version")
+        if version != LAYOUT_VERSION:
+            raise ValueError(f"Unsupported layout version {version} (expected {LAYOUT_VERSION})")
+        return cls(data["origin"], data["size"], data["start"], data["carousel"], data["skill_area"],
+                   data.get("energy"))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def __eq__(self, other):
+        return isinstance(other, CalibrationLayout) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return (f"CalibrationLayout(origin={self.origin}, size={self.size}, start={self.start}, "
+                f"carousel={self.carousel}, skill_area={self.skill_area}, energy={self.energy})")
+
+
+def load_layout(path):
+    """Load a saved layout or a positions.json file"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return as_layout(data)
+
+
+def as_layout(positions):
+    """Accept a CalibrationLayout, a serialised layout dict or a positions.json dict"""
+    if isinstance(positions, CalibrationLayout):
+        return positions
+    if "version" in positions:
+        return CalibrationLayout.from_dict(positions)
+    return CalibrationLayout.from_positions(positions)
+
+
+def downscale(frame, scale):
+    """Frame resized by `scale` (0.5, 0.25, ...) with area averaging; the frame itself at scale 1"""
+    if scale == 1:
+        return frame
+    import cv2
+    height, width = frame.shape[:2]
+    size = (int(round(width * scale)), int(round(height * scale)))
+    # Area averaging by exactly 2 has a fast path in OpenCV; shrinking 4x in one call
+    # takes the general path and costs more than the detection it saves. Halve first
+    while scale <= 0.5:
+        frame = cv2.resize(frame, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        scale *= 2
+    if frame.shape[1] != size[0] or frame.shape[0] != size[1]:
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def scale_bbox(bbox, factor):
+    """(x, y, w, h) multiplied by `factor`, e.g. 1 / scale to map an analysis box back to full resolution"""
+    if bbox is None:
+        return None
+    return Rect(*bbox).scaled(factor).bbox
+
+
+def scale_point(point, factor):
+    """(x, y) multiplied by `factor` and rounded to whole pixels"""
+    return (int(round(point[0] * factor)), int(round(point[1] * factor)))
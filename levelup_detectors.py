@@ -0,0 +1,251 @@
+"""
+Level-up detectors. Each one turns per-frame features into "started" / "ended" events.
+
+    detector = create_levelup_detector("motion", analysis_layout)
+    features = detector.features(frame)   # stateless, safe to run on the detector pool
+    event = detector.update(features, any_start_button_detected)
+
+BrightnessLevelUpDetector is the original method: mean frame brightness moving
+from the normal band (120-140) into the skill selection band (75-95) over 5-7
+frames of history.
+
+MotionLevelUpDetector watches a small grayscale thumbnail instead. When the
+level-up overlay appears, everything outside the skill area darkens by the same
+factor, while the skill area changes unevenly as the cards are drawn on top.
+It compares each thumbnail with a baseline of recent gameplay frames and fires
+as soon as that pattern shows, which is usually the first level-up frame. A fade
+to black darkens the skill area evenly too, and ordinary gameplay motion is not
+an even darkening, so neither triggers it. The baseline is frozen while the
+screen outside the skill area keeps getting darker, so a fade-in over several
+frames is compared with the gameplay before it rather than with its own first
+frames. A darkening that never turns into a level up is accepted as the new
+baseline after `max_fade_frames`. Like the brightness detector, it also fires
+when the mean brightness sits in the skill selection band for a full window of
+frames, for a level-up screen that was already showing or whose transition it missed.
+"""
+
+import cv2
+import numpy as np
+from async_logging import get_logger
+
+
+LEVELUP_METHODS = ("brightness", "motion")
+# Mean brightness bands of gameplay and of the skill selection screen
+DEFAULT_LEVELUP_BANDS = {"normal_band": (120, 140), "skill_band": (75, 95)}
+log_levelup = get_logger("loop.levelup")
+
+
+class BrightnessLevelUpDetector:
+    """Level up from mean brightness moving between fixed bands"""
+    frame_features = False  # Fed with the frame brightness the loop already computes
+
+    def __init__(self, normal_band=DEFAULT_LEVELUP_BANDS["normal_band"], skill_band=DEFAULT_LEVELUP_BANDS["skill_band"],
+                 window_size=10):
+        self.configure(normal_band, skill_band)
+        self.brightness_window_size = window_size
+        self.brightness_history = []
+        self.last_brightness = None
+        self.active = False
+
+    def configure(self, normal_band=None, skill_band=None):
+        """Move the bands, keeping the brightness history (used by live_config.py reloads)"""
+        if normal_band is not None:
+            self.normal_brightness_min, self.normal_brightness_max = normal_band
+        if skill_band is not None:
+            self.skill_brightness_min, self.skill_brightness_max = skill_band
+
+    def features(self, frame):
+        return np.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+    def update(self, current_brightness, any_start_button_detected):
+        """Feed one frame's brightness. Returns "started", "ended" or None"""
+        event = None
+        if self.last_brightness is not None:
+            # Add to brightness history
+            self.brightness_history.append(current_brightness)
+            if len(self.brightness_history) > self.brightness_window_size:
+                self.brightness_history.pop(0)
+            event = self._check(any_start_button_detected)
+        self.last_brightness = current_brightness
+        return event
+
+    def reset(self):
+        self.active = False
+
+    def _check(self, any_start_button_detected):
+        history = self.brightness_history
+        # Check for level up: transition from normal play (120-140) to skill selection (75-95)
+        if len(history) < 5:
+            return None
+
+        # Get recent average brightness
+        recent_avg = np.mean(history[-3:])
+        older_avg = np.mean(history[-7:-3]) if len(history) >= 7 else self.last_brightness
+
+        # Check if we transitioned from normal brightness to skill selection brightness
+        was_normal_brightness = self.normal_brightness_min <= older_avg <= self.normal_brightness_max
+        is_skill_brightness = self.skill_brightness_min <= recent_avg <= self.skill_brightness_max
+
+        # Standard transition detection (only if no start buttons detected)
+        if was_normal_brightness and is_skill_brightness and not self.active and not any_start_button_detected:
+            self.active = True
+            log_levelup.info("Level up detected! Brightness transitioned from %.1f to %.1f", older_avg, recent_avg)
+            return "started"
+
+        # Direct skill selection detection (when starting program in skill selection)
+        if (not self.active and is_skill_brightness and len(history) >= self.brightness_window_size
+                and not any_start_button_detected):
+            # Check if brightness has been consistently in skill selection range
+            if all(self.skill_brightness_min <= b <= self.skill_brightness_max for b in history[-5:]):
+                self.active = True
+                log_levelup.info("Skill selection detected at startup! Brightness consistently at %.1f", recent_avg)
+                return "started"
+            return None
+
+        # Reset level up detection when brightness returns to normal OR start button is detected
+        if self.active and (self.normal_brightness_min <= recent_avg <= self.normal_brightness_max
+                            or any_start_button_detected):
+            self.active = False
+            if any_start_button_detected:
+                log_levelup.info("Skill selection ended. Start button detected.")
+            else:
+                log_levelup.info("Skill selection ended. Brightness returned to normal: %.1f", recent_avg)
+            return "ended"
+        return None
+
+
+class MotionLevelUpDetector:
+    """Level up from the dimming overlay pattern in low-resolution frame differences"""
+    frame_features = True  # Needs its own thumbnail of each frame
+
+    def __init__(self, frame_size, skill_area, thumb_width=48, dim_ratio=0.85, uniform_std=0.08, card_std=0.12,
+                 baseline_alpha=0.3, confirm_frames=1, fall_ratio=0.97, max_fade_frames=15,
+                 normal_band=DEFAULT_LEVELUP_BANDS["normal_band"], skill_band=DEFAULT_LEVELUP_BANDS["skill_band"],
+                 window_size=10):
+        """
+        `frame_size` is the (width, height) of the analysed frames and `skill_area` a layout
+        Rect in the same coordinates
+        """
+        width, height = frame_size
+        self.thumb_size = (thumb_width, max(1, int(round(height * thumb_width / width))))
+        scale = thumb_width / width
+        # Skill area in thumbnail coordinates, and a mask of everything outside it
+        self.skill_slices = (slice(int(skill_area.y * scale), int(np.ceil(skill_area.y2 * scale))),
+                             slice(int(skill_area.x * scale), int(np.ceil(skill_area.x2 * scale))))
+        self.outside = np.ones((self.thumb_size[1], self.thumb_size[0]), dtype=bool)
+        self.outside[self.skill_slices] = False
+
+        self.dim_ratio = dim_ratio            # Outside area darker than this fraction of the baseline...
+        self.uniform_std = uniform_std        # ...by the same factor everywhere (std of the per-pixel ratio)...
+        self.card_std = card_std              # ...while the skill area changes unevenly
+        self.recover_ratio = (1.0 + dim_ratio) / 2  # Outside brightness back above this ends the level up
+        self.baseline_alpha = baseline_alpha
+        self.confirm_frames = confirm_frames
+        self.fall_ratio = fall_ratio            # Outside darker than this keeps the baseline frozen...
+        self.max_fade_frames = max_fade_frames  # ...for at most this many frames
+        self.window_size = window_size          # Frames in the skill band that count as a level-up screen
+        self.configure(normal_band, skill_band)
+
+        self.baseline = None
+        self.candidate_frames = 0
+        self.fading_frames = 0
+        self.skill_band_frames = 0
+        self.active = False
+        self.direct = False  # Started from the brightness band rather than the transition
+
+    def configure(self, normal_band=None, skill_band=None):
+        """Brightness bands of the direct level-up path (used by live_config.py reloads)"""
+        if normal_band is not None:
+            self.normal_band = normal_band
+        if skill_band is not None:
+            self.skill_band = skill_band
+
+    def features(self, frame):
+        """Grayscale thumbnail of a BGR frame, as float32"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def reset(self):
+        self.active = False
+        self.direct = False
+        self.candidate_frames = 0
+        self.skill_band_frames = 0
+
+    def measure(self, thumb):
+        """(outside brightness ratio, outside ratio std, skill area ratio std) against the baseline"""
+        ratio = (thumb + 1.0) / (self.baseline + 1.0)
+        outside = ratio[self.outside]
+        return float(np.median(outside)), float(np.std(outside)), float(np.std(ratio[self.skill_slices]))
+
+    def update(self, thumb, any_start_button_detected):
+        """Feed one frame's thumbnail. Returns "started", "ended" or None"""
+        if self.baseline is None:
+            self.baseline = thumb
+            return None
+
+        outside_ratio, outside_std, skill_std = self.measure(thumb)
+        brightness = float(thumb.mean())
+
+        if self.active:
+            # The baseline stays frozen on the last gameplay frames while the overlay is up. After a direct
+            # start there are no gameplay frames to compare with, so the brightness band decides
+            recovered = brightness >= self.normal_band[0] if self.direct else outside_ratio >= self.recover_ratio
+            if recovered or any_start_button_detected:
+                self.active = False
+                self.direct = False
+                self.baseline = thumb
+                self.fading_frames = 0
+                self.skill_band_frames = 0
+                if any_start_button_detected:
+                    log_levelup.info("Skill selection ended. Start button detected.")
+                else:
+                    log_levelup.info("Skill selection ended. Overlay gone (brightness %.1f, ratio %.2f)",
+                                     brightness, outside_ratio)
+                return "ended"
+            return None
+
+        if self.skill_band[0] <= brightness <= self.skill_band[1] and not any_start_button_detected:
+            self.skill_band_frames += 1
+        else:
+            self.skill_band_frames = 0
+
+        overlay = (outside_ratio < self.dim_ratio and outside_std < self.uniform_std and skill_std > self.card_std
+                   and not any_start_button_detected)
+        if overlay:
+            self.candidate_frames += 1
+            if self.candidate_frames >= self.confirm_frames:
+                self.active = True
+                self.candidate_frames = 0
+                log_levelup.info("Level up detected! Overlay dimmed the screen to %.2f of gameplay brightness",
+                                 outside_ratio)
+                return "started"
+            return None
+        self.candidate_frames = 0
+
+        # Direct path: a level-up screen that was already showing, or whose transition was missed
+        if self.skill_band_frames >= self.window_size:
+            self.active = True
+            self.direct = True
+            log_levelup.info("Skill selection detected! Brightness consistently at %.1f", brightness)
+            return "started"
+
+        # Hold the baseline while the screen keeps getting darker, so a fade-in is still measured against
+        # gameplay; a darkening that lasts longer than any fade is a new scene and replaces the baseline
+        if outside_ratio < self.fall_ratio:
+            self.fading_frames += 1
+            if self.fading_frames > self.max_fade_frames:
+                self.baseline = thumb
+                self.fading_frames = 0
+            return None
+        self.fading_frames = 0
+        self.baseline = self.baseline + self.baseline_alpha * (thumb - self.baseline)
+        return None
+
+
+def create_levelup_detector(method, layout):
+    """Level-up detector for one of LEVELUP_METHODS, working on frames the size of `layout`"""
+    if method == "brightness":
+        return BrightnessLevelUpDetector()
+    if method == "motion":
+        return MotionLevelUpDetector(layout.size, layout.skill_area)
+    raise ValueError(f"Unknown level-up method '{method}', expected one of {', '.join(LEVELUP_METHODS)}")
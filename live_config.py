@@ -0,0 +1,238 @@
+"""
+Hot-reloadable settings for a running instance.
+
+config.json holds detector thresholds, timing constants and, optionally, the
+calibrated regions. Every key is optional. Values that aren't given keep their
+built-in defaults, and a key removed from the file returns to its default on the
+next reload. Named ranges and bands are merged over the defaults, so only the
+ones being changed need to be listed:
+
+    {
+        "timing": {"skill_selection_delay": 1.5, "loop_interval": 0.05},
+        "start_button": {"hsv_ranges": {"gold": [[0, 5, 40], [70, 255, 255]]}, "min_area": 0.7, "max_area": 0.99},
+        "skill_colors": {"ranges": {"green": [[35, 40, 40], [85, 255, 255]]}, "min_fraction": 0.05},
+        "levelup": {"normal_band": [120, 140], "skill_band": [75, 95]},
+        "energy": {"min_level": 0.25, "min_value": 110, "min_saturation": 0.35},
+        "state_budgets": {"WALKING_UP": 30},
+        "layout": {... positions.json points or a saved layout ...}
+    }
+
+The calibration file (positions.json) is watched too. Without a "layout" entry,
+the regions come from it, so re-running calibration in another shell updates a
+live instance.
+
+The loop calls poll() once per iteration. That costs at most one os.stat per
+file per `interval`. When a file changes, a background thread reads and
+validates it and precompiles everything the frame code uses: the layout with
+its slices and card rectangles, the analysis-resolution layout, new detectors
+and the colour range arrays. The loop then takes the finished ConfigUpdate
+between two frames and swaps it in as a whole. An invalid file is logged and
+ignored, and the running settings stay in place.
+"""
+
+import json
+import os
+from threading import Lock, Thread
+
+import numpy as np
+from async_logging import get_logger
+
+
+CONFIG_FILE = "config.json"
+log = get_logger("config")
+
+
+class ConfigUpdate:
+    """Validated and precompiled settings from one read of the watched files"""
+    def __init__(self):
+        self.timing = {}                # Overrides of skillSelection.DEFAULT_TIMING
+        self.state_budgets = {}         # Overrides of stall_watchdog.DEFAULT_STATE_BUDGETS
+        self.start_button = {}          # StartButtonDetector keyword arguments
+        self.skill_color_ranges = None  # {color: (lower, upper)} uint8 arrays
+        self.skill_min_fraction = None
+        self.levelup_bands = {}         # Level-up detector configure() arguments, over DEFAULT_LEVELUP_BANDS
+        self.energy = {}                # Overrides of skillSelection.DEFAULT_ENERGY
+        self.layout = None              # CalibrationLayout
+        self.analysis_layout = None     # layout.scaled(analysis_scale)
+        self.detectors = None           # (start_detector, carousel_detector) for analysis_layout
+
+
+def _hsv_range(name, value):
+    """[[h, s, v], [h, s, v]] -> (lower, upper) uint8 arrays"""
+    try:
+        lower, upper = (np.array(bound, dtype=np.int64) for bound in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: expected [[h, s, v], [h, s, v]], got {value!r}")
+    if lower.shape != (3,) or upper.shape != (3,):
+        raise ValueError(f"{name}: expected [[h, s, v], [h, s, v]], got {value!r}")
+    limits = np.array([180, 255, 255])
+    if (lower < 0).any() or (upper > limits).any() or (lower > upper).any():
+        raise ValueError(f"{name}: bounds must satisfy 0 <= lower <= upper <= (180, 255, 255), got {value!r}")
+    return lower.astype(np.uint8), upper.astype(np.uint8)
+
+
+def _band(name, value):
+    try:
+        low, high = (float(bound) for bound in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: expected [low, high], got {value!r}")
+    if low >= high:
+        raise ValueError(f"{name}: low must be below high, got {value!r}")
+    return (low, high)
+
+
+def compile_config(data, layout, analysis_scale=1.0):
+    """
+    Validate a parsed config dict and precompile it against `layout` (used when the
+    config has no "layout" entry). Raises ValueError on invalid settings
+    """
+    from layout import as_layout
+    from levelup_detectors import DEFAULT_LEVELUP_BANDS
+    from skillSelection import DEFAULT_TIMING, DEFAULT_ENERGY, SKILL_COLOR_RANGES
+    from stall_watchdog import DEFAULT_STATE_BUDGETS
+    from start_button_detector import StartButtonDetector, DEFAULT_HSV_RANGES
+
+    if not isinstance(data, dict):
+        raise ValueError("config must be a JSON object")
+    update = ConfigUpdate()
+
+    for name, value in data.get("timing", {}).items():
+        if name not in DEFAULT_TIMING:
+            raise ValueError(f"timing: unknown constant '{name}'")
+        if not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"timing.{name}: expected a non-negative number, got {value!r}")
+        update.timing[name] = float(value)
+
+    for state, budget in data.get("state_budgets", {}).items():
+        if state not in DEFAULT_STATE_BUDGETS:
+            raise ValueError(f"state_budgets: unknown state '{state}'")
+        if budget is not None and (not isinstance(budget, (int, float)) or budget <= 0):
+            raise ValueError(f"state_budgets.{state}: expected a positive number or null, got {budget!r}")
+        update.state_budgets[state] = budget
+
+    start_button = data.get("start_button", {})
+    hsv_ranges = {}
+    for name, value in start_button.get("hsv_ranges", {}).items():
+        if name not in DEFAULT_HSV_RANGES:
+            raise ValueError(f"start_button.hsv_ranges: unknown range '{name}' (expected {', '.join(DEFAULT_HSV_RANGES)})")
+        hsv_ranges[name] = _hsv_range(f"start_button.hsv_ranges.{name}", value)
+    if hsv_ranges:
+        update.start_button["hsv_ranges"] = hsv_ranges
+    for key, argument in (("min_area", "min_button_area"), ("max_area", "max_button_area")):
+        if key in start_button:
+            value = start_button[key]
+            if not isinstance(value, (int, float)) or not 0 < value <= 1:
+                raise ValueError(f"start_button.{key}: expected a fraction in (0, 1], got {value!r}")
+            update.start_button[argument] = float(value)
+
+    skill_colors = data.get("skill_colors", {})
+    ranges = {color: _hsv_range(f"skill_colors.ranges.{color}", value)
+              for color, value in skill_colors.get("ranges", {}).items()}
+    if ranges:
+        update.skill_color_ranges = dict(SKILL_COLOR_RANGES, **ranges)
+    if "min_fraction" in skill_colors:
+        value = skill_colors["min_fraction"]
+        if not isinstance(value, (int, float)) or not 0 <= value < 1:
+            raise ValueError(f"skill_colors.min_fraction: expected a fraction in [0, 1), got {value!r}")
+        update.skill_min_fraction = float(value)
+
+    levelup = data.get("levelup", {})
+    for key, value in levelup.items():
+        if key not in DEFAULT_LEVELUP_BANDS:
+            raise ValueError(f"levelup: unknown setting '{key}' (expected {', '.join(DEFAULT_LEVELUP_BANDS)})")
+        update.levelup_bands[key] = _band(f"levelup.{key}", value)
+
+    for key, value in data.get("energy", {}).items():
+        if key not in DEFAULT_ENERGY:
+            raise ValueError(f"energy: unknown setting '{key}' (expected {', '.join(DEFAULT_ENERGY)})")
+        limit = 255 if key == "min_value" else 1
+        if not isinstance(value, (int, float)) or not 0 <= value <= limit:
+            raise ValueError(f"energy.{key}: expected a number in [0, {limit}], got {value!r}")
+        update.energy[key] = float(value)
+
+    update.layout = as_layout(data["layout"]) if "layout" in data else layout
+    update.analysis_layout = update.layout.scaled(analysis_scale) if analysis_scale != 1 else update.layout
+    update.detectors = (
+        StartButtonDetector(debug_name="start_button", region=update.analysis_layout.start, **update.start_button),
+        StartButtonDetector(debug_name="carousel_button", region=update.analysis_layout.carousel,
+                            **update.start_button),
+    )
+    return update
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}")
+
+
+class LiveConfig:
+    """Watches the config and calibration files and builds updates in the background"""
+    def __init__(self, config_path=CONFIG_FILE, positions_path=None, interval=1.0):
+        self.config_path = config_path
+        self.positions_path = positions_path
+        self.interval = interval
+        self._signatures = self._read_signatures()
+        self._last_check = None
+        self._lock = Lock()
+        self._ready = None
+        self._building = False
+        self.reloads = 0
+        self.errors = 0
+
+    def _paths(self):
+        return [path for path in (self.config_path, self.positions_path) if path]
+
+    def _read_signatures(self):
+        signatures = {}
+        for path in self._paths():
+            try:
+                stat = os.stat(path)
+                signatures[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signatures[path] = None
+        return signatures
+
+    def load(self, layout, analysis_scale=1.0):
+        """Read and compile the current files now. Raises ValueError if they are invalid"""
+        from layout import load_layout
+        if self.positions_path and os.path.exists(self.positions_path):
+            layout = load_layout(self.positions_path)
+        data = _read_json(self.config_path) if self.config_path and os.path.exists(self.config_path) else {}
+        return compile_config(data, layout, analysis_scale)
+
+    def poll(self, now, layout, analysis_scale=1.0):
+        """Start a background rebuild if a watched file changed. Cheap enough to call every frame"""
+        if self._last_check is not None and now - self._last_check < self.interval:
+            return
+        self._last_check = now
+        signatures = self._read_signatures()
+        if signatures == self._signatures or self._building:
+            return
+        self._signatures = signatures
+        self._building = True
+        thread = Thread(target=self._build, args=(layout, analysis_scale), name="config_reload")
+        thread.daemon = True
+        thread.start()
+
+    def _build(self, layout, analysis_scale):
+        try:
+            update = self.load(layout, analysis_scale)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            log.error("Ignoring config change, keeping the running settings: %s", e)
+            update = None
+        with self._lock:
+            if update is not None:
+                self._ready = update
+            self._building = False
+
+    def take(self):
+        """The finished update, if any, to apply between two frames"""
+        with self._lock:
+            update, self._ready = self._ready, None
+        if update is not None:
+            self.reloads += 1
+        return update
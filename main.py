@@ -1,49 +1,241 @@
-from time import sleep
+import argparse
 import os
-from calibration_tool import runCalibration
-import yaml
-from skillSelection import skillSelection
+from async_logging import setup_logging
 import threading
-import keyboard
 import time
 
 def optionsMenu():
     print("Starting skill selection menu...")
     print("Press 1 - to callibrate positions")
     print("Press 2 - to run auto skill detection")
+    print("Press 3 - to calibrate automatically from the home screen")
 
     choice = input("Enter your choice: ")
     return choice
 
 
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Archero 2 auto skill selection")
+    parser.add_argument("--mode", choices=["menu", "calibrate", "autocalibrate", "run", "headless"], default="menu",
+                        help="menu: interactive prompt (default), calibrate: run calibration, "
+                             "autocalibrate: calibrate from a capture of the home screen, "
+                             "run: skill selection with debug window and keyboard controls, "
+                             "headless: no GUI or keyboard hooks, controlled through the command channel")
+    parser.add_argument("--port", type=int, default=None,
+                        help="UDP port of the headless command channel (default 47800)")
+    parser.add_argument("--analysis-scale", type=float, choices=[1.0, 0.5, 0.25], default=1.0,
+                        help="Run detection on a downscaled frame (0.5 or 0.25) for lower CPU use")
+    parser.add_argument("--detector-workers", type=int, default=None,
+                        help="Threads the per-frame detectors run on (default: one per core, at most 4; 1 runs inline)")
+    parser.add_argument("--levelup-method", choices=["brightness", "motion"], default="brightness",
+                        help="Level-up detection: brightness bands (default) or the motion / dimming overlay detector")
+    parser.add_argument("--status-port", type=int, default=None,
+                        help="Serve /status, /metrics and /frame.jpg on this local HTTP port (e.g. 47801)")
+    parser.add_argument("--config", default="config.json",
+                        help="Thresholds, timing and regions applied while running; edits are picked up live "
+                             "(default config.json, optional)")
+    parser.add_argument("--dataset", metavar="DIR", default=None,
+                        help="Save deduplicated, auto-labelled frames to DIR while running (see dataset_builder.py)")
+    parser.add_argument("--dataset-interval", type=float, default=1.0,
+                        help="Seconds between dataset samples (default 1)")
+    parser.add_argument("--dataset-max-mb", type=float, default=500,
+                        help="Disk cap of the dataset; the oldest frames are removed beyond it (default 500)")
+    parser.add_argument("--runs", metavar="DIR", default=None,
+                        help="Record every run (time per state, level ups, skills, clicks, recoveries) to DIR; "
+                             "report with python run_telemetry.py DIR (see run_telemetry.py)")
+    parser.add_argument("--slow-frames", metavar="DIR", default=None,
+                        help="Save the frame, stage timings, state and sampled stacks of frames over "
+                             "--frame-budget to DIR (see frame_budget.py)")
+    parser.add_argument("--frame-budget", type=float, default=150,
+                        help="Milliseconds a frame may take before it counts as slow (default 150)")
+    parser.add_argument("--metrics", metavar="PREFIX", default=None,
+                        help="Export per-stage timings and counters to PREFIX.prom and PREFIX.jsonl")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="Seconds between metrics exports (default 10)")
+    parser.add_argument("--log-level", default="INFO", help="Default log level (DEBUG, INFO, WARNING, ERROR)")
+    parser.add_argument("--log", action="append", default=[], metavar="SITE=LEVEL",
+                        help="Log level for one call site, e.g. loop.skills=DEBUG (repeatable)")
+    parser.add_argument("--log-file", default=None, help="Also write the log to this file")
+    return parser.parse_args()
+
+
+def runCalibration():
+    from calibration_tool import runCalibration as calibrate
+    calibrate()
+
+
+def runAutoCalibration():
+    from autocalibration import runAutoCalibration as autocalibrate
+    autocalibrate()
+
+
+def startStatusServer(positions, status_port):
+    """ResultPublisher with the status server attached, or (None, None) without a port"""
+    if status_port is None:
+        return None, None
+    from frame_results import ResultPublisher
+    from status_server import StatusServer
+    publisher = ResultPublisher()
+    server = StatusServer(publisher, positions, status_port)
+    server.start()
+    return publisher, server
+
+
+def attachDataset(publisher, dataset):
+    """Subscribe the DatasetBuilder, creating a publisher if the status server didn't"""
+    if dataset is None:
+        return publisher
+    if publisher is None:
+        from frame_results import ResultPublisher
+        publisher = ResultPublisher()
+    publisher.subscribe(dataset.submit)
+    return publisher
+
+
+def runInteractive(positions, analysis_scale=1.0, detector_workers=None, levelup_method="brightness", status_port=None,
+                   live_config=None, dataset=None, frame_monitor=None, run_recorder=None):
+    from skillSelection import skillSelection
+    import keyboard
 
-if __name__ == "__main__":
     stop_flag = {'stop': False}
-    user_choice = optionsMenu()
-    if user_choice == '1':
-        print("You selected callibration.\n")
+    publisher, server = startStatusServer(positions, status_port)
+    publisher = attachDataset(publisher, dataset)
+
+    t = threading.Thread(target=skillSelection, args=(positions, stop_flag),
+                         kwargs={'analysis_scale': analysis_scale, 'detector_workers': detector_workers,
+                                 'levelup_method': levelup_method, 'publisher': publisher,
+                                 'live_config': live_config, 'frame_monitor': frame_monitor,
+                                 'run_recorder': run_recorder})
+    t.start()
+
+    print("Press 'q' to stop skill selection.")
+
+    while True:
+        if keyboard.is_pressed('q'):
+            print("Stopping skill selection...")
+            stop_flag['stop'] = True
+            break
+        time.sleep(0.1)
+
+    t.join()
+    if server is not None:
+        server.stop()
+    if dataset is not None:
+        dataset.close()
+    if frame_monitor is not None:
+        frame_monitor.close()
+    if run_recorder is not None:
+        run_recorder.close(time.time())
+    print("Skill selection stopped.")
+
+
+def runHeadless(positions, port=None, analysis_scale=1.0, detector_workers=None, levelup_method="brightness",
+                status_port=None, live_config=None, dataset=None, frame_monitor=None, run_recorder=None):
+    from skillSelection import skillSelection
+    from command_channel import CommandChannel, DEFAULT_PORT
+
+    stop_flag = {'stop': False}
+    channel = CommandChannel(port if port is not None else DEFAULT_PORT)
+    publisher, server = startStatusServer(positions, status_port)
+    publisher = attachDataset(publisher, dataset)
+    print(f"Running headless. Stop with: python command_channel.py stop --port {channel.port}")
+    try:
+        skillSelection(positions, stop_flag, headless=True, command_channel=channel, analysis_scale=analysis_scale,
+                       detector_workers=detector_workers, levelup_method=levelup_method, publisher=publisher,
+                       live_config=live_config, frame_monitor=frame_monitor, run_recorder=run_recorder)
+    except KeyboardInterrupt:
+        stop_flag['stop'] = True
+    finally:
+        channel.close()
+        if server is not None:
+            server.stop()
+        if dataset is not None:
+            dataset.close()
+        if frame_monitor is not None:
+            frame_monitor.close()
+        if run_recorder is not None:
+            run_recorder.close(time.time())
+    print("Skill selection stopped.")
+
+
+def loadPositions():
+    if not os.path.exists('positions.json'):
+        print("You must run calibration first before auto skill detection.")
+        print("Running callibration")
         runCalibration()
-    elif user_choice == '2':
-        if not os.path.exists('positions.json'):
-            print("You must run calibration first before auto skill detection.")
-            print("Running callibration")
-            runCalibration()
-        positions = yaml.safe_load(open("positions.json"))
+    # Compile and validate the calibration once; the loop uses the layout directly
+    from layout import load_layout
+    return load_layout("positions.json")
+
+
+def loadLiveConfig(config_path, positions, analysis_scale=1.0):
+    """Watch config_path and positions.json for edits while running. Returns None if the config is invalid"""
+    from live_config import LiveConfig
+    live_config = LiveConfig(config_path, "positions.json")
+    try:
+        live_config.load(positions, analysis_scale)
+    except ValueError as e:
+        print(f"Invalid config: {e}")
+        return None
+    return live_config
 
-        t = threading.Thread(target=skillSelection, args=(positions, stop_flag))
-        t.start()
 
-        print("Press 'q' to stop skill selection.")
+if __name__ == "__main__":
+    args = parseArgs()
+    site_levels = {site: level.upper() for site, level in (entry.split("=", 1) for entry in args.log)}
+    setup_logging(args.log_level.upper(), site_levels, args.log_file)
+    if args.mode == "menu":
+        user_choice = optionsMenu()
+        mode = {'1': "calibrate", '2': "run", '3': "autocalibrate"}.get(user_choice)
+    else:
+        mode = args.mode
+
+    if args.metrics and mode in ("run", "headless"):
+        import metrics
+        metrics.enable(args.metrics + ".prom", args.metrics + ".jsonl", args.metrics_interval)
+    elif args.status_port is not None and mode in ("run", "headless"):
+        import metrics
+        metrics.enable(interval=None)  # Collect for /metrics without writing files
+
+    dataset = None
+    if args.dataset and mode in ("run", "headless"):
+        from dataset_builder import DatasetBuilder
+        dataset = DatasetBuilder(args.dataset, args.dataset_interval, max_bytes=int(args.dataset_max_mb * 2**20))
 
-        while True:
-            if keyboard.is_pressed('q'):
-                print("Stopping skill selection...")
-                stop_flag['stop'] = True
-                break
-            time.sleep(0.1)
+    frame_monitor = None
+    if args.slow_frames and mode in ("run", "headless"):
+        from frame_budget import FrameBudgetMonitor
+        frame_monitor = FrameBudgetMonitor(args.slow_frames, args.frame_budget / 1000)
 
-        t.join()
-        print("Skill selection stopped.")
+    run_recorder = None
+    if args.runs and mode in ("run", "headless"):
+        from run_telemetry import RunLog, RunRecorder
+        run_recorder = RunRecorder(RunLog(args.runs))
 
+    if mode == "calibrate":
+        print("You selected callibration.\n")
+        runCalibration()
+    elif mode == "autocalibrate":
+        print("Make sure the home screen with the Start button is showing.\n")
+        runAutoCalibration()
+    elif mode == "run":
+        positions = loadPositions()
+        live_config = loadLiveConfig(args.config, positions, args.analysis_scale)
+        if live_config is not None:
+            runInteractive(positions, args.analysis_scale, args.detector_workers, args.levelup_method,
+                           args.status_port, live_config, dataset, frame_monitor, run_recorder)
+    elif mode == "headless":
+        if not os.path.exists('positions.json'):
+            print("positions.json not found. Run calibration first: python main.py --mode autocalibrate "
+                  "(or --mode calibrate)")
+        else:
+            positions = loadPositions()
+            live_config = loadLiveConfig(args.config, positions, args.analysis_scale)
+            if live_config is not None:
+                runHeadless(positions, args.port, args.analysis_scale, args.detector_workers,
+                            args.levelup_method, args.status_port, live_config, dataset, frame_monitor, run_recorder)
     else:
         print("Invalid choice. Exiting.")
+
+    if args.metrics and mode in ("run", "headless"):
+        metrics.disable()
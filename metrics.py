@@ -0,0 +1,221 @@
+"""
+Per-stage timing and counters for the capture / detection / input pipeline.
+
+Instrumented code uses the module-level helpers:
+
+    @metrics.timed("detect_start_button")
+    def detect_start_button(self, frame): ...
+
+    with metrics.stage("hsv_convert"):
+        ...
+    metrics.inc("clicks_total", kind="skill")
+
+While metrics are disabled (the default) `stage()` hands back a shared no-op
+context manager and `inc()` returns immediately. Call `metrics.enable(...)` to
+start collecting; an exporter thread then periodically rewrites a Prometheus
+text file and appends a JSON line with the same data.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from async_logging import get_logger
+
+
+PREFIX = "archero_"
+log = get_logger("metrics")
+
+
+class _NullStage:
+    """No-op stand-in returned by stage() while metrics are disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Times one pass through a stage and records it on exit"""
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """Thread-safe stage timings (count / sum / max) and labelled counters"""
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stages = {}    # name -> [count, total_seconds, max_seconds]
+        self._counters = {}  # (name, ((label, value), ...)) -> value
+        self._exporter = None
+        self._exporter_stop = threading.Event()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def observe(self, name, seconds):
+        """Record one duration for a stage"""
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                self._stages[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a counter, optionally with labels"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """Copy of all current values as plain dicts"""
+        with self._lock:
+            stages = {name: {"count": count, "sum": total, "max": maximum}
+                      for name, (count, total, maximum) in self._stages.items()}
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self._counters.items()]
+        return {"timestamp": time.time(), "stages": stages, "counters": counters}
+
+    def to_prometheus(self, snapshot=None):
+        """Render a snapshot in the Prometheus text exposition format"""
+        if snapshot is None:
+            snapshot = self.snapshot()
+
+        lines = []
+        if snapshot["stages"]:
+            lines.append(f"# TYPE {PREFIX}stage_seconds summary")
+            for name, stage in sorted(snapshot["stages"].items()):
+                lines.append(f'{PREFIX}stage_seconds_sum{{stage="{name}"}} {stage["sum"]:.9f}')
+                lines.append(f'{PREFIX}stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+            lines.append(f"# TYPE {PREFIX}stage_seconds_max gauge")
+            for name, stage in sorted(snapshot["stages"].items()):
+                lines.append(f'{PREFIX}stage_seconds_max{{stage="{name}"}} {stage["max"]:.9f}')
+
+        typed = set()
+        for counter in sorted(snapshot["counters"], key=lambda c: (c["name"], sorted(c["labels"].items()))):
+            metric = PREFIX + counter["name"]
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            labels = ",".join(f'{key}="{value}"' for key, value in sorted(counter["labels"].items()))
+            lines.append(f"{metric}{{{labels}}} {counter['value']}" if labels else f"{metric} {counter['value']}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, prom_path=None, jsonl_path=None):
+        """Write the current values once"""
+        snapshot = self.snapshot()
+        if prom_path:
+            tmp_path = prom_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus(snapshot))
+            os.replace(tmp_path, prom_path)
+        if jsonl_path:
+            with open(jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot) + "\n")
+
+    def enable(self, prom_path="metrics.prom", jsonl_path="metrics.jsonl", interval=10.0):
+        """Start collecting and export every `interval` seconds (set interval to None to never export)"""
+        self.enabled = True
+        if interval is None or self._exporter is not None:
+            return
+        self._exporter_stop.clear()
+
+        def export_loop():
+            while not self._exporter_stop.wait(interval):
+                try:
+                    self.export(prom_path, jsonl_path)
+                except OSError as e:
+                    log.error("Error exporting metrics: %s", e)
+            self.export(prom_path, jsonl_path)
+
+        self._exporter = threading.Thread(target=export_loop)
+        self._exporter.daemon = True
+        self._exporter.start()
+        log.info("Exporting metrics every %.0fs to %s and %s", interval, prom_path, jsonl_path)
+
+    def disable(self):
+        """Stop collecting; the exporter writes one final sample"""
+        self.enabled = False
+        if self._exporter is not None:
+            self._exporter_stop.set()
+            self._exporter.join()
+            self._exporter = None
+
+
+REGISTRY = MetricsRegistry()
+
+
+def stage(name):
+    """Context manager timing a pipeline stage (no-op while disabled)"""
+    if not REGISTRY.enabled:
+        return _NULL_STAGE
+    return _Stage(REGISTRY, name)
+
+
+def timed(name):
+    """Decorator timing every call of a function as a stage (plain call while disabled)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds):
+    """Record a duration measured elsewhere as a stage (no-op while disabled)"""
+    if REGISTRY.enabled:
+        REGISTRY.observe(name, seconds)
+
+
+def inc(name, amount=1, **labels):
+    """Increase a counter (no-op while disabled)"""
+    if REGISTRY.enabled:
+        REGISTRY.inc(name, amount, **labels)
+
+
+def enable(prom_path="metrics.prom", jsonl_path="metrics.jsonl", interval=10.0):
+    REGISTRY.enable(prom_path, jsonl_path, interval)
+
+
+def disable():
+    REGISTRY.disable()
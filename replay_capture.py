@@ -0,0 +1,229 @@
+"""
+Local stand-ins for the BlueStacks capture and for pyautogui, used to drive the
+skill selection loop from recorded sessions instead of a live emulator.
+
+A recorded session is a directory containing the frames as image files and a
+`labels.jsonl` file with one line per frame, in capture order:
+
+    {"file": "000042.png", "t": 12.345, "label": "skill_cards"}
+
+`t` is the capture time in seconds from the start of the session and `label`
+describes what is on screen: "gameplay", "home", "results", "carousel" or
+"skill_cards".
+"""
+
+import bisect
+import cv2
+import json
+import os
+from threading import Lock
+from layout import Rect
+from clock import SYSTEM_CLOCK
+from async_logging import get_logger
+
+
+LABELS_FILE = "labels.jsonl"
+log = get_logger("replay")
+
+
+class ReplayWindow:
+    """Minimal stand-in for the pygetwindow window object"""
+    def __init__(self, width, height):
+        self.title = "BlueStacks (replay)"
+        self.left = 0
+        self.top = 0
+        self.width = width
+        self.height = height
+
+
+def load_session(session_dir):
+    """Load a recorded session. Returns a list of (t, label, frame) sorted by time"""
+    entries = []
+    with open(os.path.join(session_dir, LABELS_FILE), "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            frame = cv2.imread(os.path.join(session_dir, record["file"]), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise Exception(f"Could not read frame {record['file']} in {session_dir}")
+            entries.append((float(record["t"]), record.get("label", "gameplay"), frame))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def write_session(session_dir, entries, image_ext=".png", extras=None):
+    """
+    Write (t, label, frame) entries as a recorded session directory.
+    `extras` optionally holds one dict of additional label fields per entry (e.g. ground truth)
+    """
+    os.makedirs(session_dir, exist_ok=True)
+    with open(os.path.join(session_dir, LABELS_FILE), "w", encoding="utf-8") as f:
+        for i, (t, label, frame) in enumerate(entries):
+            filename = f"{i:06d}{image_ext}"
+            cv2.imwrite(os.path.join(session_dir, filename), frame)
+            record = {"file": filename, "t": round(t, 4), "label": label}
+            if extras is not None:
+                record.update(extras[i])
+            f.write(json.dumps(record) + "\n")
+
+
+class ReplayCapture:
+    """
+    Drop-in replacement for BlueStacksCapture that plays back a recorded session.
+    Playback follows the given clock: every frame becomes visible at its recorded
+    offset from the moment the capture was started, so the consumer sees the same
+    timing it would have seen live, and with a VirtualClock the whole session
+    replays as fast as the loop can process it. No thread is involved; the current
+    frame is looked up whenever it is requested.
+    """
+    def __init__(self, entries, clock=None):
+        if not entries:
+            raise Exception("Replay session contains no frames")
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.entries = entries
+        self.offsets = [t - entries[0][0] for t, _, _ in entries]
+        height, width = entries[0][2].shape[:2]
+        self.window = None
+        self._window = ReplayWindow(width, height)
+        self.capture_running = False
+        self.start_time = None
+        self.frames_served = 0
+        self.roi_coordinates = None
+
+    @classmethod
+    def from_directory(cls, session_dir, clock=None):
+        return cls(load_session(session_dir), clock=clock)
+
+    @property
+    def duration(self):
+        """Length of the session in seconds"""
+        return self.offsets[-1]
+
+    def find_bluestacks_window(self):
+        self.window = self._window
+        return self.window
+
+    def set_roi(self, top_left, bottom_right):
+        # Recorded frames are already cropped to the game area
+        self.roi_coordinates = {"left": top_left[0], "top": top_left[1],
+                                "width": bottom_right[0] - top_left[0],
+                                "height": bottom_right[1] - top_left[1]}
+
+    def start_capture_thread(self, fps=30):
+        """Start playback; `fps` is ignored, the recorded timing is used"""
+        if self.capture_running:
+            return
+        self.capture_running = True
+        self.start_time = self.clock.time()
+        log.info("Started replay of %d frames (%.1fs)", len(self.entries), self.duration)
+
+    def _current_index(self):
+        """Index of the frame visible right now, or -1 before playback starts"""
+        if self.start_time is None:
+            return -1
+        return bisect.bisect_right(self.offsets, self.clock.time() - self.start_time) - 1
+
+    def is_finished(self):
+        """True once the last recorded frame has been shown"""
+        return self._current_index() >= len(self.entries) - 1
+
+    def current_label(self):
+        index = self._current_index()
+        return self.entries[index][1] if index >= 0 else None
+
+    @property
+    def published(self):
+        """(seq, label, appear_time) for every frame that has been on screen so far"""
+        last = self._current_index()
+        return [(i + 1, self.entries[i][1], self.start_time + self.offsets[i]) for i in range(last + 1)]
+
+    def capture_frame(self):
+        frame, _ = self.get_latest_frame_with_seq()
+        return frame
+
+    def get_latest_frame(self):
+        frame, _ = self.get_latest_frame_with_seq()
+        return frame
+
+    def get_latest_frame_with_seq(self):
+        if not self.capture_running:
+            return None, 0
+        index = self._current_index()
+        if index < 0:
+            return None, 0
+        self.frames_served += 1
+        return self.entries[index][2].copy(), index + 1
+
+    def stop_capture(self):
+        self.capture_running = False
+        log.info("Replay stopped")
+
+    def restart_capture(self, fps=30, top_left=None, bottom_right=None):
+        # Playback follows the clock; restarting would rewind the session
+        if top_left is not None and bottom_right is not None:
+            self.set_roi(top_left, bottom_right)
+        log.info("Replay capture restart requested, playback continues")
+
+    def save_frame(self, filename=None):
+        log.warning("Saving frames is not supported during replay")
+        return None
+
+
+def click_targets(layout):
+    """Absolute screen rectangles of the click targets of a CalibrationLayout, per click kind"""
+    def to_screen(rect):
+        return Rect(rect.x + layout.origin[0], rect.y + layout.origin[1], rect.w, rect.h)
+    return {
+        "skill": [to_screen(card) for card in layout.cards],
+        "start": [to_screen(layout.start)],
+        "carousel": [to_screen(layout.carousel)],
+    }
+
+
+def _distance(rect, x, y):
+    """Distance from (x, y) to the nearest point of `rect`, 0 inside it"""
+    dx = max(rect.x - x, 0, x - rect.x2)
+    dy = max(rect.y - y, 0, y - rect.y2)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+class RecordingInput:
+    """
+    Stand-in for pyautogui that records input actions instead of performing them.
+    Given the CalibrationLayout, each click is labelled with the kind of target nearest
+    to it ("skill", "start" or "carousel"); without one the action is None
+    """
+    def __init__(self, clock=None, layout=None):
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.targets = click_targets(layout) if layout is not None else {}
+        self.lock = Lock()
+        self.clicks = []      # (time, x, y, action)
+        self.key_events = []  # (time, key, 'down' | 'up')
+        self.keys_down = set()
+
+    def action_at(self, x, y):
+        """Kind of the target rectangle nearest to the screen point (x, y)"""
+        nearest = min(((_distance(rect, x, y), action) for action, rects in self.targets.items() for rect in rects),
+                      default=(None, None))
+        return nearest[1]
+
+    def click(self, x, y):
+        with self.lock:
+            self.clicks.append((self.clock.time(), x, y, self.action_at(x, y)))
+
+    def keyDown(self, key):
+        with self.lock:
+            if key not in self.keys_down:
+                self.keys_down.add(key)
+                self.key_events.append((self.clock.time(), key, 'down'))
+
+    def keyUp(self, key):
+        with self.lock:
+            if key in self.keys_down:
+                self.keys_down.discard(key)
+                self.key_events.append((self.clock.time(), key, 'up'))
+
+    def position(self):
+        return (0, 0)
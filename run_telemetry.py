@@ -0,0 +1,377 @@
+"""
+Per-run telemetry.
+
+RunRecorder follows the loop and produces one compact record per run:
+
+    opened / start / end   when the bot started waiting on the home screen, left it, and got back to it
+    outcome                "completed" (results screen seen), "aborted" (back home without one) or "interrupted" (stopped)
+    state_seconds          time spent in each game state, the wait on the home screen included
+    level_ups              level ups detected
+    offered / picked       skill card colours shown and clicked, as counts per colour
+    carousel_clicks        carousel clicks
+    recoveries             stall recoveries per kind (see stall_watchdog.py)
+
+Runs are contiguous, so the records of a log cover all of its time and runs per
+hour is simply completed runs over the summed record lengths.
+
+RunLog stores the records of one instance in a directory:
+
+    runs/bot1/
+        wal.jsonl            records not yet in a block, one JSON line each, written as each run ends
+        block_000000.npz     up to `block_size` records, one compressed numpy array per column
+
+At most one block's worth of records is held in memory. Column names are
+"start", "level_ups", ... for scalars and "state__WALKING_UP", "picked__gold",
+... for the per-state and per-colour counts, so states or colours added later
+just become new columns.
+
+Reports aggregate any number of logs:
+
+    python run_telemetry.py runs/bot1 runs/bot2 --hours 24
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("run_telemetry")
+
+WAL_FILE = "wal.jsonl"
+SCALAR_COLUMNS = ("seq", "opened", "start", "end", "level_ups", "carousel_clicks")
+COUNT_FIELDS = ("state_seconds", "offered", "picked", "recoveries")
+_PREFIXES = {"state_seconds": "state", "offered": "offered", "picked": "picked", "recoveries": "recovery"}
+
+
+class _NullRunRecorder:
+    """No-op stand-in used by the loop when no run log is configured"""
+    __slots__ = ()
+
+    def frame(self, now, game_state):
+        pass
+
+    def level_up(self):
+        pass
+
+    def skill_picked(self, offered, index):
+        pass
+
+    def carousel_click(self):
+        pass
+
+    def recovery(self, kind):
+        pass
+
+    def run_completed(self):
+        pass
+
+
+NULL_RUN_RECORDER = _NullRunRecorder()
+
+
+class RunRecorder:
+    """Builds a record per run from the loop's state transitions and events"""
+    def __init__(self, run_log, instance=None):
+        self.run_log = run_log
+        self.instance = instance if instance is not None else os.path.basename(os.path.abspath(run_log.directory))
+        self._state = None
+        self._state_since = None
+        self._open(None)
+
+    def _open(self, now):
+        self._opened = now
+        self._started = None
+        self._completed = False
+        self._state_seconds = {}
+        self._level_ups = 0
+        self._offered = {}
+        self._picked = {}
+        self._carousel_clicks = 0
+        self._recoveries = {}
+
+    def frame(self, now, game_state):
+        """Once per processed frame with the state after it. Only state changes do any work"""
+        if game_state == self._state:
+            return
+        if self._state is None:
+            self._opened = now
+            if game_state != "WAITING_FOR_START":
+                self._started = now  # Started in the middle of a run
+        else:
+            self._state_seconds[self._state] = self._state_seconds.get(self._state, 0.0) + now - self._state_since
+            if game_state == "WAITING_FOR_START":
+                if self._started is not None:
+                    self._close(now, "completed" if self._completed else "aborted")
+            elif self._started is None:
+                self._started = now
+        self._state = game_state
+        self._state_since = now
+
+    def level_up(self):
+        self._level_ups += 1
+
+    def skill_picked(self, offered, index):
+        """
+        A skill click ended the level up: `offered` are the colours of the cards shown,
+        `index` the one clicked. Called once per level up, not per click attempt
+        """
+        for color in offered:
+            self._offered[color] = self._offered.get(color, 0) + 1
+        picked = offered[index] if index is not None and index < len(offered) else "none"
+        self._picked[picked] = self._picked.get(picked, 0) + 1
+
+    def carousel_click(self):
+        self._carousel_clicks += 1
+
+    def recovery(self, kind):
+        self._recoveries[kind] = self._recoveries.get(kind, 0) + 1
+
+    def run_completed(self):
+        self._completed = True
+
+    def _close(self, now, outcome):
+        record = {
+            "instance": self.instance,
+            "opened": self._opened,
+            "start": self._started,
+            "end": now,
+            "outcome": outcome,
+            "state_seconds": {state: round(seconds, 3) for state, seconds in self._state_seconds.items()},
+            "level_ups": self._level_ups,
+            "offered": self._offered,
+            "picked": self._picked,
+            "carousel_clicks": self._carousel_clicks,
+            "recoveries": self._recoveries,
+        }
+        self.run_log.append(record)
+        metrics.inc("runs_total", outcome=outcome)
+        metrics.observe("run", now - self._started)
+        log.info("Run %s in %.0fs: %d level ups, %d carousel clicks", outcome, now - self._started, self._level_ups,
+                 self._carousel_clicks)
+        self._open(now)
+
+    def close(self, now):
+        """Record a run still in progress as interrupted and write everything to disk"""
+        if self._started is not None and self._state is not None:
+            self._state_seconds[self._state] = self._state_seconds.get(self._state, 0.0) + now - self._state_since
+            self._close(now, "interrupted")
+        self.run_log.close()
+
+
+class RunLog:
+    """Append-only run records: a write-ahead JSON lines file, packed into columnar blocks"""
+    def __init__(self, directory, block_size=64):
+        self.directory = directory
+        self.block_size = block_size
+        os.makedirs(directory, exist_ok=True)
+        self._wal_path = os.path.join(directory, WAL_FILE)
+        blocks = _block_files(directory)
+        self._next_block = int(blocks[-1][6:12]) + 1 if blocks else 0
+        last_seq = -1
+        if blocks:
+            with np.load(os.path.join(directory, blocks[-1])) as block:
+                last_seq = int(block["seq"].max())
+        # Records of the WAL that already made it into a block were written just before a crash
+        self._pending = [record for record in _read_wal(self._wal_path) if record["seq"] > last_seq]
+        self._next_seq = max([last_seq] + [record["seq"] for record in self._pending]) + 1
+
+    def append(self, record):
+        record = dict(record, seq=self._next_seq)
+        self._next_seq += 1
+        self._pending.append(record)
+        with open(self._wal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        if len(self._pending) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Pack the pending records into a new block and empty the WAL"""
+        if not self._pending:
+            return
+        path = os.path.join(self.directory, f"block_{self._next_block:06d}.npz")
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, **to_columns(self._pending))
+        os.replace(path + ".tmp", path)
+        self._next_block += 1
+        self._pending = []
+        open(self._wal_path, "w").close()
+
+    def close(self):
+        self.flush()
+
+
+def _block_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("block_") and name.endswith(".npz"))
+
+
+def _read_wal(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                log.warning("Skipping a damaged line in %s", path)  # Cut off by a crash mid-write
+    return records
+
+
+def to_columns(records):
+    """Run records -> {column: numpy array}"""
+    columns = {
+        "instance": np.array([record["instance"] for record in records]),
+        "outcome": np.array([record["outcome"] for record in records]),
+    }
+    for name in SCALAR_COLUMNS:
+        columns[name] = np.array([record[name] for record in records],
+                                 dtype=np.float64 if name in ("opened", "start", "end") else np.int64)
+    for field in COUNT_FIELDS:
+        keys = sorted({key for record in records for key in record[field]})
+        dtype = np.float32 if field == "state_seconds" else np.int32
+        for key in keys:
+            columns[f"{_PREFIXES[field]}__{key}"] = np.array([record[field].get(key, 0) for record in records],
+                                                             dtype=dtype)
+    return columns
+
+
+def load_columns(directory):
+    """All runs of a log (blocks and WAL) as {column: numpy array}. Columns missing from a block read as 0"""
+    parts = []
+    for name in _block_files(directory):
+        with np.load(os.path.join(directory, name)) as block:
+            parts.append({column: block[column] for column in block.files})
+    last_seq = int(parts[-1]["seq"].max()) if parts else -1
+    wal = [record for record in _read_wal(os.path.join(directory, WAL_FILE)) if record["seq"] > last_seq]
+    if wal:
+        parts.append(to_columns(wal))
+    if not parts:
+        return {}
+    names = set().union(*parts)
+    columns = {}
+    for name in names:
+        arrays = []
+        for part in parts:
+            if name in part:
+                arrays.append(part[name])
+            else:
+                arrays.append(np.zeros(len(part["seq"]), dtype=np.float32))
+        columns[name] = np.concatenate(arrays)
+    return columns
+
+
+def merge_columns(logs):
+    """Concatenate the columns of several logs, filling columns a log doesn't have with 0"""
+    logs = [columns for columns in logs if columns]
+    if not logs:
+        return {}
+    names = set().union(*logs)
+    return {name: np.concatenate([columns[name] if name in columns else np.zeros(len(columns["seq"]))
+                                  for columns in logs]) for name in names}
+
+
+def summarize(columns):
+    """Aggregates of one set of runs: totals, runs per hour, mean seconds per state, colour counts"""
+    covered_hours = float((columns["end"] - columns["opened"]).sum()) / 3600
+    completed = columns["outcome"] == "completed"
+    count = len(columns["seq"])
+
+    def grouped(prefix):
+        return {name[len(prefix) + 2:]: float(columns[name].sum()) for name in sorted(columns)
+                if name.startswith(prefix + "__")}
+
+    state_seconds = grouped("state")
+    covered_seconds = max(covered_hours * 3600, 1e-9)
+    return {
+        "runs": count,
+        "completed": int(completed.sum()),
+        "hours": covered_hours,
+        "runs_per_hour": completed.sum() / covered_hours if covered_hours > 0 else 0.0,
+        "mean_run_seconds": float((columns["end"] - columns["start"])[completed].mean()) if completed.any() else None,
+        "level_ups_per_run": float(columns["level_ups"][completed].mean()) if completed.any() else None,
+        "recoveries": grouped("recovery"),
+        "state_seconds_per_run": {state: seconds / count for state, seconds in state_seconds.items()},
+        "state_share": {state: seconds / covered_seconds for state, seconds in state_seconds.items()},
+        "offered": grouped("offered"),
+        "picked": grouped("picked"),
+    }
+
+
+def trend(columns, bucket_hours=1.0):
+    """Completed runs per instance in each `bucket_hours` window, by the time the run ended"""
+    completed = columns["outcome"] == "completed"
+    buckets = np.floor(columns["end"][completed] / (bucket_hours * 3600)).astype(np.int64)
+    instances = columns["instance"][completed]
+    table = {}
+    for bucket, instance in zip(buckets.tolist(), instances.tolist()):
+        row = table.setdefault(bucket * bucket_hours * 3600, {})
+        row[instance] = row.get(instance, 0) + 1
+    return dict(sorted(table.items()))
+
+
+def _select(columns, mask):
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs per hour, time per state and trends from run logs")
+    parser.add_argument("logs", nargs="+", help="Run log directories (one per instance)")
+    parser.add_argument("--hours", type=float, default=None, help="Only runs that ended in the last N hours")
+    parser.add_argument("--bucket", type=float, default=1.0, help="Trend bucket size in hours (default 1)")
+    parser.add_argument("--output", default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    columns = merge_columns(load_columns(directory) for directory in args.logs)
+    if not columns:
+        print("No runs recorded")
+        return
+    if args.hours is not None:
+        columns = _select(columns, columns["end"] >= time.time() - args.hours * 3600)
+        if not len(columns["seq"]):
+            print(f"No runs in the last {args.hours:g} hours")
+            return
+
+    report = {"all": summarize(columns), "instances": {}, "trend": trend(columns, args.bucket)}
+    for instance in sorted(set(columns["instance"].tolist())):
+        report["instances"][instance] = summarize(_select(columns, columns["instance"] == instance))
+
+    print("\n=== Runs ===")
+    print(f"{'instance':<16} {'runs':>6} {'done':>6} {'hours':>7} {'runs/h':>7} {'avg run':>8} {'lvl/run':>8} {'recov':>6}")
+    for name, summary in list(report["instances"].items()) + [("all", report["all"])]:
+        mean_run = f"{summary['mean_run_seconds']:.0f}s" if summary["mean_run_seconds"] is not None else "-"
+        level_ups = f"{summary['level_ups_per_run']:.1f}" if summary["level_ups_per_run"] is not None else "-"
+        print(f"{name:<16} {summary['runs']:>6} {summary['completed']:>6} {summary['hours']:>7.2f} "
+              f"{summary['runs_per_hour']:>7.2f} {mean_run:>8} {level_ups:>8} {sum(summary['recoveries'].values()):>6.0f}")
+
+    print("\n=== Time per run by state ===")
+    summary = report["all"]
+    for state, seconds in sorted(summary["state_seconds_per_run"].items(), key=lambda item: -item[1]):
+        print(f"{state:<30} {seconds:>8.1f}s {summary['state_share'][state]:>7.1%}")
+
+    print("\n=== Skill colours (offered / picked) ===")
+    for color in sorted(set(summary["offered"]) | set(summary["picked"])):
+        print(f"{color:<10} {summary['offered'].get(color, 0):>8.0f} {summary['picked'].get(color, 0):>8.0f}")
+
+    print("\n=== Completed runs per bucket ===")
+    instances = sorted(report["instances"])
+    print(f"{'bucket start':<18} " + " ".join(f"{name:>10}" for name in instances))
+    for start, row in report["trend"].items():
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(start)):<18} "
+              + " ".join(f"{row.get(name, 0):>10}" for name in instances))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,532 +1,689 @@
 import cv2
-import keyboard
 import time
-import pygetwindow as gw
-import mss
 import numpy as np
+from threading import Thread
 from window_capture import BlueStacksCapture
 from start_button_detector import StartButtonDetector
-import threading
-import pyautogui
+from frame_results import FrameResult, ResultPublisher
+from detector_executor import DetectorExecutor
+from levelup_detectors import create_levelup_detector, DEFAULT_LEVELUP_BANDS
+from stability_gate import StabilityGate
+from action_verifier import ActionVerifier
+from carousel_handler import CarouselHandler
+from stall_watchdog import StallWatchdog
+from frame_budget import NULL_FRAME_MONITOR
+from run_telemetry import NULL_RUN_RECORDER
+from debug_display import DebugRenderer
+from clock import SYSTEM_CLOCK
+from layout import Rect, as_layout, split_cards, downscale, scale_bbox, scale_point
+from async_logging import get_logger, ensure_logging
+import metrics
 
 
-def skillSelection(positions, stop_flag):
-    topLeft = positions['top-left']
-    bottomRight = positions['bottom-right']
-    # Use skill area instead of individual points
-    skillAreaTL = positions['skill-area-tl']
-    skillAreaBR = positions['skill-area-br']
-    startTL = positions['start-tl']
-    startBR = positions['start-br']
-    carouselTL = positions['carousel-tl']
-    carouselBR = positions['carousel-br']
+log = get_logger("skill_selection")
+log_state = get_logger("loop.state")        # Game state changes
+log_levelup = get_logger("loop.levelup")    # Level up start / end
+log_skills = get_logger("loop.skills")      # Per-frame skill detection details
+log_buttons = get_logger("loop.buttons")    # Start / carousel button detections
+log_carousel = get_logger("loop.carousel")  # Carousel click sequence
+log_input = get_logger("input")             # Mouse clicks
+
+# Keys polled in interactive mode and the manual command each one triggers
+KEYBOARD_COMMANDS = {'c': "snapshot", 'h': "home", 'enter': "click"}
+
+# HSV ranges (lower, upper) of the skill card colours, and the fraction of a card one of them must cover
+SKILL_COLOR_RANGES = {
+    "green": ((35, 40, 40), (85, 255, 255)),
+    "blue": ((95, 40, 40), (135, 255, 255)),
+    "purple": ((125, 40, 40), (165, 255, 255)),
+    "gold": ((10, 40, 100), (40, 255, 255)),
+}
+SKILL_MIN_FRACTION = 0.05
+
+# Energy bar columns count as filled when at least this bright (max channel) and saturated ((max - min) / max).
+# A run is only started with the bar at min_level or more: 5 of 20 energy
+DEFAULT_ENERGY = {"min_level": 0.25, "min_value": 110, "min_saturation": 0.35}
+
+# Timing constants in seconds. Override any of them with skillSelection(timing={...})
+DEFAULT_TIMING = {
+    "loop_interval": 0.1,             # Sleep between main loop iterations
+    "detection_cooldown": 1.0,        # Start button checks while in DETECTING_LEVELUPS
+    "click_cooldown": 5.0,            # Minimum time between automatic start clicks
+    "skill_selection_delay": 2.0,     # Longest wait in WAITING_FOR_SKILL_SELECTION before picking a skill
+    "levelup_selection_delay": 3.0,   # Longest wait in DETECTING_LEVELUPS before picking a skill
+    "stability_min_wait": 0.3,        # Shortest wait after a level up before the settled cards are clicked
+    "run_complete_threshold": 1.5,    # Main start button visible this long in DETECTING_LEVELUPS ends the run
+    "start_click_delay_mean": 1.5,    # Gaussian delay before the automatic start click
+    "start_click_delay_std": 0.5,
+    "start_click_delay_min": 1.0,
+    "carousel_gap_min": 0.8,          # Random pause between carousel clicks
+    "carousel_gap_max": 1.2,
+    "walk_down_min": 0.5,             # Random duration of holding 's' in WALKING_DOWN
+    "walk_down_max": 0.7,
+    "key_debounce": 0.5,              # Pause after handling a manual key press
+    "detector_deadline": 0.08,        # Per-frame deadline for the concurrent detectors
+    "verify_deadline": 1.5,           # A click whose effect hasn't shown by then is retried
+    "frame_stall_budget": 5.0,        # No new captured frame for this long restarts the capture
+    "detector_stall_budget": 5.0,     # No detector output for this long restarts the detectors
+}
+
+
+def skillSelection(positions, stop_flag, debug_fps=10, publisher=None, capture=None, input_device=None, show_debug=True,
+                   clock=None, timing=None, headless=False, command_channel=None, analysis_scale=1.0,
+                   detector_workers=None, levelup_method="brightness", state_budgets=None, live_config=None,
+                   frame_monitor=None, run_recorder=None):
+    """
+    Run the auto skill selection loop until stop_flag['stop'] is set.
+    `positions` is the positions.json dict, a saved layout dict or a CalibrationLayout (see layout.py).
+    `capture` and `input_device` default to the live BlueStacks capture and pyautogui;
+    pass stand-ins (see replay_capture.py) to drive the loop from recorded sessions.
+    `clock` defaults to real time; a VirtualClock (see clock.py) replays faster than real time.
+    `timing` overrides entries of DEFAULT_TIMING.
+    `headless` disables the debug window and keyboard polling; control the loop through
+    `command_channel` (see command_channel.py) instead.
+    `analysis_scale` (e.g. 0.5 or 0.25) runs detection on a downscaled frame; detected boxes and
+    click targets are mapped back to full resolution.
+    `detector_workers` sizes the thread pool the per-frame detectors run on (1 runs them inline).
+    `levelup_method` picks the level-up detector: "brightness" bands or "motion" (see levelup_detectors.py).
+    `state_budgets` overrides entries of stall_watchdog.DEFAULT_STATE_BUDGETS.
+    `live_config` is a LiveConfig (see live_config.py); edits to its files are applied between frames.
+    `frame_monitor` is a FrameBudgetMonitor (see frame_budget.py) that keeps evidence of frames over budget.
+    `run_recorder` is a RunRecorder (see run_telemetry.py) that logs a record per run.
+    """
+    if clock is None:
+        clock = SYSTEM_CLOCK
+    base_timing = dict(DEFAULT_TIMING, **(timing or {}))
+    base_budgets = state_budgets
+    timing = dict(base_timing)
+    ensure_logging()
+    
+    if headless:
+        show_debug = False
+        keyboard = None
+    else:
+        import keyboard
+    # All regions, card slices and click centres are compiled once from the calibration
+    layout = base_layout = as_layout(positions)
+    # Regions at analysis resolution; clicks always use the full-resolution layout
+    analysis_layout = layout.scaled(analysis_scale) if analysis_scale != 1 else layout
+    to_full = 1.0 / analysis_scale
+    # Level up detection on the analysis frames (see levelup_detectors.py)
+    levelup_detector = create_levelup_detector(levelup_method, analysis_layout)
+    # Picks a card as soon as the skill area stops animating (see stability_gate.py)
+    stability_gate = StabilityGate(analysis_layout.skill_area, min_wait=timing["stability_min_wait"])
+    # Watches the following frames for the effect of each automatic click (see action_verifier.py)
+    verifier = ActionVerifier(clock, deadline=timing["verify_deadline"])
+    # Recovers from wedged states, capture stalls and hung detectors (see stall_watchdog.py)
+    watchdog = StallWatchdog(timing, state_budgets)
+    if frame_monitor is None:
+        frame_monitor = NULL_FRAME_MONITOR
+    if run_recorder is None:
+        run_recorder = NULL_RUN_RECORDER
 
     # Initialize BlueStacks capture and Start button detector
-    capture = BlueStacksCapture()
-    # Convert absolute coordinates to ROI-relative coordinates for the detector
-    start_tl_roi = (startTL[0] - topLeft[0], startTL[1] - topLeft[1])
-    start_br_roi = (startBR[0] - topLeft[0], startBR[1] - topLeft[1])
-    carousel_tl_roi = (carouselTL[0] - topLeft[0], carouselTL[1] - topLeft[1])
-    carousel_br_roi = (carouselBR[0] - topLeft[0], carouselBR[1] - topLeft[1])
-    start_detector = StartButtonDetector(start_tl_roi, start_br_roi, "start_button")
-    carousel_detector = StartButtonDetector(carousel_tl_roi, carousel_br_roi, "carousel_button")
+    if capture is None:
+        capture = BlueStacksCapture(clock=clock)
+    if input_device is None:
+        input_device = _default_input()
+    start_detector = StartButtonDetector(debug_name="start_button", region=analysis_layout.start)
+    carousel_detector = StartButtonDetector(debug_name="carousel_button", region=analysis_layout.carousel)
+    
+    # Every processed frame is published; the debug view is just one subscriber
+    if publisher is None:
+        publisher = ResultPublisher()
+    renderer = DebugRenderer(layout, fps=debug_fps) if show_debug else None
+    if renderer is not None:
+        publisher.subscribe(renderer.submit)
+    executor = DetectorExecutor(detector_workers, clock)
+    
+    # Warm the detectors and skill classifier while the window is being located
+    warm_up_thread = Thread(target=warm_up_detectors,
+                            args=((start_detector, carousel_detector), analysis_layout.frame_shape, analysis_layout.cards))
+    warm_up_thread.daemon = True
+    warm_up_thread.start()
     try:
         # Find BlueStacks window
         capture.find_bluestacks_window()
         
         # Set ROI based on calibrated positions
-        capture.set_roi(topLeft, bottomRight)
+        capture.set_roi(layout.top_left, layout.bottom_right)
         
         # Start capture thread
         capture.start_capture_thread(fps=30)
         
-        print("Starting skill selection with Start button detection...")
-        print("Press 's' to show/hide stream, 'c' to save screenshot")
-        print("Press 'h' to check for home screen, 'enter' to click Start button")
+        log.info("Starting skill selection with Start button detection...")
+        if keyboard is not None:
+            log.info("Press 'c' to save screenshot")
+            log.info("Press 'h' to check for home screen, 'enter' to click Start button")
+        if command_channel is not None:
+            log.info("Commands accepted on port %d: stop, snapshot, home, click", command_channel.port)
         
-        # Start stream display with start button visualization
-        def enhanced_stream_display():
-            """Enhanced stream with start button area visualization"""
-            nonlocal level_up_detected, skill_regions
-            while not stop_flag['stop']:
-                frame = capture.get_latest_frame()
-                if frame is not None:
-                    display_frame = frame.copy()
-                    
-                    # Calculate brightness
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    mean_brightness = np.mean(gray)
-                    
-                    # Convert absolute start button coordinates to ROI-relative coordinates
-                    start_tl_roi = (startTL[0] - topLeft[0], startTL[1] - topLeft[1])
-                    start_br_roi = (startBR[0] - topLeft[0], startBR[1] - topLeft[1])
-                    
-                    # Ensure coordinates are within frame bounds
-                    frame_height, frame_width = frame.shape[:2]
-                    start_tl_roi = (max(0, start_tl_roi[0]), max(0, start_tl_roi[1]))
-                    start_br_roi = (min(frame_width, start_br_roi[0]), min(frame_height, start_br_roi[1]))
-                    
-                    # Detect both types of start buttons
-                    main_start_button = start_detector.detect_start_button(frame)
-                    carousel_start_button = carousel_detector.detect_start_button(frame)
-                    is_home = start_detector.is_on_home_screen(frame)
-                    
-                    # Show color detection masks as overlays
-                    main_mask = start_detector.get_detection_masks(frame)
-                    carousel_mask = carousel_detector.get_detection_masks(frame)
-                    
-                    if main_mask is not None:
-                        # Convert mask to colored overlay (red for main start)
-                        mask_colored = np.zeros_like(display_frame)
-                        mask_colored[:, :, 2] = main_mask  # Red channel
-                        display_frame = cv2.addWeighted(display_frame, 0.8, mask_colored, 0.2, 0)
-                    
-                    if carousel_mask is not None:
-                        # Convert mask to colored overlay (green for carousel start)
-                        mask_colored = np.zeros_like(display_frame)
-                        mask_colored[:, :, 1] = carousel_mask  # Green channel
-                        display_frame = cv2.addWeighted(display_frame, 0.8, mask_colored, 0.2, 0)
-                    
-                    # Draw main start button detection
-                    if main_start_button:
-                        x, y, w, h = main_start_button
-                        # Draw cyan rectangle around detected main button
-                        cv2.rectangle(display_frame, (x, y), (x + w, y + h), (255, 255, 0), 3)
-                        # Draw center point
-                        center_x = x + w // 2
-                        center_y = y + h // 2
-                        cv2.circle(display_frame, (center_x, center_y), 8, (255, 255, 0), -1)
-                        # Add button label
-                        cv2.putText(display_frame, "MAIN START BUTTON", (x, y - 15), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                    
-                    # Draw carousel start button detection
-                    if carousel_start_button:
-                        x, y, w, h = carousel_start_button
-                        # Draw green rectangle around detected carousel button
-                        cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
-                        # Draw center point
-                        center_x = x + w // 2
-                        center_y = y + h // 2
-                        cv2.circle(display_frame, (center_x, center_y), 8, (0, 255, 0), -1)
-                        # Add button label
-                        cv2.putText(display_frame, "CAROUSEL START BUTTON", (x, y - 15), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    
-                    # Show status information
-                    cv2.putText(display_frame, f"Brightness: {mean_brightness:.1f}", (10, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.putText(display_frame, f"Home Screen: {is_home}", (10, 60), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.putText(display_frame, f"Main Start: {main_start_button is not None}", (10, 90), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.putText(display_frame, f"Carousel Start: {carousel_start_button is not None}", (10, 120), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.putText(display_frame, f"Skill Selection: {level_up_detected}", (10, 150), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0) if level_up_detected else (255, 255, 255), 2)
-                    
-                    # Calculate and display color areas (always show for debugging)
-                    if level_up_detected and skill_regions is not None:
-                        color_areas = {"green": 0, "blue": 0, "purple": 0, "gold": 0, "none": 0}
-                        total_regions_processed = 0
-                        
-                        # Calculate total areas from all regions
-                        for i, region in enumerate(skill_regions):
-                            x, y, w, h = region
-                            # skill_regions are already in ROI coordinates, no need to convert
-                            roi_x = x
-                            roi_y = y
-                            
-                            if roi_y >= 0 and roi_x >= 0 and roi_y + h <= frame.shape[0] and roi_x + w <= frame.shape[1]:
-                                skill_area = frame[roi_y:roi_y+h, roi_x:roi_x+w]
-                                if skill_area.size > 0:
-                                    total_regions_processed += 1
-                                    skill_color, color_area = analyze_skill_color_with_area(skill_area)
-                                    
-                                    if skill_color in color_areas:
-                                        color_areas[skill_color] += color_area
-                        
-                        # Display debug info and color areas on the right side
-                        frame_width = display_frame.shape[1]
-                        y_pos = 30
-                        cv2.putText(display_frame, f"Regions: {total_regions_processed}/3", 
-                                   (frame_width - 180, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                        y_pos += 25
-                        
-                        # Show all colors including none, and show areas even if 0
-                        for color, area in color_areas.items():
-                            color_bgr = {"green": (0, 255, 0), "blue": (255, 0, 0), "purple": (255, 0, 255), 
-                                       "gold": (0, 255, 255), "none": (128, 128, 128)}[color]
-                            cv2.putText(display_frame, f"{color.upper()}: {area}px", 
-                                       (frame_width - 180, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color_bgr, 2)
-                            y_pos += 25
-                    
-                    # Show skill area outline only when appropriate
-                    skill_tl_roi = (skillAreaTL[0] - topLeft[0], skillAreaTL[1] - topLeft[1])
-                    skill_br_roi = (skillAreaBR[0] - topLeft[0], skillAreaBR[1] - topLeft[1])
-                    
-                    # Only show skill regions if level up detected and we're in skill selection
-                    if level_up_detected and skill_regions is not None:
-                        # Show skill area outline when in skill selection
-                        cv2.rectangle(display_frame, skill_tl_roi, skill_br_roi, (255, 0, 255), 2)
-                        cv2.putText(display_frame, "SKILL SELECTION ACTIVE", (skill_tl_roi[0], skill_tl_roi[1] - 10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 1)
-                        
-                        # Draw vertical division lines at 1/3 and 2/3
-                        area_width = skill_br_roi[0] - skill_tl_roi[0]
-                        area_height = skill_br_roi[1] - skill_tl_roi[1]
-                        
-                        # Line at 1/3 position
-                        line1_x = skill_tl_roi[0] + int(area_width / 3)
-                        cv2.line(display_frame, (line1_x, skill_tl_roi[1]), (line1_x, skill_br_roi[1]), (255, 0, 255), 2)
-                        
-                        # Line at 2/3 position
-                        line2_x = skill_tl_roi[0] + int(area_width * 2 / 3)
-                        cv2.line(display_frame, (line2_x, skill_tl_roi[1]), (line2_x, skill_br_roi[1]), (255, 0, 255), 2)
-                        
-                        # Three center points for skill regions
-                        cv2.circle(display_frame, (skill_tl_roi[0] + area_width // 6, skill_tl_roi[1] + area_height // 2), 6, (255, 0, 255), -1)
-                        cv2.circle(display_frame, (skill_tl_roi[0] + area_width // 2, skill_tl_roi[1] + area_height // 2), 6, (255, 0, 255), -1)
-                        cv2.circle(display_frame, (skill_tl_roi[0] + area_width * 5 // 6, skill_tl_roi[1] + area_height // 2), 6, (255, 0, 255), -1)
-
-                        # Show the 3 skill regions
-                        for i, region in enumerate(skill_regions):
-                            x, y, w, h = region
-                            # skill_regions are already in ROI coordinates
-                            roi_x = x
-                            roi_y = y
-                            
-                            # Draw skill region
-                            cv2.rectangle(display_frame, (roi_x, roi_y), (roi_x + w, roi_y + h), (0, 255, 255), 2)
-                            
-                            # Extract and analyze skill region for individual display
-                            if roi_y >= 0 and roi_x >= 0 and roi_y + h <= frame.shape[0] and roi_x + w <= frame.shape[1]:
-                                skill_area = frame[roi_y:roi_y+h, roi_x:roi_x+w]
-                                skill_color, color_area = analyze_skill_color_with_area(skill_area)
-                                
-                                # Display individual skill info with area
-                                cv2.putText(display_frame, f"SKILL {i+1}: {skill_color} ({color_area}px)", 
-                                           (roi_x, roi_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-                    
-                    # Display the enhanced frame
-                    cv2.imshow("Archero ROI Stream", cv2.resize(display_frame, None, fx=0.8, fy=0.8))
-                    
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
-                        
-                time.sleep(0.033)  # ~30 FPS
-            
-            cv2.destroyAllWindows()
+        # Start the debug stream display in its own thread
+        if renderer is not None:
+            renderer.start()
         
-        # Start enhanced stream display in separate thread
-        stream_thread = threading.Thread(target=enhanced_stream_display)
-        stream_thread.daemon = True
-        stream_thread.start()
+        warm_up_thread.join()
         
-        last_detection_time = 0
-        detection_cooldown = 1.0  # Check for start button every second
+        last_detection_time = 0  # Start buttons are checked every timing["detection_cooldown"]
         last_click_time = 0  # Track last click to prevent spam clicking
-        click_cooldown = 5.0  # Minimum time between automatic clicks
         
         # Game state tracking
         game_state = "WAITING_FOR_START"  # States: WAITING_FOR_START, WAITING_FOR_SKILL_SELECTION, WALKING_UP, CAROUSEL_CLICKING, WALKING_DOWN, DETECTING_LEVELUPS
-        state_start_time = current_time if 'current_time' in locals() else time.time()
-        carousel_clicks_done = 0
+        state_start_time = clock.time()
         walking_down_start_time = 0
         
         # Run completion detection
         main_button_detected_start = None  # Track when main button first detected in DETECTING_LEVELUPS
-        main_button_detection_threshold = 1.5  # seconds
         
-        # Brightness monitoring for level up detection
-        brightness_history = []
-        brightness_window_size = 10
-        # Specific brightness ranges for level up detection
-        normal_brightness_min = 120
-        normal_brightness_max = 140
-        skill_brightness_min = 75
-        skill_brightness_max = 95
-        last_brightness = None
+        # Level up state, driven by levelup_detector
         level_up_detected = False
         skill_regions = None  # Will store the 3 skill regions when level up detected
+        skill_color_ranges = None  # None uses SKILL_COLOR_RANGES / SKILL_MIN_FRACTION
+        skill_min_fraction = None
+        start_button_options = {}  # StartButtonDetector thresholds from the config
+        energy_options = dict(DEFAULT_ENERGY)
+        energy_level = None  # This frame's energy bar reading; None if the bar wasn't read or the read missed the deadline
+        logged_energy_level = None
+        
+        last_counted_state = game_state
+        
+        # Latest frame and detections, also used by the manual commands
+        frame = None
+        is_home = False
+        main_start_button = None
+        carousel_start_button = None
+        
+        def handle_command(command):
+            """Run a manual command ('stop', 'snapshot', 'home' or 'click'). Returns a short reply"""
+            if command == "stop":
+                log.info("Stop command received")
+                stop_flag['stop'] = True
+                return "stopping"
+            
+            if command == "snapshot":
+                filename = capture.save_frame()
+                return f"saved {filename}" if filename else "no frame available"
+            
+            if command == "home":
+                # Manual home screen check
+                if frame is None:
+                    return "no frame available"
+                log.info("Home screen check - Is home: %s", is_home)
+                log.info("Main start button: %s", main_start_button)
+                log.info("Carousel start button: %s", carousel_start_button)
+                return f"state={game_state} home={is_home} main={main_start_button} carousel={carousel_start_button}"
+            
+            if command == "click":
+                # Manual start button click - prioritize based on context
+                if frame is None:
+                    return "no frame available"
+                # Determine which button to click based on priority
+                button_to_click = None
+                button_type = None
+                
+                if carousel_start_button:
+                    # Prioritize carousel button if available (game already started)
+                    button_to_click = carousel_start_button
+                    button_type = "carousel"
+                elif main_start_button:
+                    # Use main start button if no carousel (home screen)
+                    button_to_click = main_start_button
+                    button_type = "main"
+                
+                if button_to_click:
+                    log.info("Clicking %s start button", button_type)
+                    click_start_button(capture.window, button_to_click, layout.top_left, input_device)
+                    return f"clicked {button_type} start button"
+                log.info("No start buttons detected for clicking")
+                return "no start buttons detected"
+            
+            return f"unknown command '{command}'"
+        
+        def revert_state(previous_state, clicked_state):
+            """on_failure callback putting `previous_state` back if the click's state is still current"""
+            def revert():
+                nonlocal game_state, state_start_time
+                if game_state == clicked_state:
+                    game_state = previous_state
+                    state_start_time = clock.time()
+                    log_state.info("Click had no effect, game state changed back to %s", previous_state)
+            return revert
+        
+        def click_skill_verified(previous_state, next_state):
+            """Click a random card and expect the level up to end; revert to `previous_state` if it doesn't"""
+            offered = [skill['color'] for skill in result.skill_results]
+            clicked = [None]
+            
+            def perform():
+                clicked[0] = click_random_skill(layout, input_device)
+            
+            # Retries click again, so the pick is recorded once, for the click that ended the level up
+            verifier.submit("skill", perform,
+                            check=lambda result: not result.level_up_detected,
+                            on_success=lambda: run_recorder.skill_picked(offered, clicked[0]),
+                            on_failure=revert_state(previous_state, next_state) if previous_state != next_state else None)
+        
+        def click_carousel(button):
+            noise_x = np.random.normal(0, 25)
+            noise_y = np.random.normal(0, 25)
+            click_start_button_with_noise(capture.window, button, layout.top_left, noise_x, noise_y, input_device, "carousel")
+            run_recorder.carousel_click()
+        
+        carousel = CarouselHandler(click_carousel, timing)
+        
+        def recover(stall):
+            """Release keys, drop pending actions, restart what stalled and return to a state the screen supports"""
+            nonlocal game_state, state_start_time, main_button_detected_start, start_detector, carousel_detector
+            log.warning("Recovering from %s stall in %s", stall.kind, stall.state)
+            metrics.inc("recoveries_total", kind=stall.kind)
+            run_recorder.recovery(stall.kind)
+            input_device.keyUp('w')
+            input_device.keyUp('s')
+            verifier.cancel_all()
+            carousel.cancel()
+            stability_gate.reset()
+            main_button_detected_start = None
+            if stall.kind == "capture":
+                try:
+                    capture.restart_capture(fps=30, top_left=layout.top_left, bottom_right=layout.bottom_right)
+                except Exception as e:
+                    # The emulator window may be gone or being recreated. The watchdog's budgets restart
+                    # after this recovery, so the next capture stall tries again
+                    log.error("Capture restart failed, retrying after the next frame budget: %s", e)
+                    metrics.inc("recovery_failures_total", kind=stall.kind)
+            elif stall.kind == "detectors":
+                executor.reset()
+                start_detector = StartButtonDetector(debug_name="start_button", region=analysis_layout.start,
+                                                     **start_button_options)
+                carousel_detector = StartButtonDetector(debug_name="carousel_button", region=analysis_layout.carousel,
+                                                        **start_button_options)
+            
+            # Re-detect the screen from the latest detections
+            if main_start_button is not None:
+                game_state = "WAITING_FOR_START"
+            elif carousel_start_button is not None and not level_up_detected:
+                game_state = "WALKING_UP"
+            else:
+                # In a run: stand still, pick level ups and watch for the end of the run
+                game_state = "DETECTING_LEVELUPS"
+            state_start_time = clock.time()
+            log_state.info("Game state changed to %s after recovery", game_state)
+        
+        def cards_ready(delay_key):
+            """True once the cards have settled or the fixed `delay_key` wait from the state start has passed"""
+            deadline = state_start_time + timing[delay_key]
+            if stability_gate.settled:
+                saved = stability_gate.time_saved(deadline, current_time)
+                log_skills.info("Cards settled after %.2fs, %.2fs before the fixed wait",
+                                stability_gate.settled_at - stability_gate.started_at, saved)
+                metrics.inc("stability_time_saved_seconds_total", saved)
+                metrics.inc("skill_selection_waits_total", reason="settled")
+                return True
+            if current_time > deadline:
+                metrics.inc("skill_selection_waits_total", reason="deadline")
+                return True
+            return False
+        
+        def apply_config(update):
+            """Swap in a reloaded config (see live_config.py). Only called between two frames"""
+            nonlocal layout, analysis_layout, start_detector, carousel_detector, levelup_detector, stability_gate
+            nonlocal skill_regions, skill_color_ranges, skill_min_fraction, start_button_options, energy_options
+            timing.clear()
+            timing.update(base_timing, **update.timing)
+            watchdog.configure(timing, dict(base_budgets or {}, **update.state_budgets))
+            verifier.deadline = timing["verify_deadline"]
+            start_detector, carousel_detector = update.detectors
+            start_button_options = update.start_button
+            skill_color_ranges = update.skill_color_ranges
+            skill_min_fraction = update.skill_min_fraction
+            energy_options = dict(DEFAULT_ENERGY, **update.energy)
+            layout_changed = update.layout != layout
+            if layout_changed:
+                layout = update.layout
+                analysis_layout = update.analysis_layout
+                capture.set_roi(layout.top_left, layout.bottom_right)
+                if renderer is not None:
+                    renderer.layout = layout
+                if skill_regions is not None:
+                    skill_regions = layout.cards
+                # Thumbnails of the old skill area don't compare with the new one
+                levelup_detector = create_levelup_detector(levelup_method, analysis_layout)
+                stability_gate = StabilityGate(analysis_layout.skill_area)
+                log.info("Layout changed to %s", layout)
+            stability_gate.min_wait = timing["stability_min_wait"]
+            if hasattr(levelup_detector, "configure"):
+                # Always reconfigure, so bands removed from the file go back to their defaults
+                levelup_detector.configure(**dict(DEFAULT_LEVELUP_BANDS, **update.levelup_bands))
+            log.info("Config reloaded%s", " with a new layout" if layout_changed else "")
+            metrics.inc("config_reloads_total")
+        
+        if live_config is not None:
+            apply_config(live_config.load(base_layout, analysis_scale))
         
         # Main skill selection loop
         while not stop_flag['stop']:
+            # Apply config edits that finished building in the background, never mid-frame
+            if live_config is not None:
+                live_config.poll(clock.time(), base_layout, analysis_scale)
+                update = live_config.take()
+                if update is not None:
+                    apply_config(update)
+            
             # Get current frame
-            frame = capture.get_latest_frame()
+            frame, frame_seq = capture.get_latest_frame_with_seq()
+            detectors_alive = True
             
             if frame is not None:
-                current_time = time.time()
+                frame_monitor.begin()
+                current_time = clock.time()
+                result = FrameResult(frame_seq, frame, current_time)
+                result.analysis_scale = analysis_scale
+                analysis_frame = downscale(frame, analysis_scale)
                 
-                # Calculate current brightness
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                current_brightness = np.mean(gray)
+                # Brightness and both types of start buttons run concurrently, once per frame; everything
+                # below reuses these. The skill cards are classified alongside while a level up is showing
+                analysis_tasks = {
+                    "brightness": (frame_brightness, (analysis_frame,)),
+                    "start": (start_detector.detect_start_button, (analysis_frame,)),
+                    "carousel": (carousel_detector.detect_start_button, (analysis_frame,)),
+                }
+                if levelup_detector.frame_features:
+                    analysis_tasks["levelup"] = (levelup_detector.features, (analysis_frame,))
+                if level_up_detected and skill_regions is not None:
+                    for i, card in enumerate(analysis_layout.cards):
+                        analysis_tasks[f"card{i + 1}"] = (classify_skill_card, (analysis_frame, card, i, skill_color_ranges,
+                                                                                  skill_min_fraction))
+                    analysis_tasks["stability"] = (stability_gate.features, (analysis_frame,))
+                if game_state == "WAITING_FOR_START" and analysis_layout.energy is not None:
+                    analysis_tasks["energy"] = (analyze_energy_level, (analysis_frame, analysis_layout.energy,
+                                                                       energy_options["min_value"],
+                                                                       energy_options["min_saturation"]))
+                with metrics.stage("frame_analysis"):
+                    analyses = executor.run(analysis_tasks, timing["detector_deadline"])
+                frame_monitor.mark("analysis")
+                detectors_alive = any(name in analyses for name in ("brightness", "start", "carousel"))
                 
-                # Monitor brightness for level up detection
-                if last_brightness is not None:
-                    # Add to brightness history
-                    brightness_history.append(current_brightness)
-                    if len(brightness_history) > brightness_window_size:
-                        brightness_history.pop(0)
-                    
-                    # Check for level up: transition from normal play (120-140) to skill selection (75-95)
-                    if len(brightness_history) >= 5:
-                        # Get recent average brightness
-                        recent_avg = np.mean(brightness_history[-3:])
-                        older_avg = np.mean(brightness_history[-7:-3]) if len(brightness_history) >= 7 else last_brightness
-                        
-                        # Check for start buttons first - if any start button is detected, we're not in skill selection
-                        main_start_button = start_detector.detect_start_button(frame)
-                        carousel_start_button = carousel_detector.detect_start_button(frame)
-                        any_start_button_detected = main_start_button is not None or carousel_start_button is not None
-                        
-                        # Check if we transitioned from normal brightness to skill selection brightness
-                        was_normal_brightness = normal_brightness_min <= older_avg <= normal_brightness_max
-                        is_skill_brightness = skill_brightness_min <= recent_avg <= skill_brightness_max
-                        
-                        # Standard transition detection (only if no start buttons detected)
-                        if was_normal_brightness and is_skill_brightness and not level_up_detected and not any_start_button_detected:
-                            level_up_detected = True
-                            skill_regions = create_skill_regions(skillAreaTL, skillAreaBR, topLeft)
-                            print(f"Level up detected! Brightness transitioned from {older_avg:.1f} to {recent_avg:.1f}")
-                            print(f"Skill regions created: {skill_regions}")
-                        
-                        # Direct skill selection detection (when starting program in skill selection)
-                        elif not level_up_detected and is_skill_brightness and len(brightness_history) >= brightness_window_size and not any_start_button_detected:
-                            # Check if brightness has been consistently in skill selection range
-                            all_skill_brightness = all(skill_brightness_min <= b <= skill_brightness_max for b in brightness_history[-5:])
-                            if all_skill_brightness:
-                                level_up_detected = True
-                                skill_regions = create_skill_regions(skillAreaTL, skillAreaBR, topLeft)
-                                print(f"Skill selection detected at startup! Brightness consistently at {recent_avg:.1f}")
-                                print(f"Skill regions created: {skill_regions}")
-                        
-                        # Reset level up detection when brightness returns to normal OR start button is detected
-                        elif level_up_detected and (normal_brightness_min <= recent_avg <= normal_brightness_max or any_start_button_detected):
-                            level_up_detected = False
-                            skill_regions = None
-                            if any_start_button_detected:
-                                print(f"Skill selection ended. Start button detected.")
-                            else:
-                                print(f"Skill selection ended. Brightness returned to normal: {recent_avg:.1f}")
+                current_brightness = analyses.get("brightness")
+                result.brightness = current_brightness
+                # Never carry a reading over: one that missed the deadline leaves the level unknown
+                energy_level = result.energy = analyses.get("energy")
+                
+                # Boxes are mapped back to full resolution for clicking and display
+                main_start_button = scale_bbox(analyses.get("start"), to_full)
+                carousel_start_button = scale_bbox(analyses.get("carousel"), to_full)
+                any_start_button_detected = main_start_button is not None or carousel_start_button is not None
+                is_home = main_start_button is not None
+                result.main_start_button = main_start_button
+                result.carousel_start_button = carousel_start_button
+                if main_start_button is not None:
+                    metrics.inc("detections_total", detector="start_button")
+                if carousel_start_button is not None:
+                    metrics.inc("detections_total", detector="carousel_button")
+                if "start" in analyses and start_detector.last_mask is not None:
+                    result.main_mask = (scale_point(start_detector.last_mask_origin, to_full), start_detector.last_mask)
+                if "carousel" in analyses and carousel_detector.last_mask is not None:
+                    result.carousel_mask = (scale_point(carousel_detector.last_mask_origin, to_full), carousel_detector.last_mask)
                 
-                last_brightness = current_brightness
+                # Level up detection (skipped if its input missed the deadline)
+                levelup_input = analyses.get("levelup") if levelup_detector.frame_features else current_brightness
+                if levelup_input is not None:
+                    levelup_event = levelup_detector.update(levelup_input, any_start_button_detected)
+                    if levelup_event == "started":
+                        level_up_detected = True
+                        metrics.inc("detections_total", detector="level_up")
+                        run_recorder.level_up()
+                        skill_regions = layout.cards
+                        log_levelup.debug("Skill regions created: %s", skill_regions)
+                        stability_gate.start(current_time)
+                        stability_gate.update(stability_gate.features(analysis_frame), current_time)
+                    elif levelup_event == "ended":
+                        level_up_detected = False
+                        skill_regions = None
+                        stability_gate.reset()
+                if analyses.get("stability") is not None:
+                    stability_gate.update(analyses["stability"], current_time)
+                frame_monitor.mark("levelup")
                 
                 # Handle game state transitions and actions
-                game_state = handle_game_state_actions(game_state, current_time, walking_down_start_time)
+                game_state = handle_game_state_actions(game_state, current_time, walking_down_start_time, input_device, timing)
                 
                 # Process frame for skills if level up detected
                 if level_up_detected and skill_regions is not None:
-                    detected_skills = process_frame_for_skills(frame, {'skill_regions': skill_regions})
+                    if "card1" in analysis_tasks:
+                        skill_results = [analyses[name] for name in ("card1", "card2", "card3")
+                                         if analyses.get(name) is not None]
+                    else:
+                        # Level up was detected on this frame, so the cards weren't submitted with the detectors
+                        skill_results = classify_skill_regions(analysis_frame, analysis_layout.cards,
+                                                               skill_color_ranges, skill_min_fraction)
+                    result.skill_results = map_skill_results(skill_results, layout, analysis_scale)
+                    detected_skills = [skill for skill in result.skill_results if skill['color'] != "none"]
                     if detected_skills:
-                        print(f"Skills detected: {detected_skills}")
-                        print(f"Current game state: {game_state}")
+                        log_skills.debug("Skills detected: %s", detected_skills)
+                        log_skills.debug("Current game state: %s", game_state)
                     
                     # Auto-select skill if in waiting state
-                    if game_state == "WAITING_FOR_SKILL_SELECTION":
-                        print(f"In WAITING_FOR_SKILL_SELECTION: time elapsed = {current_time - state_start_time:.1f}s")
-                        print(f"Skill regions available: {skill_regions is not None}, count: {len(skill_regions) if skill_regions else 0}")
-                        # Wait 2 seconds after skill selection appears to ensure stability
-                        if current_time - state_start_time > 2.0:
-                            print(f"About to click skill with regions: {skill_regions}")
-                            click_random_skill(skill_regions, topLeft)
+                    if verifier.pending("skill"):
+                        # A skill click is still waiting for the cards to go away
+                        pass
+                    
+                    elif game_state == "WAITING_FOR_SKILL_SELECTION":
+                        log_skills.debug("In WAITING_FOR_SKILL_SELECTION: time elapsed = %.1fs", current_time - state_start_time)
+                        log_skills.debug("Skill regions available: %s, count: %d", skill_regions is not None, len(skill_regions) if skill_regions else 0)
+                        # Wait until the cards stop animating, at most the fixed delay
+                        if cards_ready("skill_selection_delay"):
+                            log_skills.debug("About to click skill with regions: %s", skill_regions)
+                            click_skill_verified("WAITING_FOR_SKILL_SELECTION", "WALKING_UP")
+                            stability_gate.reset()
                             game_state = "WALKING_UP"
                             state_start_time = current_time
-                            print("Game state changed to WALKING_UP")
+                            log_state.info("Game state changed to WALKING_UP")
                     
                     # If we detect levelup while in DETECTING_LEVELUPS state, handle skill selection
                     elif game_state == "DETECTING_LEVELUPS":
-                        print(f"In DETECTING_LEVELUPS: time elapsed = {current_time - state_start_time:.1f}s")
-                        if current_time - state_start_time > 3.0:  # Wait for stability
-                            print(f"About to click skill in DETECTING_LEVELUPS with regions: {skill_regions}")
-                            click_random_skill(skill_regions, topLeft)
+                        log_skills.debug("In DETECTING_LEVELUPS: time elapsed = %.1fs", current_time - state_start_time)
+                        if cards_ready("levelup_selection_delay"):  # Wait for stability
+                            log_skills.debug("About to click skill in DETECTING_LEVELUPS with regions: %s", skill_regions)
+                            click_skill_verified("DETECTING_LEVELUPS", "DETECTING_LEVELUPS")
+                            # Only a new level up re-arms the gate; a level up still showing after
+                            # the click waits the full fixed delay before it is clicked again
+                            stability_gate.reset()
                             # Stay in DETECTING_LEVELUPS state to continue farming
                             state_start_time = current_time
-                            print("Level up skill selected, continuing to detect levelups")
+                            log_state.info("Level up skill selected, continuing to detect levelups")
                     
                     # If we detect skills while in WAITING_FOR_START, the game has started but state wasn't updated
                     elif game_state == "WAITING_FOR_START":
-                        print(f"Skills detected while in WAITING_FOR_START - game has started, transitioning to skill selection")
-                        print(f"About to click skill with regions: {skill_regions}")
-                        click_random_skill(skill_regions, topLeft)
+                        log_state.info("Skills detected while in WAITING_FOR_START - game has started, transitioning to skill selection")
+                        log_skills.debug("About to click skill with regions: %s", skill_regions)
+                        click_skill_verified("WAITING_FOR_START", "WALKING_UP")
                         # Transition to WALKING_UP to walk forward after initial skill selection
                         game_state = "WALKING_UP"
                         state_start_time = current_time
-                        print("Game state changed to WALKING_UP")
+                        log_state.info("Game state changed to WALKING_UP")
                 
                 # Periodically check for both types of Start buttons (don't spam detection)
-                if current_time - last_detection_time > detection_cooldown:
-                    # Check if we're on home screen
-                    is_home = start_detector.is_on_home_screen(frame)
-                    
-                    # Check for both button types
-                    main_start_button = start_detector.detect_start_button(frame)
-                    carousel_start_button = carousel_detector.detect_start_button(frame)
-                    
+                if current_time - last_detection_time > timing["detection_cooldown"]:
                     if main_start_button:
-                        print(f"Main start button detected at: {main_start_button}")
+                        log_buttons.info("Main start button detected at: %s", main_start_button)
+                        # Only start a run on a fresh reading showing the energy it costs (always, without a
+                        # calibrated energy bar)
+                        has_energy = analysis_layout.energy is None or (energy_level is not None
+                                                                         and energy_level >= energy_options["min_level"])
+                        if (not has_energy and energy_level is not None and game_state == "WAITING_FOR_START"
+                                and energy_level != logged_energy_level):
+                            logged_energy_level = energy_level
+                            log_state.info("Waiting for energy: bar at %.0f%%, a run needs %.0f%%",
+                                           energy_level * 100, energy_options["min_level"] * 100)
                         # Auto-click main start button with Gaussian noise
-                        if current_time - last_click_time > click_cooldown and game_state == "WAITING_FOR_START":
+                        if (current_time - last_click_time > timing["click_cooldown"] and game_state == "WAITING_FOR_START"
+                                and has_energy):
                             # Generate Gaussian noise for position (25 pixels standard deviation)
                             noise_x = np.random.normal(0, 25)
                             noise_y = np.random.normal(0, 15)
                             
                             # Generate Gaussian delay (minimum 1 second, std dev 0.5 seconds)
-                            delay = max(1.0, np.random.normal(1.5, 0.5))
+                            delay = max(timing["start_click_delay_min"],
+                                        np.random.normal(timing["start_click_delay_mean"], timing["start_click_delay_std"]))
                             
-                            print(f"Auto-clicking main start button in {delay:.1f}s with noise ({noise_x:.1f}, {noise_y:.1f})")
+                            log_input.info("Auto-clicking main start button in %.1fs with noise (%.1f, %.1f)", delay, noise_x, noise_y)
+                            
+                            # Capture the button coordinates before threading
+                            captured_main_button = main_start_button
                             
                             # Schedule the click in a separate thread
                             def delayed_click():
-                                time.sleep(delay)
-                                click_start_button_with_noise(capture.window, main_start_button, topLeft, noise_x, noise_y)
+                                clock.sleep(delay)
+                                # The first attempt uses the noise logged above, retries draw fresh noise
+                                first_noise = [(noise_x, noise_y)]
+                                
+                                def perform():
+                                    click_noise = first_noise.pop() if first_noise else (np.random.normal(0, 25), np.random.normal(0, 15))
+                                    click_start_button_with_noise(capture.window, captured_main_button, layout.top_left, *click_noise, input_device)
+                                
+                                verifier.submit("start", perform, check=lambda result: result.main_start_button is None,
+                                                on_failure=revert_state("WAITING_FOR_START", "WAITING_FOR_SKILL_SELECTION"))
                                 nonlocal game_state, state_start_time
                                 game_state = "WAITING_FOR_SKILL_SELECTION"
-                                state_start_time = time.time()
-                                print("Game state changed to WAITING_FOR_SKILL_SELECTION")
+                                state_start_time = clock.time()
+                                log_state.info("Game state changed to WAITING_FOR_SKILL_SELECTION")
                             
-                            click_thread = threading.Thread(target=delayed_click)
-                            click_thread.daemon = True
-                            click_thread.start()
+                            clock.start_thread(delayed_click)
                             
                             last_click_time = current_time
                     if carousel_start_button:
-                        print(f"Carousel start button detected at: {carousel_start_button}")
+                        log_buttons.info("Carousel start button detected at: %s", carousel_start_button)
                         
                         # If walking up and found carousel, start clicking sequence
                         if game_state == "WALKING_UP":
-                            print("Starting carousel clicking sequence - button detected and in WALKING_UP state")
+                            log_carousel.info("Starting carousel clicking sequence - button detected and in WALKING_UP state")
                             game_state = "CAROUSEL_CLICKING"
                             state_start_time = current_time
-                            carousel_clicks_done = 0
-                            print("Game state changed to CAROUSEL_CLICKING")
-                            
-                            # Capture the button coordinates before threading
-                            captured_button = carousel_start_button
-                            
-                            # Start carousel clicking sequence
-                            def carousel_click_sequence():
-                                nonlocal carousel_clicks_done
-                                # Random number of clicks between 4-6
-                                num_clicks = np.random.randint(4, 7)  # 4, 5, or 6
-                                print(f"Carousel clicking sequence starting with {num_clicks} clicks")
-                                
-                                for i in range(num_clicks):
-                                    if carousel_clicks_done < num_clicks:
-                                        # Generate noise for each click
-                                        noise_x = np.random.normal(0, 25)
-                                        noise_y = np.random.normal(0, 25)
-                                        
-                                        click_start_button_with_noise(capture.window, captured_button, topLeft, noise_x, noise_y)
-                                        carousel_clicks_done += 1
-                                        print(f"Carousel click {carousel_clicks_done}/{num_clicks} completed")
-                                        
-                                        if i < num_clicks - 1:  # Don't wait after the last click
-                                            # Random delay between 500-700ms
-                                            delay = np.random.uniform(0.8, 1.2)
-                                            print(f"Waiting {delay*1000:.0f}ms before next carousel click")
-                                            time.sleep(delay)
-                                
-                                print("Carousel clicking sequence completed")
-                            
-                            click_thread = threading.Thread(target=carousel_click_sequence)
-                            click_thread.daemon = True
-                            click_thread.start()
+                            log_state.info("Game state changed to CAROUSEL_CLICKING")
+                            carousel.start(current_time)
                 
-                # Check if carousel clicking is complete and transition to walking down
-                if game_state == "CAROUSEL_CLICKING" and carousel_clicks_done >= 4:
-                    game_state = "WALKING_DOWN"
-                    walking_down_start_time = current_time
-                    print("Game state changed to WALKING_DOWN")
+                # Click the carousel until it resolves, then walk down
+                if game_state == "CAROUSEL_CLICKING":
+                    if carousel.update(carousel_start_button, main_start_button, level_up_detected, current_time):
+                        game_state = "WALKING_DOWN"
+                        walking_down_start_time = current_time
+                        log_state.info("Game state changed to WALKING_DOWN")
                 
                 # Check for run completion: main start button detected for 1.5+ seconds in DETECTING_LEVELUPS
                 if game_state == "DETECTING_LEVELUPS":
-                    main_start_button = start_detector.detect_start_button(frame)
-                    
                     if main_start_button:
                         # Start tracking if we just detected the button
                         if main_button_detected_start is None:
                             main_button_detected_start = current_time
-                            print("Main start button detected during farming - tracking for run completion")
+                            log_state.info("Main start button detected during farming - tracking for run completion")
                         
                         # Check if button has been detected for long enough
-                        elif current_time - main_button_detected_start >= main_button_detection_threshold:
-                            print(f"Run completed! Main start button detected for {current_time - main_button_detected_start:.1f}s")
+                        elif current_time - main_button_detected_start >= timing["run_complete_threshold"]:
+                            log_state.info("Run completed! Main start button detected for %.1fs", current_time - main_button_detected_start)
+                            run_recorder.run_completed()
                             game_state = "WAITING_FOR_START"
                             state_start_time = current_time
                             main_button_detected_start = None
                             level_up_detected = False
+                            levelup_detector.reset()
+                            stability_gate.reset()
                             skill_regions = None
-                            print("Game state changed to WAITING_FOR_START")
+                            log_state.info("Game state changed to WAITING_FOR_START")
                     else:
                         # Reset tracking if button is no longer detected
                         if main_button_detected_start is not None:
-                            print("Main start button no longer detected - resetting run completion tracking")
+                            log_state.info("Main start button no longer detected - resetting run completion tracking")
                             main_button_detected_start = None
                     
                     if is_home and not main_start_button and not carousel_start_button:
-                        print("On home screen but no start buttons clearly detected")
+                        log_buttons.debug("On home screen but no start buttons clearly detected")
                     
                     last_detection_time = current_time
                 
                 # Process frame for skills (your existing logic)
                 process_frame_for_skills(frame, positions)
-            
-            # Check for user input
-            if keyboard.is_pressed('c'):
-                capture.save_frame()
-                time.sleep(0.5)  # Prevent multiple saves
+                frame_monitor.mark("state_machine")
                 
-            if keyboard.is_pressed('h'):
-                # Manual home screen check
-                if frame is not None:
-                    is_home = start_detector.is_on_home_screen(frame)
-                    main_start_button = start_detector.detect_start_button(frame)
-                    carousel_start_button = carousel_detector.detect_start_button(frame)
-                    print(f"Home screen check - Is home: {is_home}")
-                    print(f"Main start button: {main_start_button}")
-                    print(f"Carousel start button: {carousel_start_button}")
-                time.sleep(0.5)
+                # Publish this frame's results for the debug view and other subscribers
+                result.level_up_detected = level_up_detected
+                verifier.update(result, current_time)
+                result.skill_regions = skill_regions
+                result.game_state = game_state
+                publisher.publish(result)
+                run_recorder.frame(current_time, game_state)
+                frame_monitor.mark("publish")
+                frame_monitor.end(result, analysis_tasks, analyses)
                 
-            if keyboard.is_pressed('enter'):
-                # Manual start button click - prioritize based on context
-                if frame is not None:
-                    main_start_button = start_detector.detect_start_button(frame)
-                    carousel_start_button = carousel_detector.detect_start_button(frame)
-                    
-                    # Determine which button to click based on priority
-                    button_to_click = None
-                    button_type = None
-                    
-                    if carousel_start_button:
-                        # Prioritize carousel button if available (game already started)
-                        button_to_click = carousel_start_button
-                        button_type = "carousel"
-                    elif main_start_button:
-                        # Use main start button if no carousel (home screen)
-                        button_to_click = main_start_button
-                        button_type = "main"
-                    
-                    if button_to_click:
-                        print(f"Clicking {button_type} start button")
-                        click_start_button(capture.window, button_to_click, topLeft)
-                    else:
-                        print("No start buttons detected for clicking")
-                time.sleep(0.5)
+                # Count state transitions, including those made by the click threads
+                if game_state != last_counted_state:
+                    metrics.inc("state_transitions_total", from_state=last_counted_state, to_state=game_state)
+                    last_counted_state = game_state
+            
+            # Time in state, frame freshness and detector liveness against their budgets
+            stall = watchdog.check(clock.time(), game_state, state_start_time, frame_seq, detectors_alive)
+            if stall is not None:
+                recover(stall)
+                watchdog.recovered(clock.time(), game_state)
+            
+            # Check for user input: keyboard when interactive, command channel when headless
+            commands = []
+            if keyboard is not None:
+                commands.extend((command, None) for key, command in KEYBOARD_COMMANDS.items() if keyboard.is_pressed(key))
+            if command_channel is not None:
+                commands.extend(command_channel.poll())
+            
+            for command, sender in commands:
+                reply = handle_command(command)
+                if sender is not None:
+                    command_channel.reply(sender, reply)
+                elif command != "stop":
+                    clock.sleep(timing["key_debounce"])  # Prevent repeats while the key is held
                 
-            time.sleep(0.1)  # Reduce CPU usage
+            clock.sleep(timing["loop_interval"])  # Reduce CPU usage
             
     except Exception as e:
-        print(f"Error in skill selection: {e}")
+        log.error("Error in skill selection: %s", e)
     finally:
         # Clean up
+        if renderer is not None:
+            publisher.unsubscribe(renderer.submit)
+            renderer.stop()
         capture.stop_capture()
+        executor.shutdown()
+
+
+def _default_input():
+    """pyautogui, imported on first use so startup and replays don't pay for it"""
+    import pyautogui
+    return pyautogui
+
+
+def _click(input_device, x, y, kind):
+    """Click and count it by `kind` ("start", "carousel", "skill" or "manual")"""
+    input_device.click(x, y)
+    metrics.inc("clicks_total", kind=kind)
 
 
-def click_start_button(window, start_button_bbox, roi_top_left):
+def warm_up_detectors(detectors, frame_shape, skill_regions):
+    """
+    Run the detectors and the skill classifier once on a blank frame so OpenCV's
+    lazy initialisation and first-call allocations happen before the first real frame
+    """
+    frame = np.zeros(frame_shape, dtype=np.uint8)
+    cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    for detector in detectors:
+        detector.detect_start_button(frame)
+        detector.last_mask = None
+    classify_skill_regions(frame, skill_regions)
+
+
+@metrics.timed("input")
+def click_start_button(window, start_button_bbox, roi_top_left, input_device=None):
     """
     Click the detected start button
     """
+    if input_device is None:
+        input_device = _default_input()
     x, y, w, h = start_button_bbox
     
     # Calculate center of button relative to ROI
@@ -537,20 +694,23 @@ def click_start_button(window, start_button_bbox, roi_top_left):
     absolute_x = roi_top_left[0] + button_center_x
     absolute_y = roi_top_left[1] + button_center_y
     
-    print(f"Clicking Start button at ({absolute_x}, {absolute_y})")
+    log_input.info("Clicking Start button at (%s, %s)", absolute_x, absolute_y)
     
     try:
         # Click the button
-        pyautogui.click(absolute_x, absolute_y)
-        print("Start button clicked successfully")
+        _click(input_device, absolute_x, absolute_y, "manual")
+        log_input.info("Start button clicked successfully")
     except Exception as e:
-        print(f"Error clicking start button: {e}")
+        log_input.error("Error clicking start button: %s", e)
 
 
-def click_start_button_with_noise(window, start_button_bbox, roi_top_left, noise_x, noise_y):
+@metrics.timed("input")
+def click_start_button_with_noise(window, start_button_bbox, roi_top_left, noise_x, noise_y, input_device=None, click_kind="start"):
     """
     Click the detected start button with Gaussian noise applied to position
     """
+    if input_device is None:
+        input_device = _default_input()
     x, y, w, h = start_button_bbox
     
     # Calculate center of button relative to ROI
@@ -565,82 +725,77 @@ def click_start_button_with_noise(window, start_button_bbox, roi_top_left, noise
     absolute_x = roi_top_left[0] + noisy_center_x
     absolute_y = roi_top_left[1] + noisy_center_y
     
-    print(f"Auto-clicking Start button at ({absolute_x:.1f}, {absolute_y:.1f}) with noise ({noise_x:.1f}, {noise_y:.1f})")
+    log_input.info("Auto-clicking Start button at (%.1f, %.1f) with noise (%.1f, %.1f)", absolute_x, absolute_y, noise_x, noise_y)
     
     try:
         # Click the button with noise
-        pyautogui.click(int(absolute_x), int(absolute_y))
-        print("Start button auto-clicked successfully")
+        _click(input_device, int(absolute_x), int(absolute_y), click_kind)
+        log_input.debug("Start button auto-clicked successfully")
     except Exception as e:
-        print(f"Error auto-clicking start button: {e}")
+        log_input.error("Error auto-clicking start button: %s", e)
 
 
-def click_random_skill(skill_regions, roi_top_left):
+@metrics.timed("input")
+def click_random_skill(layout, input_device=None):
     """
-    Click one of the 3 skill regions randomly with Gaussian noise
+    Click one of the 3 skill cards of a CalibrationLayout randomly with Gaussian noise.
+    Returns the index of the clicked card
     """
-    print(f"click_random_skill called with regions: {skill_regions}")
-    print(f"roi_top_left: {roi_top_left}")
-    
-    if not skill_regions or len(skill_regions) < 3:
-        print(f"Not enough skill regions to click. Regions: {skill_regions}, Count: {len(skill_regions) if skill_regions else 0}")
-        return
+    if input_device is None:
+        input_device = _default_input()
     
     # Choose random skill (0, 1, or 2)
-    random_skill_index = np.random.randint(0, 3)
-    selected_region = skill_regions[random_skill_index]
-    
-    x, y, w, h = selected_region
-    
-    # Calculate center of skill region
-    center_x = x + w // 2
-    center_y = y + h // 2
+    random_skill_index = np.random.randint(0, len(layout.card_clicks))
+    center_x, center_y = layout.card_clicks[random_skill_index]
     
     # Add Gaussian noise
     noise_x = np.random.normal(0, 25)
     noise_y = np.random.normal(0, 25)
     
-    noisy_x = center_x + noise_x
-    noisy_y = center_y + noise_y
+    # Card centres are already absolute screen coordinates
+    absolute_x = center_x + noise_x
+    absolute_y = center_y + noise_y
     
-    # Convert to absolute coordinates
-    absolute_x = roi_top_left[0] + noisy_x
-    absolute_y = roi_top_left[1] + noisy_y
-    
-    print(f"Clicking skill {random_skill_index + 1} at ({absolute_x:.1f}, {absolute_y:.1f}) with noise ({noise_x:.1f}, {noise_y:.1f})")
+    log_input.info("Clicking skill %d at (%.1f, %.1f) with noise (%.1f, %.1f)", random_skill_index + 1, absolute_x, absolute_y, noise_x, noise_y)
     
     try:
-        pyautogui.click(int(absolute_x), int(absolute_y))
-        print(f"Skill {random_skill_index + 1} clicked successfully")
+        _click(input_device, int(absolute_x), int(absolute_y), "skill")
+        log_input.debug("Skill %d clicked successfully", random_skill_index + 1)
     except Exception as e:
-        print(f"Error clicking skill: {e}")
+        log_input.error("Error clicking skill: %s", e)
+    return random_skill_index
 
 
-def handle_game_state_actions(game_state, current_time, walking_down_start_time):
+@metrics.timed("handle_game_state_actions")
+def handle_game_state_actions(game_state, current_time, walking_down_start_time, input_device=None, timing=None):
     """
     Handle continuous actions based on current game state
     Returns updated game state
     """
+    if input_device is None:
+        input_device = _default_input()
+    if timing is None:
+        timing = DEFAULT_TIMING
     if game_state == "WALKING_UP":
         # Press W to walk up
-        pyautogui.keyDown('w')
+        input_device.keyDown('w')
     elif game_state == "WALKING_DOWN":
         # Press S for 2 seconds
-        if current_time - walking_down_start_time < np.random.uniform(0.5, 0.7):
-            pyautogui.keyDown('s')
+        if current_time - walking_down_start_time < np.random.uniform(timing["walk_down_min"], timing["walk_down_max"]):
+            input_device.keyDown('s')
         else:
-            pyautogui.keyUp('s')
+            input_device.keyUp('s')
             # Transition to detecting levelups
             game_state = "DETECTING_LEVELUPS"
-            print("Game state changed to DETECTING_LEVELUPS")
+            log_state.info("Game state changed to DETECTING_LEVELUPS")
     elif game_state == "DETECTING_LEVELUPS":
         # Release all movement keys and stay still
-        pyautogui.keyUp('w')
-        pyautogui.keyUp('s')
+        input_device.keyUp('w')
+        input_device.keyUp('s')
     else:
         # Make sure no movement keys are pressed in other states
-        pyautogui.keyUp('w')
-        pyautogui.keyUp('s')
+        input_device.keyUp('w')
+        input_device.keyUp('s')
     
     return game_state
 
@@ -649,56 +804,73 @@ def process_frame_for_skills(frame, positions):
     """
     Process the captured frame to detect skill options in the defined regions
     """
-    detected_skills = []
+    if not isinstance(positions, dict) or positions.get('skill_regions') is None:
+        return []
     
-    if 'skill_regions' in positions and positions['skill_regions'] is not None:
-        for i, (x, y, w, h) in enumerate(positions['skill_regions']):
-            # Extract skill region from frame
-            # Note: coordinates are absolute, need to convert to frame coordinates if needed
-            skill_region = frame[y:y+h, x:x+w] if y >= 0 and x >= 0 and y+h <= frame.shape[0] and x+w <= frame.shape[1] else None
-            
-            if skill_region is not None and skill_region.size > 0:
-                skill_color = analyze_skill_color(skill_region)
-                if skill_color != "none":
-                    detected_skills.append({
-                        'region': i + 1,
-                        'color': skill_color,
-                        'bbox': (x, y, w, h)
-                    })
-    
-    return detected_skills
+    skill_results = classify_skill_regions(frame, positions['skill_regions'])
+    return [skill for skill in skill_results if skill['color'] != "none"]
+
+
+def map_skill_results(skill_results, layout, analysis_scale):
+    """Map classify_skill_regions results from analysis resolution back to the full-resolution layout"""
+    if analysis_scale == 1:
+        return skill_results
+    for skill in skill_results:
+        skill['bbox'] = layout.cards[skill['region'] - 1].bbox
+        skill['area'] = int(round(skill['area'] / (analysis_scale * analysis_scale)))
+    return skill_results
+
+
+def frame_brightness(frame):
+    """Mean gray level of a BGR frame"""
+    return np.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+
+def classify_skill_card(frame, card, index, color_ranges=None, min_fraction=None):
+    """
+    Classify one skill card (a layout Rect or (x, y, w, h) tuple in ROI coordinates)
+    `color_ranges` and `min_fraction` default to SKILL_COLOR_RANGES and SKILL_MIN_FRACTION
+    Returns: {'region', 'color', 'area', 'bbox'} dict, or None if the card is not inside the frame
+    """
+    if not isinstance(card, Rect):
+        card = Rect(*card)
+    if card.y < 0 or card.x < 0 or card.y2 > frame.shape[0] or card.x2 > frame.shape[1]:
+        return None
+    skill_region = frame[card.slices]
+    if skill_region.size == 0:
+        return None
+    
+    skill_color, color_area = analyze_skill_color_with_area(skill_region, color_ranges, min_fraction)
+    return {
+        'region': index + 1,
+        'color': skill_color,
+        'area': color_area,
+        'bbox': card.bbox
+    }
+
+
+def classify_skill_regions(frame, skill_regions, color_ranges=None, min_fraction=None):
+    """
+    Classify every skill region that lies inside the frame.
+    `skill_regions` are layout Rects (e.g. CalibrationLayout.cards) or (x, y, w, h) tuples in ROI coordinates
+    Returns: list of {'region', 'color', 'area', 'bbox'} dicts, including regions with color 'none'
+    """
+    skill_results = []
+    for i, card in enumerate(skill_regions):
+        skill = classify_skill_card(frame, card, i, color_ranges, min_fraction)
+        if skill is not None:
+            skill_results.append(skill)
+    return skill_results
 
 
 def create_skill_regions(skill_area_tl, skill_area_br, roi_top_left):
     """
-    Create 3 equal regions from the skill area divided by vertical lines at 1/3 and 2/3 width
+    Create 3 equal regions from the skill area divided by vertical lines at 1/3 and 2/3 width.
+    The main loop uses the precomputed CalibrationLayout.cards instead; this is kept for one-off use
     """
-    # Convert absolute coordinates to relative coordinates
-    area_x = skill_area_tl[0] - roi_top_left[0]
-    area_y = skill_area_tl[1] - roi_top_left[1]
-    area_w = skill_area_br[0] - skill_area_tl[0]
-    area_h = skill_area_br[1] - skill_area_tl[1]
-    
-    # Calculate precise division points at 1/3 and 2/3
-    one_third = area_w / 3.0
-    two_thirds = area_w * 2.0 / 3.0
-    
-    regions = []
-    
-    # Region 1: 0 to 1/3
-    regions.append((area_x, area_y, int(one_third), area_h))
-    
-    # Region 2: 1/3 to 2/3
-    regions.append((area_x + int(one_third), area_y, int(one_third), area_h))
-    
-    # Region 3: 2/3 to end (captures any remaining pixels)
-    region3_start = area_x + int(two_thirds)
-    region3_width = area_w - int(two_thirds)
-    regions.append((region3_start, area_y, region3_width, area_h))
-    
-    print(f"Skill area divided: Total width={area_w}, Region widths=[{int(one_third)}, {int(one_third)}, {region3_width}]")
-    
-    return regions
+    area = Rect.from_corners((skill_area_tl[0] - roi_top_left[0], skill_area_tl[1] - roi_top_left[1]),
+                             (skill_area_br[0] - roi_top_left[0], skill_area_br[1] - roi_top_left[1]))
+    return [card.bbox for card in split_cards(area)]
 
 
 def analyze_skill_color(skill_region):
@@ -710,53 +882,43 @@ def analyze_skill_color(skill_region):
     return color
 
 
-def analyze_skill_color_with_area(skill_region):
+@metrics.timed("analyze_skill_color_with_area")
+def analyze_skill_color_with_area(skill_region, color_ranges=None, min_fraction=None):
     """
     Analyze the skill region to determine its predominant color and calculate area
     Returns: (color_name, area_in_pixels)
     """
     if skill_region.size == 0:
         return "none", 0
+    if color_ranges is None:
+        color_ranges = SKILL_COLOR_RANGES
+    if min_fraction is None:
+        min_fraction = SKILL_MIN_FRACTION
     
     # Convert to HSV for better color analysis
-    hsv = cv2.cvtColor(skill_region, cv2.COLOR_BGR2HSV)
-    
-    height, width = skill_region.shape[:2]
+    with metrics.stage("hsv_convert"):
+        hsv = cv2.cvtColor(skill_region, cv2.COLOR_BGR2HSV)
+    return classify_hsv_color(hsv, color_ranges, min_fraction)
+
+
+def classify_hsv_color(hsv, color_ranges, min_fraction):
+    """
+    Predominant skill color of an already HSV-converted card region
+    Returns: (color_name, area_in_pixels)
+    """
+    height, width = hsv.shape[:2]
     total_pixels = height * width
     
-    # Create masks for each color and count pixels
-    # More permissive ranges for better detection
-    
-    # Green mask: broader range
-    green_mask = cv2.inRange(hsv, (35, 40, 40), (85, 255, 255))
-    green_area = cv2.countNonZero(green_mask)
-    
-    # Blue mask: broader range  
-    blue_mask = cv2.inRange(hsv, (95, 40, 40), (135, 255, 255))
-    blue_area = cv2.countNonZero(blue_mask)
-    
-    # Purple mask: broader range
-    purple_mask = cv2.inRange(hsv, (125, 40, 40), (165, 255, 255))
-    purple_area = cv2.countNonZero(purple_mask)
-    
-    # Gold/Yellow mask: broader range
-    gold_mask = cv2.inRange(hsv, (10, 40, 100), (40, 255, 255))
-    gold_area = cv2.countNonZero(gold_mask)
-    
-    # Find the color with the largest area (if any significant area)
-    color_areas = {
-        "green": green_area,
-        "blue": blue_area, 
-        "purple": purple_area,
-        "gold": gold_area
-    }
+    # Create a mask for each color and count pixels
+    color_areas = {color: cv2.countNonZero(cv2.inRange(hsv, lower, upper))
+                   for color, (lower, upper) in color_ranges.items()}
     
     # Find the color with maximum area
     max_color = max(color_areas.items(), key=lambda x: x[1])
     max_area = max_color[1]
     
-    # Require at least 5% of the region to be a color for detection
-    threshold = total_pixels * 0.05
+    # Require at least min_fraction (5%) of the region to be a color for detection
+    threshold = total_pixels * min_fraction
     
     if max_area > threshold:
         return max_color[0], max_area
@@ -764,17 +926,19 @@ def analyze_skill_color_with_area(skill_region):
         return "none", total_pixels
 
 
-def analyze_energy_level(frame, energy_tl, energy_br):
+def analyze_energy_level(frame, region, min_value=DEFAULT_ENERGY["min_value"],
+                         min_saturation=DEFAULT_ENERGY["min_saturation"]):
     """
-    Analyze the energy bar area to determine current energy level
+    Fill level (0-1) of the energy bar in the layout Rect `region`.
+    The bar is averaged down to one colour per column (a 1-D profile, no 2-D mask), and the level is
+    the share of columns that are bright and saturated like the filled part; the empty track is dark or gray
     """
-    # Extract energy bar region (you'd need to convert coordinates)
-    # energy_region = frame[energy_tl[1]:energy_br[1], energy_tl[0]:energy_br[0]]
-    
-    # Analyze the energy bar (look for specific colors, patterns, etc.)
-    # Return energy level percentage or boolean if ready
-    
-    return True  # Placeholder
+    blue, green, red = cv2.reduce(frame[region.slices], 0, cv2.REDUCE_AVG, dtype=cv2.CV_32F)[0].T
+    # Elementwise over the three channel rows; a max(axis=1) over the (w, 3) profile costs several times more
+    value = np.maximum(np.maximum(blue, green), red)
+    chroma = value - np.minimum(np.minimum(blue, green), red)
+    filled = (value >= min_value) & (chroma >= min_saturation * value)
+    return np.count_nonzero(filled) / len(filled)
 
 
 def detect_skill_options(frame, skill_positions):
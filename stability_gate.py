@@ -0,0 +1,74 @@
+"""
+Frame-stability gate for the skill cards.
+
+After a level up the cards animate in for a moment before they can be clicked.
+Instead of always waiting a fixed time, the gate compares a small grayscale
+thumbnail of the skill area between consecutive frames and reports "settled"
+once it has stopped changing for a few frames:
+
+    gate = StabilityGate(layout.skill_area, min_wait=0.3)
+    gate.start(now)                           # when the level up is detected
+    thumb = gate.features(frame)              # stateless, safe to run on the detector pool
+    if gate.update(thumb, now) or now > deadline:
+        click ...
+
+The caller keeps the old fixed wait as the deadline, so the gate can only
+shorten it; `time_saved(deadline, now)` is what the gate gained on one level up.
+"""
+
+import cv2
+import numpy as np
+
+
+class StabilityGate:
+    """Reports when the skill area has stopped changing"""
+    def __init__(self, skill_area, min_wait=0.3, threshold=2.0, settle_frames=2, thumb_width=64):
+        """
+        `skill_area` is a layout Rect in the coordinates of the frames passed to features().
+        The area counts as settled after `settle_frames` consecutive frames whose mean absolute
+        difference from the previous one is below `threshold` gray levels, and never before
+        `min_wait` seconds have passed since start()
+        """
+        self.skill_area = skill_area
+        self.thumb_size = (thumb_width, max(1, int(round(skill_area.h * thumb_width / max(1, skill_area.w)))))
+        self.min_wait = min_wait
+        self.threshold = threshold
+        self.settle_frames = settle_frames
+        self.reset()
+
+    def reset(self):
+        self.started_at = None
+        self.settled_at = None
+        self.previous = None
+        self.stable_frames = 0
+        self.last_change = None
+
+    def start(self, now):
+        """Begin watching for a new level up"""
+        self.reset()
+        self.started_at = now
+
+    @property
+    def settled(self):
+        return self.settled_at is not None
+
+    def features(self, frame):
+        """Grayscale thumbnail of the skill area of a BGR frame, as float32"""
+        gray = cv2.cvtColor(frame[self.skill_area.slices], cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def update(self, thumb, now):
+        """Feed one frame's thumbnail. Returns True once the skill area has settled"""
+        if self.started_at is None or self.settled_at is not None:
+            return self.settled
+        if self.previous is not None:
+            self.last_change = float(np.mean(np.abs(thumb - self.previous)))
+            self.stable_frames = self.stable_frames + 1 if self.last_change < self.threshold else 0
+        self.previous = thumb
+        if self.stable_frames >= self.settle_frames and now - self.started_at >= self.min_wait:
+            self.settled_at = now
+        return self.settled
+
+    def time_saved(self, deadline, now):
+        """Seconds between `now` and the fixed-wait `deadline` it replaces (0 once the deadline has passed)"""
+        return max(0.0, deadline - now)
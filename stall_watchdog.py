@@ -0,0 +1,105 @@
+"""
+Stall watchdog for the skill selection loop.
+
+The loop reports its state, the capture sequence number and whether the
+detectors produced output once per iteration. The watchdog returns a stall
+when any of them has made no progress for longer than its budget:
+
+    watchdog = StallWatchdog(timing)
+    stall = watchdog.check(now, game_state, state_start_time, frame_seq, detectors_alive)
+    if stall is not None:
+        recover(stall)          # release keys, re-detect the screen, known state
+        watchdog.recovered(now, new_state)
+
+    state      time in one game state is over its DEFAULT_STATE_BUDGETS entry
+    capture    no new frame for timing["frame_stall_budget"] seconds
+    detectors  no detector output for timing["detector_stall_budget"] seconds
+
+Each stall is counted in stalls_total{kind, state}. The time since the last
+progress is added to stall_lost_seconds_total{kind}.
+"""
+
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("watchdog")
+
+# Longest time in each game state, in seconds. None means no limit: the loop may idle on the home screen
+DEFAULT_STATE_BUDGETS = {
+    "WAITING_FOR_START": None,
+    "WAITING_FOR_SKILL_SELECTION": 30.0,  # Start clicked, first skill cards never showed
+    "WALKING_UP": 20.0,                   # Carousel never detected while holding 'w'
+    "CAROUSEL_CLICKING": 15.0,
+    "WALKING_DOWN": 5.0,
+    "DETECTING_LEVELUPS": 600.0,          # No level up or run end for 10 minutes
+}
+
+
+class Stall:
+    """One budget breach"""
+    __slots__ = ("kind", "state", "lost")
+
+    def __init__(self, kind, state, lost):
+        self.kind = kind
+        self.state = state
+        self.lost = lost
+
+    def __repr__(self):
+        return f"Stall({self.kind}, {self.state}, {self.lost:.1f}s)"
+
+
+class StallWatchdog:
+    """Tracks state time, frame freshness and detector liveness against budgets"""
+    def __init__(self, timing, state_budgets=None):
+        self.configure(timing, state_budgets)
+        self.state = None
+        self.state_since = None
+        self.last_seq = None
+        self.last_frame_at = None
+        self.last_detection_at = None
+        self.stalls = 0
+        self.lost_seconds = 0.0
+
+    def configure(self, timing, state_budgets=None):
+        """Set the budgets; also used to apply a reloaded config (see live_config.py)"""
+        self.state_budgets = dict(DEFAULT_STATE_BUDGETS, **(state_budgets or {}))
+        self.frame_budget = timing["frame_stall_budget"]
+        self.detector_budget = timing["detector_stall_budget"]
+
+    def check(self, now, state, state_start_time, frame_seq, detectors_alive):
+        """Record one loop iteration. Returns a Stall if a budget was exceeded, otherwise None"""
+        if state != self.state:
+            self.state = state
+            self.state_since = now
+        if frame_seq != self.last_seq or self.last_frame_at is None:
+            self.last_seq = frame_seq
+            self.last_frame_at = now
+        if detectors_alive or self.last_detection_at is None:
+            self.last_detection_at = now
+
+        # The loop moves state_start_time on progress within a state, e.g. a skill click in DETECTING_LEVELUPS
+        in_state = now - max(self.state_since, state_start_time)
+        budget = self.state_budgets.get(state)
+        if budget is not None and in_state > budget:
+            return self._stall("state", state, in_state)
+        if now - self.last_frame_at > self.frame_budget:
+            return self._stall("capture", state, now - self.last_frame_at)
+        if now - self.last_detection_at > self.detector_budget:
+            return self._stall("detectors", state, now - self.last_detection_at)
+        return None
+
+    def recovered(self, now, state):
+        """Restart every budget after a recovery action"""
+        self.state = state
+        self.state_since = now
+        self.last_frame_at = now
+        self.last_detection_at = now
+
+    def _stall(self, kind, state, lost):
+        self.stalls += 1
+        self.lost_seconds += lost
+        metrics.inc("stalls_total", kind=kind, state=state)
+        metrics.inc("stall_lost_seconds_total", lost, kind=kind)
+        log.warning("Stall detected: %s in %s, no progress for %.1fs", kind, state, lost)
+        return Stall(kind, state, lost)
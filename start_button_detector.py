@@ -2,66 +2,78 @@ import cv2
 import numpy as np
 from typing import Tuple, Optional, List
 import time
+import metrics
+from async_logging import get_logger
+
+
+log = get_logger("detector")
+
+# Very broad HSV color ranges (lower, upper) to catch any gold/yellow/orange. Override with hsv_ranges={...}
+DEFAULT_HSV_RANGES = {
+    "orange": ((0, 20, 20), (60, 255, 255)),   # Almost any warm color, broad range to yellow
+    "yellow": ((15, 10, 30), (45, 255, 255)),  # Alternative broad range, very low saturation threshold
+    "gold": ((0, 5, 40), (70, 255, 255)),      # Extremely broad catch-all, almost anything yellowish
+}
 
 
 class StartButtonDetector:
-    def __init__(self, start_tl=None, start_br=None, debug_name="start_button"):
-        # Very broad HSV color ranges to catch any gold/yellow/orange
-        self.lower_orange = np.array([0, 20, 20])       # Almost any warm color
-        self.upper_orange = np.array([60, 255, 255])    # Broad range to yellow
-        
-        # Alternative broad range
-        self.lower_yellow = np.array([15, 10, 30])      # Very low saturation threshold
-        self.upper_yellow = np.array([45, 255, 255])
-        
-        # Extremely broad catch-all range
-        self.lower_gold = np.array([0, 5, 40])          # Catch almost anything yellowish
-        self.upper_gold = np.array([70, 255, 255])
-        
-        # User-defined start button region
+    def __init__(self, start_tl=None, start_br=None, debug_name="start_button", region=None, hsv_ranges=None,
+                 min_button_area=0.7, max_button_area=0.99):
+        ranges = dict(DEFAULT_HSV_RANGES, **(hsv_ranges or {}))
+        self.lower_orange, self.upper_orange = (np.array(bound, dtype=np.uint8) for bound in ranges["orange"])
+        self.lower_yellow, self.upper_yellow = (np.array(bound, dtype=np.uint8) for bound in ranges["yellow"])
+        self.lower_gold, self.upper_gold = (np.array(bound, dtype=np.uint8) for bound in ranges["gold"])
+        
+        # User-defined start button region, either as corners or as a layout Rect (see layout.py)
+        if region is not None:
+            start_tl, start_br = region.tl, region.br
         self.start_tl = start_tl  # Top-left of start button area
         self.start_br = start_br  # Bottom-right of start button area
+        self.region = region
         
-        # Button size constraints (must be at least 70% of user-defined region)
-        self.min_button_area = 0.7   # Minimum 70% of region area
-        self.max_button_area = 0.99  # Maximum 99% of region area
+        # Button size constraints as fractions of the user-defined region (default 70% - 99%)
+        self.min_button_area = min_button_area
+        self.max_button_area = max_button_area
         
+        # Cleaned mask from the last detect_start_button call, kept for visualization
+        self.last_mask = None
+        self.last_mask_origin = None
+        
+    @metrics.timed("detect_start_button")
     def detect_start_button(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
         """
         Detect the Start button in the user-defined region
         Returns: (x, y, width, height) of button bounding box relative to frame, or None if not found
         """
+        self.last_mask = None
         if frame is None:
             return None
             
         # If no user-defined region is set, return None
         if not self.start_tl or not self.start_br:
-            print("Warning: Start button region not defined. Please run calibration.")
+            log.warning("Warning: Start button region not defined. Please run calibration.")
             return None
             
-        frame_height, frame_width = frame.shape[:2]
-        
-        # Extract user-defined region from frame
-        x1, y1 = self.start_tl
-        x2, y2 = self.start_br
-        
-        # Ensure coordinates are within frame bounds
-        x1 = max(0, min(x1, frame_width - 1))
-        y1 = max(0, min(y1, frame_height - 1))
-        x2 = max(x1 + 1, min(x2, frame_width))
-        y2 = max(y1 + 1, min(y2, frame_height))
-        
         # Extract the region of interest
+        x1, y1, x2, y2 = self._roi_bounds(frame)
         roi = frame[y1:y2, x1:x2]
         
         if roi.size == 0:
             return None
-            
-        roi_height, roi_width = roi.shape[:2]
-        roi_area = roi_height * roi_width
         
         # Convert ROI to HSV for better color detection
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        with metrics.stage("hsv_convert"):
+            hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        return self.detect_in_hsv(hsv, (x1, y1))
+    
+    def detect_in_hsv(self, hsv: np.ndarray, origin=(0, 0)) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Detect the Start button in an already HSV-converted search region whose top-left
+        corner is at `origin` in the frame (used by threshold_tuner.py to reuse conversions)
+        """
+        x1, y1 = origin
+        roi_height, roi_width = hsv.shape[:2]
+        roi_area = roi_height * roi_width
         
         # Create masks for orange/yellow/gold colors with multiple ranges
         mask1 = cv2.inRange(hsv, self.lower_orange, self.upper_orange)
@@ -75,6 +87,8 @@ class StartButtonDetector:
         # Clean up the mask
         kernel = np.ones((3, 3), np.uint8)
         mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        self.last_mask = mask
+        self.last_mask_origin = (x1, y1)
         
         # Find contours in the ROI
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -103,17 +117,13 @@ class StartButtonDetector:
         return (frame_x, frame_y, roi_w, roi_h)
 
     
-    def get_detection_masks(self, frame: np.ndarray) -> Optional[np.ndarray]:
-        """
-        Get the color detection masks for visualization
-        Returns: Combined mask showing detected colors in the user-defined region
-        """
-        if frame is None or not self.start_tl or not self.start_br:
-            return None
-            
+    def _roi_bounds(self, frame):
+        """(x1, y1, x2, y2) of the search region, clamped to the frame unless the layout region already fits"""
         frame_height, frame_width = frame.shape[:2]
+        region = self.region
+        if region is not None and region.x2 <= frame_width and region.y2 <= frame_height:
+            return region.x, region.y, region.x2, region.y2
         
-        # Extract user-defined region
         x1, y1 = self.start_tl
         x2, y2 = self.start_br
         
@@ -122,15 +132,29 @@ class StartButtonDetector:
         y1 = max(0, min(y1, frame_height - 1))
         x2 = max(x1 + 1, min(x2, frame_width))
         y2 = max(y1 + 1, min(y2, frame_height))
+        return x1, y1, x2, y2
+    
+    @metrics.timed("get_detection_masks")
+    def get_detection_masks(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Get the color detection masks for visualization
+        Returns: Combined mask showing detected colors in the user-defined region
+        """
+        if frame is None or not self.start_tl or not self.start_br:
+            return None
+            
+        frame_height, frame_width = frame.shape[:2]
         
         # Extract the region of interest
+        x1, y1, x2, y2 = self._roi_bounds(frame)
         roi = frame[y1:y2, x1:x2]
         
         if roi.size == 0:
             return None
         
         # Convert ROI to HSV for better color detection
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        with metrics.stage("hsv_convert"):
+            hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
         
         # Create masks for orange/yellow/gold colors with multiple ranges
         mask1 = cv2.inRange(hsv, self.lower_orange, self.upper_orange)
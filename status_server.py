@@ -0,0 +1,199 @@
+"""
+Local HTTP status and preview endpoint.
+
+Serves what an instance is doing without a console window:
+
+    GET /status      current game state and detections as JSON
+    GET /metrics     counters and stage timings in the Prometheus text format
+    GET /frame.jpg   latest frame with the debug overlay, as JPEG
+
+The server only reads the newest FrameResult from the ResultPublisher, so the
+decision loop does no extra work for it. The annotated JPEG is rendered and
+encoded on the request thread. It is cached per frame sequence number, and it
+is re-encoded at most `max_fps` times per second however often it is polled.
+
+Bound to 127.0.0.1. Start it with `python main.py --status-port 47801`, or
+against a recorded session with no display at all:
+
+    python status_server.py --replay recordings/session1 --positions positions.json
+    curl http://127.0.0.1:47801/status
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+import metrics
+from async_logging import get_logger
+
+
+DEFAULT_STATUS_PORT = 47801
+log = get_logger("status_server")
+
+
+class StatusServer:
+    """HTTP server exposing the latest published FrameResult"""
+    def __init__(self, publisher, layout, port=DEFAULT_STATUS_PORT, host="127.0.0.1", max_fps=2.0, jpeg_quality=80):
+        from debug_display import DebugRenderer
+        from layout import as_layout
+        self.publisher = publisher
+        # Only its render() is used; no window is opened
+        self.renderer = DebugRenderer(as_layout(layout), scale_factor=1.0)
+        self.min_interval = 1.0 / max_fps
+        self.jpeg_quality = jpeg_quality
+        self.started_at = time.time()
+
+        self._encode_lock = Lock()
+        self._jpeg = None
+        self._jpeg_seq = None
+        self._encoded_at = 0.0
+        self.encodes = 0
+        self.cache_hits = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = Thread(target=self.httpd.serve_forever, name="status_server")
+        self.thread.daemon = True
+        self.thread.start()
+        log.info("Status server on http://127.0.0.1:%d (/status, /metrics, /frame.jpg)", self.port)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def status(self):
+        """Current state as a JSON-serialisable dict"""
+        result = self.publisher.latest()
+        status = {"uptime_s": time.time() - self.started_at, "preview_encodes": self.encodes,
+                  "preview_cache_hits": self.cache_hits}
+        if result is None:
+            status["frame"] = None
+            return status
+        status.update({
+            "frame": result.seq,
+            "timestamp": result.timestamp,
+            "game_state": result.game_state,
+            "level_up_detected": result.level_up_detected,
+            "brightness": None if result.brightness is None else float(result.brightness),
+            "main_start_button": _plain(result.main_start_button),
+            "carousel_start_button": _plain(result.carousel_start_button),
+            "skills": [skill['color'] for skill in result.skill_results],
+            "energy": result.energy,
+            "analysis_scale": result.analysis_scale,
+        })
+        return status
+
+    def preview_jpeg(self):
+        """(jpeg_bytes, seq) of the latest annotated frame, or (None, None) before the first frame"""
+        import cv2
+        with self._encode_lock:
+            result = self.publisher.latest()
+            if result is None or result.frame is None:
+                return None, None
+            fresh = result.seq != self._jpeg_seq
+            throttled = time.monotonic() - self._encoded_at < self.min_interval
+            if self._jpeg is not None and (not fresh or throttled):
+                self.cache_hits += 1
+                return self._jpeg, self._jpeg_seq
+            ok, encoded = cv2.imencode(".jpg", self.renderer.render(result),
+                                       [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                return self._jpeg, self._jpeg_seq
+            self._jpeg = encoded.tobytes()
+            self._jpeg_seq = result.seq
+            self._encoded_at = time.monotonic()
+            self.encodes += 1
+            metrics.inc("preview_encodes_total")
+            return self._jpeg, self._jpeg_seq
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/status":
+                    self._send(200, "application/json", json.dumps(server.status()).encode("utf-8"))
+                elif path == "/metrics":
+                    self._send(200, "text/plain; version=0.0.4", metrics.REGISTRY.to_prometheus().encode("utf-8"))
+                elif path == "/frame.jpg":
+                    jpeg, seq = server.preview_jpeg()
+                    if jpeg is None:
+                        self._send(503, "text/plain", b"no frame yet\n")
+                    else:
+                        self._send(200, "image/jpeg", jpeg, {"X-Frame-Seq": str(seq)})
+                else:
+                    self._send(404, "text/plain", b"endpoints: /status /metrics /frame.jpg\n")
+
+            def _send(self, code, content_type, body, headers=None):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug("%s %s", self.address_string(), format % args)
+
+        return Handler
+
+
+def _plain(bbox):
+    return None if bbox is None else [int(value) for value in bbox]
+
+
+def serve_replay(session_dir, positions, port=DEFAULT_STATUS_PORT, loop=False):
+    """Run the loop headless on a recorded session in real time with the status server attached"""
+    from clock import SystemClock
+    from frame_results import ResultPublisher
+    from layout import as_layout
+    from replay_capture import ReplayCapture, RecordingInput
+    from skillSelection import skillSelection
+
+    if not metrics.REGISTRY.enabled:
+        metrics.enable(interval=None)  # Collect for /metrics without writing files
+    publisher = ResultPublisher()
+    server = StatusServer(publisher, as_layout(positions), port)
+    server.start()
+    try:
+        while True:
+            clock = SystemClock()
+            capture = ReplayCapture.from_directory(session_dir, clock=clock)
+            stop_flag = {'stop': False}
+
+            def stop_at_end(result):
+                stop_flag['stop'] = capture.is_finished()
+
+            publisher.subscribe(stop_at_end)
+            skillSelection(positions, stop_flag, publisher=publisher, capture=capture,
+                           input_device=RecordingInput(clock=clock), clock=clock, headless=True)
+            publisher.unsubscribe(stop_at_end)
+            if not loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    from async_logging import setup_logging
+    from layout import load_layout
+
+    parser = argparse.ArgumentParser(description="Status and preview server on a replayed session")
+    parser.add_argument("--replay", required=True, help="Recorded session directory")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recording")
+    parser.add_argument("--port", type=int, default=DEFAULT_STATUS_PORT)
+    parser.add_argument("--loop", action="store_true", help="Replay the session over and over")
+    args = parser.parse_args()
+    setup_logging("INFO")
+    serve_replay(args.replay, load_layout(args.positions), args.port, args.loop)
@@ -0,0 +1,348 @@
+"""
+Procedural synthetic game-area frames with ground truth.
+
+Renders frames for a calibration layout at any resolution, for tests and scale
+runs where real emulator screens aren't available:
+
+    generator = SyntheticFrameGenerator(load_layout("positions.json").scaled(0.5), noise_std=4, jpeg_quality=80)
+    frame, truth = generator.render("skill_cards", colors=("gold", "blue", "none"))
+    for frame, truth in generator.stream(10000):
+        ...
+
+Kinds follow the replay_capture.py labels: "gameplay", "home", "results",
+"carousel" and "skill_cards". Home and results screens have a gold Start button
+inside the start region, and carousel screens one inside the carousel region.
+When the layout has an energy bar, home and results screens fill it to a given
+or random level, with a white "n/20" label across it.
+Skill cards are drawn into the layout's three cards on a dimmed screen whose
+mean brightness lands in the level-up band; with `fade` below 1 the overlay is
+only partly faded in. Gameplay is a muted, noisy scene that is coherent from
+frame to frame: the terrain scrolls a little every frame and a few sprites move
+across it, so consecutive frames differ the way real gameplay does. The scene
+pauses while skill cards are shown. `truth` holds the label, the button
+boxes the detectors should return, the card colours and the energy level: the
+fields dataset_builder.py writes, plus energy. Sessions written by write_synthetic_session() can
+therefore be replayed, benchmarked and used for threshold_tuner.py; they include
+the layout they were drawn for as positions.json.
+
+render() advances the scene by one frame and draws it with fresh noise and
+compression every call. For throughput tests, stream() cycles through
+`variants` pre-rendered frames per kind, each on a new scene, so it can feed
+thousands of frames per second to the detectors.
+
+    python synthetic_frames.py session recordings/synthetic --positions positions.json --jpeg-quality 80
+    python synthetic_frames.py stream --frames 20000 --scale 0.5
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from layout import iou
+
+
+POSITIONS_FILE = "positions.json"
+KINDS = ("gameplay", "home", "results", "carousel", "skill_cards")
+SKILL_COLORS = ("green", "blue", "purple", "gold")
+
+# Rarity colours drawn on the cards (BGR), well inside skillSelection.SKILL_COLOR_RANGES
+CARD_COLORS = {
+    "green": (40, 200, 60),
+    "blue": (220, 110, 30),
+    "purple": (200, 40, 150),
+    "gold": (40, 180, 235),
+}
+BUTTON_COLOR = (20, 170, 245)  # Gold/orange Start button (BGR)
+BUTTON_FILL = 0.85             # Fraction of the region the button covers, between the detector's 70% and 99%
+ENERGY_COLOR = (235, 170, 40)  # Filled part of the energy bar (BGR)
+ENERGY_TRACK = (45, 45, 45)    # Empty part
+ENERGY_MAX = 20
+
+# Mean brightness targets of BrightnessLevelUpDetector's bands
+NORMAL_BRIGHTNESS = 130
+LEVELUP_BRIGHTNESS = 85
+
+# Screen sequence of write_synthetic_session(): (kind, seconds) or (kind, seconds, fade-in seconds)
+DEFAULT_SCRIPT = (
+    ("home", 3), ("gameplay", 3), ("skill_cards", 4), ("gameplay", 3), ("carousel", 5),
+    ("gameplay", 3), ("skill_cards", 5, 1.0), ("gameplay", 3), ("results", 8),
+)
+
+
+class SyntheticFrameGenerator:
+    """Renders labelled frames for one layout"""
+    def __init__(self, layout, noise_std=4.0, jpeg_quality=None, seed=0, variants=8):
+        """
+        Frames are `layout.size`; use layout.scaled(f) for other resolutions. `noise_std` is the
+        per-pixel Gaussian noise, `jpeg_quality` (e.g. 70) adds compression artifacts when set.
+        stream() pre-renders `variants` frames per kind
+        """
+        self.layout = layout
+        self.noise_std = noise_std
+        self.jpeg_quality = jpeg_quality
+        self.rng = np.random.default_rng(seed)
+        self.variants = variants
+        self._pool = None
+        self._terrain = None  # Gameplay scene, created on first use (see _new_scene)
+        self._scroll = 0.0
+        self._scroll_speed = 0.0
+        self._sprites = None
+
+    def _max_shape(self):
+        """Shape radius bound: the smaller button region, so no single blob can pass as a button"""
+        return max(2, min(self.layout.start.w, self.layout.start.h, self.layout.carousel.w, self.layout.carousel.h) // 2)
+
+    def _new_scene(self):
+        """Terrain one frame high that wraps around vertically, and sprites with positions and velocities"""
+        width, height = self.layout.size
+        # Cool, barely saturated gray: outside the Start button's warm hues and below the skill colours' saturation
+        gray = self.rng.uniform(110, 150)
+        base = np.array([gray + self.rng.uniform(8, 15), gray + self.rng.uniform(0, 4), gray])
+        # A periodic gradient, so the terrain has no seam where it wraps
+        gradient = 20 * np.cos(np.linspace(0, 2 * np.pi, height, endpoint=False, dtype=np.float32))[:, None, None]
+        terrain = np.clip(base[None, None, :] + gradient + np.zeros((height, width, 3), np.float32), 0, 255)
+        terrain = terrain.astype(np.uint8)
+        max_side = self._max_shape()
+        for _ in range(int(self.rng.integers(5, 15))):
+            center = (int(self.rng.integers(0, width)), int(self.rng.integers(0, height)))
+            radius = int(self.rng.integers(1, max_side))
+            color = tuple(int(value) for value in self.rng.integers(40, 220, size=3))
+            for shift in (-height, 0, height):
+                cv2.circle(terrain, (center[0], center[1] + shift), radius, color, -1)
+        self._terrain = terrain
+        self._scroll = 0.0
+        # Speeds in pixels per frame, relative to the frame width so every resolution moves alike
+        speed = width / 100.0
+        self._sprites = [{
+            "position": self.rng.uniform((0, 0), (width, height)),
+            "velocity": self.rng.uniform(-2 * speed, 2 * speed, size=2),
+            "radius": int(self.rng.integers(1, max_side)),
+            "color": tuple(int(value) for value in self.rng.integers(40, 220, size=3)),
+        } for _ in range(int(self.rng.integers(3, 7)))]
+        self._scroll_speed = self.rng.uniform(0.3, 1.0) * speed
+
+    def _advance(self):
+        """Move the scene on by one frame: scroll the terrain and bounce the sprites off the edges"""
+        width, height = self.layout.size
+        self._scroll = (self._scroll + self._scroll_speed) % height
+        for sprite in self._sprites:
+            position, velocity = sprite["position"], sprite["velocity"]
+            position += velocity
+            for axis, limit in ((0, width), (1, height)):
+                if not 0 <= position[axis] < limit:
+                    velocity[axis] = -velocity[axis]
+                    position[axis] = min(max(position[axis], 0), limit - 1)
+
+    def _background(self, advance=True):
+        """Current gameplay scene, moved on by one frame unless `advance` is False"""
+        if self._terrain is None:
+            self._new_scene()
+        elif advance:
+            self._advance()
+        frame = np.roll(self._terrain, -int(self._scroll), axis=0)
+        for sprite in self._sprites:
+            x, y = sprite["position"]
+            cv2.circle(frame, (int(x), int(y)), sprite["radius"], sprite["color"], -1)
+        return _match_brightness(frame, NORMAL_BRIGHTNESS)
+
+    def _draw_button(self, frame, region):
+        """Gold button covering BUTTON_FILL of `region`, centred. Returns its (x, y, w, h)"""
+        side = np.sqrt(BUTTON_FILL)
+        w, h = max(1, int(round(region.w * side))), max(1, int(round(region.h * side)))
+        x, y = region.x + (region.w - w) // 2, region.y + (region.h - h) // 2
+        cv2.rectangle(frame, (x, y), (x + w - 1, y + h - 1), BUTTON_COLOR, -1)
+        # Dark label: only makes holes, which don't change the outer contour
+        scale = h / 60.0
+        if scale > 0.2:
+            cv2.putText(frame, "START", (x + w // 5, y + int(h * 0.7)), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        (30, 30, 60), max(1, int(round(scale * 2))))
+        return (x, y, w, h)
+
+    def _draw_cards(self, frame, colors):
+        card_mask = np.zeros(frame.shape[:2], dtype=bool)
+        for card, color in zip(self.layout.cards, colors):
+            inset_x, inset_y = max(1, card.w // 10), max(1, card.h // 10)
+            x1, y1, x2, y2 = card.x + inset_x, card.y + inset_y, card.x2 - inset_x, card.y2 - inset_y
+            cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), (70, 70, 70), -1)
+            if color != "none":
+                # Rarity-coloured art in the upper part of the card
+                art_y2 = y1 + (y2 - y1) * 3 // 5
+                cv2.rectangle(frame, (x1 + inset_x, y1 + inset_y), (x2 - 1 - inset_x, art_y2), CARD_COLORS[color], -1)
+            card_mask[y1:y2, x1:x2] = True
+        return card_mask
+
+    def _draw_energy(self, frame, level):
+        """Energy bar filled to `level` (0-1) with its label. Returns the drawn fill level"""
+        bar = self.layout.energy
+        filled = int(round(level * bar.w))
+        frame[bar.slices] = ENERGY_TRACK
+        frame[bar.y:bar.y2, bar.x:bar.x + filled] = ENERGY_COLOR
+        scale = bar.h / 40.0
+        if scale > 0.15:
+            cv2.putText(frame, f"{int(round(level * ENERGY_MAX))}/{ENERGY_MAX}",
+                        (bar.x + bar.w * 2 // 5, bar.y + int(bar.h * 0.75)), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        (255, 255, 255), 1)
+        return filled / bar.w
+
+    def render(self, kind, colors=None, energy=None, fade=1.0):
+        """
+        One new frame of `kind`. `colors` picks the skill cards and `energy` (0-1) the energy bar
+        level of home and results screens (random if None). `fade` (0-1] is how far the level-up
+        overlay has faded in over the paused gameplay. Returns (frame, truth)
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown frame kind '{kind}', expected one of {', '.join(KINDS)}")
+        # The game pauses behind the level-up screen
+        frame = self._background(advance=kind != "skill_cards")
+        truth = {"label": kind, "main_start_button": None, "carousel_start_button": None, "skills": [],
+                 "energy": None}
+        if kind in ("home", "results"):
+            truth["main_start_button"] = self._draw_button(frame, self.layout.start)
+            if self.layout.energy is not None:
+                truth["energy"] = self._draw_energy(frame, self.rng.uniform(0, 1) if energy is None else energy)
+        elif kind == "carousel":
+            truth["carousel_start_button"] = self._draw_button(frame, self.layout.carousel)
+        elif kind == "skill_cards":
+            if colors is None:
+                colors = tuple(str(color) for color in self.rng.choice(SKILL_COLORS, size=len(self.layout.cards)))
+            gameplay = frame.copy()
+            card_mask = self._draw_cards(frame, colors)
+            frame = _match_brightness(frame, LEVELUP_BRIGHTNESS, fixed=card_mask)
+            if fade < 1:
+                frame = cv2.addWeighted(gameplay, 1 - fade, frame, fade, 0)
+            truth["skills"] = list(colors)
+
+        if self.noise_std:
+            noise = np.empty(frame.shape, dtype=np.int16)
+            cv2.randn(noise, 0, self.noise_std)
+            frame = cv2.add(frame, noise, dtype=cv2.CV_8U)
+        if self.jpeg_quality is not None:
+            _, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            frame = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        truth["main_start_button"] = _plain(truth["main_start_button"])
+        truth["carousel_start_button"] = _plain(truth["carousel_start_button"])
+        return frame, truth
+
+    def stream(self, count, kinds=KINDS):
+        """Yield `count` (frame, truth) pairs cycling through pre-rendered variants of `kinds`"""
+        if self._pool is None:
+            self._pool = []
+            for _ in range(self.variants):
+                self._terrain = None  # A new scene per variant
+                self._pool.extend(self.render(kind) for kind in KINDS)
+        pool = [entry for entry in self._pool if entry[1]["label"] in kinds]
+        for i in range(count):
+            yield pool[i % len(pool)]
+
+
+def _match_brightness(frame, target, fixed=None):
+    """Scale the pixels outside `fixed` so the frame's mean gray level is `target`"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    if fixed is None:
+        fixed = np.zeros(gray.shape, dtype=bool)
+    variable = gray[~fixed].sum()
+    if variable <= 0:
+        return frame
+    factor = (target * gray.size - gray[fixed].sum()) / variable
+    scaled = np.clip(frame.astype(np.float32) * max(0.0, factor), 0, 255).astype(np.uint8)
+    scaled[fixed] = frame[fixed]
+    return scaled
+
+
+def _plain(bbox):
+    return None if bbox is None else [int(value) for value in bbox]
+
+
+def write_synthetic_session(session_dir, generator, script=DEFAULT_SCRIPT, fps=10, image_ext=".png", energy=1.0):
+    """
+    Render `script` ((kind, seconds) or (kind, seconds, fade-in seconds) tuples) at `fps` as a recorded
+    session with ground truth labels. Home and results screens show the energy bar at `energy`
+    """
+    from replay_capture import write_session
+    entries = []
+    extras = []
+    t = 0.0
+    for kind, seconds, *fade_in in script:
+        # A level-up shows the same cards until one is picked
+        colors = tuple(str(color) for color in generator.rng.choice(SKILL_COLORS, size=len(generator.layout.cards))) \
+            if kind == "skill_cards" else None
+        fade_frames = int(round(fade_in[0] * fps)) if fade_in else 0
+        for i in range(int(round(seconds * fps))):
+            fade = (i + 1) / (fade_frames + 1) if i < fade_frames else 1.0
+            frame, truth = generator.render(kind, colors, energy, fade)
+            entries.append((t, kind, frame))
+            extras.append({key: value for key, value in truth.items() if key != "label"})
+            t += 1.0 / fps
+    write_session(session_dir, entries, image_ext, extras)
+    # The layout the frames were drawn for, usable as --positions when replaying them
+    with open(os.path.join(session_dir, POSITIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump(generator.layout.to_positions(), f, indent=4)
+    return len(entries)
+
+
+def measure_stream(generator, frames):
+    """
+    Feed `frames` streamed frames to the Start button detectors, the skill classifier and the energy bar
+    reader. Returns a report dict
+    """
+    from skillSelection import analyze_energy_level, classify_skill_regions
+    from start_button_detector import StartButtonDetector
+
+    layout = generator.layout
+    start_detector = StartButtonDetector(debug_name="start_button", region=layout.start)
+    carousel_detector = StartButtonDetector(debug_name="carousel_button", region=layout.carousel)
+    stream = list(generator.stream(frames))  # Render the pool before timing
+    errors = {"start": 0, "carousel": 0, "skills": 0, "energy": 0}
+    started = time.perf_counter()
+    for frame, truth in stream:
+        for name, detector, key in (("start", start_detector, "main_start_button"),
+                                    ("carousel", carousel_detector, "carousel_start_button")):
+            found = detector.detect_start_button(frame)
+            expected = truth[key]
+            if (found is None) != (expected is None) or (found is not None and iou(found, expected) < 0.5):
+                errors[name] += 1
+        if truth["skills"]:
+            colors = [skill['color'] for skill in classify_skill_regions(frame, layout.cards)]
+            errors["skills"] += colors != truth["skills"]
+        if truth["energy"] is not None:
+            # Within one unit of energy
+            errors["energy"] += abs(analyze_energy_level(frame, layout.energy) - truth["energy"]) > 1 / ENERGY_MAX
+    elapsed = time.perf_counter() - started
+    return {"frames": frames, "frames_per_second": frames / elapsed, "errors": errors}
+
+
+if __name__ == "__main__":
+    from layout import load_layout
+
+    parser = argparse.ArgumentParser(description="Synthetic frames with ground truth")
+    parser.add_argument("command", choices=["session", "stream"],
+                        help="session: write a recorded session; stream: detector throughput and accuracy")
+    parser.add_argument("output", nargs="?", help="Session directory (session command)")
+    parser.add_argument("--positions", default="positions.json", help="Layout the frames are drawn for")
+    parser.add_argument("--scale", type=float, default=1.0, help="Render at this fraction of the layout's size")
+    parser.add_argument("--noise", type=float, default=4.0, help="Gaussian noise standard deviation")
+    parser.add_argument("--jpeg-quality", type=int, default=None, help="Add JPEG artifacts at this quality")
+    parser.add_argument("--fps", type=float, default=10, help="Frame rate of the written session")
+    parser.add_argument("--frames", type=int, default=10000, help="Frames to stream")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    layout = load_layout(args.positions)
+    if args.scale != 1:
+        layout = layout.scaled(args.scale)
+    generator = SyntheticFrameGenerator(layout, args.noise, args.jpeg_quality, args.seed)
+    if args.command == "session":
+        if not args.output:
+            parser.error("session needs an output directory")
+        count = write_synthetic_session(args.output, generator, fps=args.fps)
+        print(f"Wrote {count} frames of {layout.size[0]}x{layout.size[1]} to {args.output}")
+    else:
+        report = measure_stream(generator, args.frames)
+        print(f"{report['frames']} frames at {layout.size[0]}x{layout.size[1]}: "
+              f"{report['frames_per_second']:.0f} frames/s through both button detectors, the skill classifier "
+              f"and the energy reader")
+        print("Mismatches with ground truth: " + ", ".join(f"{key}={value}" for key, value in report["errors"].items()))
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layout import CalibrationLayout  # noqa: E402
+from synthetic_frames import SyntheticFrameGenerator  # noqa: E402
+
+
+POSITIONS = {
+    "top-left": [0, 0], "bottom-right": [400, 600],
+    "start-tl": [100, 500], "start-br": [300, 560],
+    "skill-area-tl": [20, 200], "skill-area-br": [380, 400],
+    "carousel-tl": [100, 100], "carousel-br": [300, 150],
+    "energy-tl": [120, 15], "energy-br": [280, 35],
+}
+
+
+@pytest.fixture
+def layout():
+    return CalibrationLayout.from_positions(POSITIONS)
+
+
+@pytest.fixture
+def generator(layout):
+    return SyntheticFrameGenerator(layout, seed=1)
+
+
+FRAME_INTERVAL = 0.1
+
+
+@pytest.fixture
+def frames(generator):
+    """
+    frames(screens, **render_args) renders one frame per kind in `screens` and yields
+    (time, kind, frame), the first at FRAME_INTERVAL and each FRAME_INTERVAL after the last
+    """
+    def step(screens, **render_args):
+        for i, kind in enumerate(screens):
+            frame, _ = generator.render(kind, **render_args)
+            yield (i + 1) * FRAME_INTERVAL, kind, frame
+    return step
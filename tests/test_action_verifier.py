@@ -0,0 +1,52 @@
+from action_verifier import ActionVerifier
+from frame_results import FrameResult
+from start_button_detector import StartButtonDetector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+def run(frames, layout, screens, deadline=0.5, retries=2):
+    """Submit a start click, then feed the verifier one frame per kind in `screens`"""
+    clock = FakeClock()
+    verifier = ActionVerifier(clock, deadline=deadline, retries=retries)
+    detector = StartButtonDetector(region=layout.start)
+    calls = {"perform": 0, "success": 0, "failure": 0}
+
+    def perform():
+        calls["perform"] += 1
+
+    verifier.submit("start", perform, check=lambda result: result.main_start_button is None,
+                    on_success=lambda: calls.__setitem__("success", calls["success"] + 1),
+                    on_failure=lambda: calls.__setitem__("failure", calls["failure"] + 1))
+    for seq, (now, _, frame) in enumerate(frames(screens)):
+        clock.now = now
+        result = FrameResult(seq, frame, now)
+        result.main_start_button = detector.detect_start_button(frame)
+        verifier.update(result, now)
+    return verifier, calls
+
+
+def test_verified_when_button_disappears(frames, layout):
+    verifier, calls = run(frames, layout, ["home", "home", "gameplay", "gameplay"])
+    assert calls == {"perform": 1, "success": 1, "failure": 0}
+    assert not verifier.pending("start")
+    assert verifier.stats["start"]["verified"] == 1
+
+
+def test_swallowed_click_is_retried(frames, layout):
+    verifier, calls = run(frames, layout, ["home"] * 7 + ["gameplay"] * 3)
+    assert calls == {"perform": 2, "success": 1, "failure": 0}
+    assert verifier.stats["start"]["retries"] == 1
+
+
+def test_fails_after_retries(frames, layout):
+    verifier, calls = run(frames, layout, ["home"] * 25, retries=2)
+    assert calls == {"perform": 3, "success": 0, "failure": 1}
+    assert verifier.stats["start"]["failed"] == 1
+    assert not verifier.pending("start")
@@ -0,0 +1,18 @@
+from autocalibration import CalibrationCache
+
+
+def test_cache_skipped_when_more_inputs_are_given(tmp_path, layout):
+    path = str(tmp_path / "calibration_cache.json")
+    CalibrationCache(path).put((400, 600), (0, 0), layout, inputs=["reference"])
+
+    cache = CalibrationCache(path)
+    assert cache.get((400, 600), (0, 0)) is not None
+    assert cache.get((400, 600), (0, 0), ["reference"]).start == layout.start
+    assert cache.get((400, 600), (0, 0), ["reference", "levelup"]) is None
+    assert cache.get((800, 600), (0, 0)) is None
+
+
+def test_cached_layout_follows_the_window(tmp_path, layout):
+    cache = CalibrationCache(str(tmp_path / "calibration_cache.json"))
+    cache.put((400, 600), (0, 0), layout)
+    assert cache.get((400, 600), (50, 20)).origin == (layout.origin[0] + 50, layout.origin[1] + 20)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from carousel_handler import CarouselHandler
+from start_button_detector import StartButtonDetector
+
+
+TIMING = {"carousel_gap_min": 0.8, "carousel_gap_max": 1.2}
+
+
+def run(frames, layout, screens, max_clicks=6):
+    """Feed the handler one frame per kind in `screens`. Returns (outcome, clicked boxes)"""
+    np.random.seed(0)
+    start_detector = StartButtonDetector(debug_name="start_button", region=layout.start)
+    carousel_detector = StartButtonDetector(debug_name="carousel_button", region=layout.carousel)
+    clicked = []
+    handler = CarouselHandler(clicked.append, TIMING, max_clicks=max_clicks)
+    handler.start(0.0)
+    for now, kind, frame in frames(screens):
+        outcome = handler.update(carousel_detector.detect_start_button(frame), start_detector.detect_start_button(frame),
+                                 kind == "skill_cards", now)
+        if outcome is not None:
+            return outcome, clicked
+    return None, clicked
+
+
+def test_clicks_until_button_gone(frames, layout):
+    outcome, clicked = run(frames, layout, ["carousel"] * 25 + ["gameplay"] * 5)
+    assert outcome == "button_gone"
+    # One click at the start, then one every 0.8-1.2s while the button shows
+    assert 2 <= len(clicked) <= 3
+    for x, y, w, h in clicked:
+        assert layout.carousel.x <= x and x + w <= layout.carousel.x2
+        assert layout.carousel.y <= y and y + h <= layout.carousel.y2
+
+
+def test_result_screen_ends_carousel(frames, layout):
+    outcome, clicked = run(frames, layout, ["carousel"] * 5 + ["results"] * 5)
+    assert outcome == "result"
+    assert len(clicked) == 1
+
+
+def test_level_up_ends_carousel(frames, layout):
+    outcome, _ = run(frames, layout, ["carousel"] * 5 + ["skill_cards"])
+    assert outcome == "result"
+
+
+def test_gives_up_after_max_clicks(frames, layout):
+    outcome, clicked = run(frames, layout, ["carousel"] * 100, max_clicks=3)
+    assert outcome == "max_clicks"
+    assert len(clicked) == 3
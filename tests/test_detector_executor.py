@@ -0,0 +1,25 @@
+import time
+
+from clock import SystemClock, VirtualClock
+from detector_executor import DetectorExecutor
+
+
+def slow(value, seconds=0.1):
+    time.sleep(seconds)
+    return value
+
+
+def test_late_detector_left_out_on_system_clock():
+    executor = DetectorExecutor(2, SystemClock())
+    results = executor.run({"fast": (slow, (1, 0)), "slow": (slow, (2,))}, deadline=0.02)
+    executor.shutdown()
+    assert results == {"fast": 1}
+    assert executor.deadline_misses == 1
+
+
+def test_virtual_clock_waits_for_every_detector():
+    executor = DetectorExecutor(2, VirtualClock())
+    results = executor.run({"fast": (slow, (1, 0)), "slow": (slow, (2,))}, deadline=0.02)
+    executor.shutdown()
+    assert results == {"fast": 1, "slow": 2}
+    assert executor.deadline_misses == 0
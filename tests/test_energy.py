@@ -0,0 +1,20 @@
+import pytest
+
+from skillSelection import analyze_energy_level
+from synthetic_frames import ENERGY_MAX, SyntheticFrameGenerator
+
+
+@pytest.mark.parametrize("level", [0.0, 0.05, 0.25, 0.5, 0.8, 1.0])
+@pytest.mark.parametrize("kind", ["home", "results"])
+def test_reads_fill_level(generator, layout, kind, level):
+    frame, truth = generator.render(kind, energy=level)
+    assert abs(analyze_energy_level(frame, layout.energy) - truth["energy"]) <= 1 / ENERGY_MAX
+
+
+@pytest.mark.parametrize("scale", [0.5, 0.25])
+def test_reads_fill_level_downscaled(layout, scale):
+    scaled = layout.scaled(scale)
+    generator = SyntheticFrameGenerator(scaled, seed=2, jpeg_quality=80)
+    for level in (0.1, 0.3, 0.7):
+        frame, truth = generator.render("home", energy=level)
+        assert abs(analyze_energy_level(frame, scaled.energy) - truth["energy"]) <= 1 / ENERGY_MAX
@@ -0,0 +1,50 @@
+import json
+import os
+import time
+
+from frame_budget import FrameBudgetMonitor
+from frame_results import FrameResult
+
+
+def busy(seconds):
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+def run_frame(monitor, generator, seq, seconds):
+    frame, _ = generator.render("gameplay")
+    result = FrameResult(seq, frame, time.time())
+    result.game_state = "DETECTING_LEVELUPS"
+    monitor.begin()
+    busy(seconds)
+    monitor.mark("analysis")
+    return monitor.end(result, ["brightness", "start"], {"brightness": 120.0})
+
+
+def test_frames_within_budget_are_not_sampled(generator, tmp_path):
+    monitor = FrameBudgetMonitor(str(tmp_path), budget=0.05, sample_interval=0.001)
+    try:
+        for seq in range(20):
+            assert not run_frame(monitor, generator, seq, 0.005)
+            assert monitor._samples == []
+    finally:
+        monitor.close()
+    assert monitor.slow_frames == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_slow_frame_is_dumped_with_stacks(generator, tmp_path):
+    monitor = FrameBudgetMonitor(str(tmp_path), budget=0.04, sample_interval=0.002)
+    try:
+        assert run_frame(monitor, generator, 7, 0.12)
+    finally:
+        monitor.close()
+    dump = os.path.join(tmp_path, "slow_000000")
+    with open(os.path.join(dump, "info.json"), encoding="utf-8") as f:
+        info = json.load(f)
+    assert info["seq"] == 7
+    assert info["missed_detectors"] == ["start"]
+    assert info["samples"] > 0
+    assert "test_frame_budget:busy" in info["top_stacks"][0][0]
+    assert os.path.exists(os.path.join(dump, "frame.png"))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from levelup_detectors import LEVELUP_METHODS, create_levelup_detector
+
+
+COLORS = ("gold", "blue", "purple")
+
+
+def feed(detector, images):
+    """Events of `detector` for each image, with no Start button on screen"""
+    return [detector.update(detector.features(image), False) for image in images]
+
+
+def images(frames, kind, count, **render_args):
+    return [frame for _, _, frame in frames([kind] * count, **render_args)]
+
+
+@pytest.mark.parametrize("method", LEVELUP_METHODS)
+def test_level_up_starts_and_ends(frames, layout, method):
+    detector = create_levelup_detector(method, layout)
+    gameplay = feed(detector, images(frames, "gameplay", 30))
+    level_up = feed(detector, images(frames, "skill_cards", 20, colors=COLORS))
+    after = feed(detector, images(frames, "gameplay", 20))
+
+    assert "started" not in gameplay
+    assert level_up.count("started") == 1
+    assert "ended" in after
+    assert "started" not in after
+
+
+def test_motion_fires_on_first_level_up_frame(frames, layout):
+    detector = create_levelup_detector("motion", layout)
+    feed(detector, images(frames, "gameplay", 30))
+    assert feed(detector, images(frames, "skill_cards", 1, colors=COLORS)) == ["started"]
+
+
+@pytest.mark.parametrize("method", LEVELUP_METHODS)
+def test_slow_fade_in(generator, frames, layout, method):
+    detector = create_levelup_detector(method, layout)
+    feed(detector, images(frames, "gameplay", 30))
+    fade_frames = 10
+    fading = [generator.render("skill_cards", colors=COLORS, fade=(i + 1) / (fade_frames + 1))[0]
+              for i in range(fade_frames)]
+    events = feed(detector, fading + images(frames, "skill_cards", 15, colors=COLORS))
+    assert events.count("started") == 1
+    if method == "motion":
+        # The gameplay baseline is held while the screen darkens, so the fade doesn't hide the overlay
+        assert events.index("started") <= fade_frames
+
+
+@pytest.mark.parametrize("method", LEVELUP_METHODS)
+def test_level_up_already_showing(frames, layout, method):
+    detector = create_levelup_detector(method, layout)
+    events = feed(detector, images(frames, "skill_cards", 15, colors=COLORS))
+    assert events.count("started") == 1
+
+
+def test_motion_ignores_fade_to_black(frames, layout):
+    detector = create_levelup_detector("motion", layout)
+    feed(detector, images(frames, "gameplay", 30))
+    fading = [(frame * max(0.0, 1 - i / 10)).astype(np.uint8)
+              for i, frame in enumerate(images(frames, "gameplay", 20))]
+    assert "started" not in feed(detector, fading)
@@ -0,0 +1,34 @@
+from stability_gate import StabilityGate
+
+
+COLORS = ("green", "gold", "blue")
+
+
+def test_settles_once_cards_stop_changing(generator, frames, layout):
+    gate = StabilityGate(layout.skill_area, min_wait=0.3)
+    gate.start(0.0)
+    # Cards fading in change from frame to frame
+    for i in range(5):
+        frame, _ = generator.render("skill_cards", colors=COLORS, fade=(i + 1) / 6)
+        assert not gate.update(gate.features(frame), (i + 1) * 0.1)
+    for now, _, frame in frames(["skill_cards"] * 3, colors=COLORS):
+        settled = gate.update(gate.features(frame), 0.5 + now)
+    assert settled
+    assert gate.settled_at == 0.5 + now
+    assert gate.time_saved(1.5, 0.5 + now) > 0
+
+
+def test_waits_for_min_wait(frames, layout):
+    gate = StabilityGate(layout.skill_area, min_wait=0.4)
+    gate.start(0.0)
+    settled = [gate.update(gate.features(frame), now) for now, _, frame in frames(["skill_cards"] * 4, colors=COLORS)]
+    assert settled == [False, False, False, True]
+
+
+def test_changing_cards_restart_the_count(generator, layout):
+    gate = StabilityGate(layout.skill_area, min_wait=0.0)
+    gate.start(0.0)
+    for i, colors in enumerate([COLORS, COLORS, ("purple", "none", "green"), COLORS]):
+        frame, _ = generator.render("skill_cards", colors=colors)
+        assert not gate.update(gate.features(frame), i * 0.1)
+    assert gate.stable_frames == 0
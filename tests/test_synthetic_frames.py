@@ -0,0 +1,7 @@
+from synthetic_frames import measure_stream
+
+
+def test_detectors_read_the_ground_truth(generator):
+    report = measure_stream(generator, 200)
+    assert report["errors"] == {"start": 0, "carousel": 0, "skills": 0, "energy": 0}
+
@@ -0,0 +1,21 @@
+import threshold_tuner
+from synthetic_frames import write_synthetic_session
+
+
+SCRIPT = (("home", 1), ("skill_cards", 1), ("gameplay", 1), ("skill_cards", 1), ("carousel", 1))
+
+
+def test_partial_config_scores_like_the_defaults(generator, layout, tmp_path, monkeypatch):
+    write_synthetic_session(str(tmp_path), generator, SCRIPT)
+    corpus, _, _ = threshold_tuner.load_corpus([str(tmp_path)], layout)
+    monkeypatch.setattr(threshold_tuner, "_corpus", corpus)
+
+    defaults = threshold_tuner.base_candidate()
+    # The README example: only the green range is given
+    partial = threshold_tuner.base_candidate({"skill_colors": {"ranges": {"green": [[35, 40, 40], [85, 255, 255]]}}})
+    assert partial == defaults
+
+    expected = threshold_tuner.evaluate(defaults)
+    scored = threshold_tuner.evaluate(partial)
+    assert scored["skill_colors"]["f1"] == expected["skill_colors"]["f1"] > 0.9
+    assert scored["start_button"]["f1"] == expected["start_button"]["f1"]
@@ -0,0 +1,297 @@
+"""
+Offline threshold tuning over recorded sessions.
+
+Searches the Start button HSV ranges and area limits and the skill card colour
+ranges for the settings that best match the frame labels, and writes the best
+set in the config.json format (see live_config.py):
+
+    python threshold_tuner.py recordings/session1 datasets/run1 --positions positions.json \\
+        --search random --candidates 500 --output tuned_config.json
+
+Ground truth comes from the session labels. The Start button should be found in
+the start region on "home" and "results" frames and nowhere else, and in the
+carousel region on "carousel" frames. Skill colours are only tuned on frames
+whose label line has a "skills" list (e.g. dataset_builder.py output checked by
+hand), one colour or "none" per card.
+
+Every frame is read and its regions converted to HSV exactly once. Each
+candidate then only runs the masks, contours and pixel counts, and candidates
+are spread over a process pool that gets the cached regions once per worker.
+The report gives precision, recall, F1 and the detector cost per frame for
+each candidate. The best candidate is the one with the highest F1. Ties go to
+higher precision, then to the candidate closest to the current settings, so a
+corpus that can't tell candidates apart leaves the settings unchanged.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from replay_capture import LABELS_FILE
+
+
+# Screen labels on which each Start button region must contain a button
+POSITIVE_LABELS = {"start": {"home", "results"}, "carousel": {"carousel"}}
+
+# Grid search axes: shifts of every range's lower S and V bounds, plus the area or fraction threshold
+GRID = {
+    "start_button": {"s_shift": (-10, 0, 10, 20, 30), "v_shift": (-10, 0, 10, 20, 30),
+                     "min_area": (0.5, 0.6, 0.7, 0.8)},
+    "skill_colors": {"s_shift": (-20, 0, 20, 40), "v_shift": (-20, 0, 20, 40),
+                     "min_fraction": (0.03, 0.05, 0.08, 0.12)},
+}
+HSV_LIMITS = (180, 255, 255)
+
+
+def load_corpus(session_dirs, layout):
+    """
+    Read the labelled frames and cache their HSV regions.
+    Returns ({"start": [(hsv, positive)], "carousel": [...], "cards": [(hsv, color)]}, frames, hsv_seconds)
+    """
+    corpus = {"start": [], "carousel": [], "cards": []}
+    frames = 0
+    hsv_seconds = 0.0
+    for session_dir in session_dirs:
+        with open(os.path.join(session_dir, LABELS_FILE), "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        for record in records:
+            frame = cv2.imread(os.path.join(session_dir, record["file"]), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise Exception(f"Could not read frame {record['file']} in {session_dir}")
+            frames += 1
+            label = record.get("label", "gameplay")
+            started = time.perf_counter()
+            for region in ("start", "carousel"):
+                rect = getattr(layout, region)
+                corpus[region].append((cv2.cvtColor(frame[rect.slices], cv2.COLOR_BGR2HSV),
+                                       label in POSITIVE_LABELS[region]))
+            skills = record.get("skills")
+            if skills and len(skills) == len(layout.cards):
+                for card, color in zip(layout.cards, skills):
+                    corpus["cards"].append((cv2.cvtColor(frame[card.slices], cv2.COLOR_BGR2HSV), color))
+            hsv_seconds += time.perf_counter() - started
+    return corpus, frames, hsv_seconds
+
+
+def base_candidate(config=None):
+    """Current settings in the config format: the defaults, overridden by an existing config dict"""
+    from start_button_detector import DEFAULT_HSV_RANGES
+    from skillSelection import SKILL_COLOR_RANGES, SKILL_MIN_FRACTION
+    config = config or {}
+    start = config.get("start_button", {})
+    skill = config.get("skill_colors", {})
+    return {
+        "start_button": {
+            "hsv_ranges": {name: [list(bound) for bound in start.get("hsv_ranges", {}).get(name, value)]
+                           for name, value in DEFAULT_HSV_RANGES.items()},
+            "min_area": start.get("min_area", 0.7),
+            "max_area": start.get("max_area", 0.99),
+        },
+        "skill_colors": {
+            # Merged over the defaults per colour, as live_config.py does
+            "ranges": {name: [list(bound) for bound in value]
+                       for name, value in {**SKILL_COLOR_RANGES, **skill.get("ranges", {})}.items()},
+            "min_fraction": skill.get("min_fraction", SKILL_MIN_FRACTION),
+        },
+    }
+
+
+def _clip_range(lower, upper):
+    lower = [int(min(max(value, 0), limit)) for value, limit in zip(lower, HSV_LIMITS)]
+    upper = [int(min(max(value, 0), limit)) for value, limit in zip(upper, HSV_LIMITS)]
+    return [lower, [max(low, high) for low, high in zip(lower, upper)]]
+
+
+def _shift_ranges(ranges, s_shift, v_shift):
+    return {name: _clip_range([lower[0], lower[1] + s_shift, lower[2] + v_shift], upper)
+            for name, (lower, upper) in ranges.items()}
+
+
+def grid_candidates(base):
+    """The base settings plus every GRID combination; the two sections are paired up index by index"""
+    start_grid = GRID["start_button"]
+    start = [dict(base["start_button"], min_area=min_area,
+                  hsv_ranges=_shift_ranges(base["start_button"]["hsv_ranges"], s_shift, v_shift))
+             for s_shift, v_shift, min_area in itertools.product(*start_grid.values())]
+    skill_grid = GRID["skill_colors"]
+    skill = [dict(base["skill_colors"], min_fraction=min_fraction,
+                  ranges=_shift_ranges(base["skill_colors"]["ranges"], s_shift, v_shift))
+             for s_shift, v_shift, min_fraction in itertools.product(*skill_grid.values())]
+    candidates = [base]
+    for i in range(max(len(start), len(skill))):
+        candidates.append({"start_button": start[i] if i < len(start) else base["start_button"],
+                           "skill_colors": skill[i] if i < len(skill) else base["skill_colors"]})
+    return candidates
+
+
+def random_candidates(base, count, spread=20, seed=0):
+    """The base settings plus `count` random perturbations of every bound by up to `spread` (hue by half)"""
+    rng = np.random.default_rng(seed)
+
+    def perturb(ranges):
+        steps = (spread // 2, spread, spread)
+        return {name: _clip_range([value + rng.integers(-step, step + 1) for value, step in zip(lower, steps)],
+                                  [value + rng.integers(-step, step + 1) for value, step in zip(upper, steps)])
+                for name, (lower, upper) in ranges.items()}
+
+    candidates = [base]
+    for _ in range(count):
+        min_area = float(np.clip(base["start_button"]["min_area"] + rng.uniform(-0.15, 0.15), 0.3, 0.95))
+        max_area = float(np.clip(base["start_button"]["max_area"] + rng.uniform(-0.05, 0.01), min_area + 0.05, 1.0))
+        min_fraction = float(np.clip(base["skill_colors"]["min_fraction"] * rng.uniform(0.5, 2.0), 0.01, 0.3))
+        candidates.append({
+            "start_button": {"hsv_ranges": perturb(base["start_button"]["hsv_ranges"]),
+                             "min_area": round(min_area, 3), "max_area": round(max_area, 3)},
+            "skill_colors": {"ranges": perturb(base["skill_colors"]["ranges"]),
+                             "min_fraction": round(min_fraction, 4)},
+        })
+    return candidates
+
+
+def scores(tp, fp, fn):
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"tp": tp, "fp": fp, "fn": fn, "precision": precision, "recall": recall, "f1": f1}
+
+
+_corpus = None
+
+
+def _init_worker(corpus):
+    global _corpus
+    cv2.setNumThreads(1)  # One candidate per process; OpenCV's own threads would only contend
+    _corpus = corpus
+
+
+def evaluate(candidate):
+    """Score one candidate on the cached corpus. Runs in a pool worker"""
+    from start_button_detector import StartButtonDetector
+    from skillSelection import classify_hsv_color
+
+    start = candidate["start_button"]
+    detector = StartButtonDetector(hsv_ranges=start["hsv_ranges"],
+                                   min_button_area=start["min_area"], max_button_area=start["max_area"])
+    tp = fp = fn = 0
+    started = time.perf_counter()
+    for region in ("start", "carousel"):
+        for hsv, positive in _corpus[region]:
+            found = detector.detect_in_hsv(hsv) is not None
+            tp += found and positive
+            fp += found and not positive
+            fn += positive and not found
+    start_seconds = time.perf_counter() - started
+    frames = max(1, len(_corpus["start"]))
+    result = {"start_button": dict(scores(tp, fp, fn), ms_per_frame=start_seconds * 1000 / frames)}
+
+    if _corpus["cards"]:
+        skill = candidate["skill_colors"]
+        ranges = {name: (np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+                  for name, (lower, upper) in skill["ranges"].items()}
+        tp = fp = fn = 0
+        started = time.perf_counter()
+        for hsv, truth in _corpus["cards"]:
+            color, _ = classify_hsv_color(hsv, ranges, skill["min_fraction"])
+            if color != "none" and color == truth:
+                tp += 1
+                continue
+            fp += color != "none"
+            fn += truth != "none"
+        cards_seconds = time.perf_counter() - started
+        # Three cards per level-up frame
+        result["skill_colors"] = dict(scores(tp, fp, fn), ms_per_frame=cards_seconds * 1000 * 3 / len(_corpus["cards"]))
+    return result
+
+
+def distance(settings, base):
+    """How far one section's settings moved from the base: summed bound changes, thresholds in percent"""
+    total = 0.0
+    for key, value in settings.items():
+        if isinstance(value, dict):
+            total += sum(np.abs(np.array(bounds) - np.array(base[key][name])).sum() for name, bounds in value.items())
+        else:
+            total += abs(value - base[key]) * 100
+    return float(total)
+
+
+def tune(corpus, candidates, workers=None):
+    """Evaluate every candidate on a process pool. Returns one result dict per candidate, in order"""
+    chunksize = max(1, len(candidates) // ((workers or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(corpus,)) as pool:
+        return list(pool.map(evaluate, candidates, chunksize=chunksize))
+
+
+def main():
+    from layout import load_layout
+    from live_config import compile_config
+
+    parser = argparse.ArgumentParser(description="Tune detector thresholds on labelled recordings")
+    parser.add_argument("sessions", nargs="+", help="Recorded session or dataset directories")
+    parser.add_argument("--positions", default="positions.json", help="Calibration file matching the recordings")
+    parser.add_argument("--config", default=None, help="Start the search from this config instead of the defaults")
+    parser.add_argument("--search", choices=["random", "grid"], default="random")
+    parser.add_argument("--candidates", type=int, default=300, help="Random candidates to evaluate")
+    parser.add_argument("--spread", type=int, default=20, help="Largest random change of an S/V bound (hue: half)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--output", default="tuned_config.json", help="Best settings in the config.json format")
+    parser.add_argument("--report", default="tuner_report.json", help="Scores of every candidate")
+    args = parser.parse_args()
+
+    layout = load_layout(args.positions)
+    config = None
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    base = base_candidate(config)
+
+    started = time.perf_counter()
+    corpus, frames, hsv_seconds = load_corpus(args.sessions, layout)
+    print(f"Loaded {frames} frames ({len(corpus['cards'])} labelled skill cards) in {time.perf_counter() - started:.1f}s; "
+          f"HSV conversion cached: {hsv_seconds * 1000 / max(1, frames):.2f}ms/frame")
+
+    candidates = grid_candidates(base) if args.search == "grid" else \
+        random_candidates(base, args.candidates, args.spread, args.seed)
+    started = time.perf_counter()
+    results = tune(corpus, candidates, args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"Evaluated {len(candidates)} candidates in {elapsed:.1f}s")
+
+    best = {}
+    print("\n=== Threshold tuning ===")
+    for section in ("start_button", "skill_colors"):
+        ranked = sorted(range(len(candidates)),
+                        key=lambda i: (-results[i][section]["f1"], -results[i][section]["precision"],
+                                       distance(candidates[i][section], base[section]))) \
+            if section in results[0] else []
+        if not ranked:
+            print(f"{section}: no labelled frames, keeping the current settings")
+            continue
+        best[section] = candidates[ranked[0]][section]
+        current = results[0][section]
+        print(f"{section}: current precision={current['precision']:.3f} recall={current['recall']:.3f} "
+              f"f1={current['f1']:.3f} {current['ms_per_frame']:.3f}ms/frame")
+        for rank, i in enumerate(ranked[:5], 1):
+            entry = results[i][section]
+            print(f"  #{rank} candidate {i}: precision={entry['precision']:.3f} recall={entry['recall']:.3f} "
+                  f"f1={entry['f1']:.3f} (fp={entry['fp']}, fn={entry['fn']}) {entry['ms_per_frame']:.3f}ms/frame")
+
+    # Validate against the live config loader before writing
+    compile_config(best, layout)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(best, f, indent=4)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "frames": frames, "search": args.search, "seconds": elapsed,
+                   "candidates": [{"settings": candidate, "scores": result}
+                                  for candidate, result in zip(candidates, results)]}, f, indent=4)
+    print(f"Best settings written to {args.output}, all scores to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
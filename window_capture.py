@@ -1,23 +1,38 @@
 import cv2
 import numpy as np
-import mss
-import pygetwindow as gw
 import time
-from threading import Thread, Lock
+from threading import Event, Lock
 import queue
+from clock import SYSTEM_CLOCK
+import metrics
+from async_logging import get_logger, ensure_logging
+
+
+log = get_logger("capture")
 
 
 class BlueStacksCapture:
-    def __init__(self):
+    def __init__(self, clock=None, grabber=None):
+        """
+        `grabber` is an object with mss's grab(monitor) method returning BGRA pixels. By default
+        a fresh mss instance is opened per frame; pass a stand-in to benchmark or test capture_frame
+        """
+        ensure_logging()
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.grabber = grabber
         self.window = None
         self.capture_running = False
+        self.capture_stop = None  # Stop event owned by the current capture thread
         self.latest_frame = None
+        self.frame_seq = 0  # Incremented for every captured frame
         self.frame_lock = Lock()
         self.frame_queue = queue.Queue(maxsize=30)  # Buffer for frames
         self.roi_coordinates = None
         
     def find_bluestacks_window(self):
         """Find and connect to BlueStacks window"""
+        import pygetwindow as gw
+        
         windows = gw.getWindowsWithTitle("BlueStacks")
         if not windows:
             # Try alternative BlueStacks window titles
@@ -31,9 +46,9 @@ class BlueStacksCapture:
             raise Exception("BlueStacks window not found. Make sure BlueStacks is running.")
         
         self.window = windows[0]
-        print(f"Found BlueStacks window: {self.window.title}")
-        print(f"Window position: ({self.window.left}, {self.window.top})")
-        print(f"Window size: {self.window.width} x {self.window.height}")
+        log.info("Found BlueStacks window: %s", self.window.title)
+        log.info("Window position: (%d, %d)", self.window.left, self.window.top)
+        log.info("Window size: %d x %d", self.window.width, self.window.height)
         return self.window
     
     def set_roi(self, top_left, bottom_right):
@@ -60,37 +75,44 @@ class BlueStacksCapture:
             "height": rel_y2 - rel_y1
         }
         
-        print(f"ROI set: {self.roi_coordinates}")
+        log.info("ROI set: %s", self.roi_coordinates)
     
+    @metrics.timed("capture_frame")
     def capture_frame(self):
         """Capture a single frame from the BlueStacks window or ROI"""
         if not self.window:
             return None
         
+        if self.roi_coordinates:
+            # Capture ROI only
+            monitor = self.roi_coordinates
+        else:
+            # Capture entire window
+            monitor = {
+                "left": self.window.left,
+                "top": self.window.top,
+                "width": self.window.width,
+                "height": self.window.height
+            }
+        
+        if self.grabber is not None:
+            return self._grab(self.grabber, monitor)
+        import mss
         with mss.mss() as sct:
-            if self.roi_coordinates:
-                # Capture ROI only
-                monitor = self.roi_coordinates
-            else:
-                # Capture entire window
-                monitor = {
-                    "left": self.window.left,
-                    "top": self.window.top,
-                    "width": self.window.width,
-                    "height": self.window.height
-                }
-            
-            try:
-                # Capture screenshot
-                screenshot = sct.grab(monitor)
-                # Convert to numpy array
-                frame = np.array(screenshot)
-                # Convert BGRA to BGR (remove alpha channel)
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-                return frame
-            except Exception as e:
-                print(f"Error capturing frame: {e}")
-                return None
+            return self._grab(sct, monitor)
+    
+    def _grab(self, sct, monitor):
+        try:
+            # Capture screenshot
+            screenshot = sct.grab(monitor)
+            # Convert to numpy array
+            frame = np.array(screenshot)
+            # Convert BGRA to BGR (remove alpha channel)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            return frame
+        except Exception as e:
+            log.error("Error capturing frame: %s", e)
+            return None
     
     def start_capture_thread(self, fps=30):
         """Start continuous capture in a separate thread"""
@@ -98,38 +120,43 @@ class BlueStacksCapture:
             return
         
         self.capture_running = True
-        self.capture_thread = Thread(target=self._capture_loop, args=(fps,))
-        self.capture_thread.daemon = True
-        self.capture_thread.start()
-        print(f"Started capture thread at {fps} FPS")
+        # Each thread gets its own stop event, so a thread abandoned by restart_capture
+        # exits on its own and never writes frames after its replacement starts
+        self.capture_stop = Event()
+        self.capture_thread = self.clock.start_thread(self._capture_loop, args=(fps, self.capture_stop))
+        log.info("Started capture thread at %s FPS", fps)
     
-    def _capture_loop(self, fps):
-        """Internal capture loop for threading"""
+    def _capture_loop(self, fps, stop):
+        """Internal capture loop for threading; runs until `stop` is set"""
         frame_time = 1.0 / fps
         
-        while self.capture_running:
-            start_time = time.time()
+        while not stop.is_set():
+            start_time = self.clock.time()
             
             frame = self.capture_frame()
             if frame is not None:
                 with self.frame_lock:
+                    # A grab that returns after the thread was stopped is discarded
+                    if stop.is_set():
+                        break
                     self.latest_frame = frame.copy()
-                
-                # Add to queue (non-blocking)
-                try:
-                    self.frame_queue.put_nowait(frame)
-                except queue.Full:
-                    # Remove oldest frame and add new one
+                    self.frame_seq += 1
+                    
+                    # Add to queue (non-blocking)
                     try:
-                        self.frame_queue.get_nowait()
                         self.frame_queue.put_nowait(frame)
-                    except queue.Empty:
-                        pass
+                    except queue.Full:
+                        # Remove oldest frame and add new one
+                        try:
+                            self.frame_queue.get_nowait()
+                            self.frame_queue.put_nowait(frame)
+                        except queue.Empty:
+                            pass
             
             # Maintain target FPS
-            elapsed = time.time() - start_time
+            elapsed = self.clock.time() - start_time
             sleep_time = max(0, frame_time - elapsed)
-            time.sleep(sleep_time)
+            self.clock.sleep(sleep_time)
     
     def get_latest_frame(self):
         """Get the most recent captured frame"""
@@ -138,6 +165,13 @@ class BlueStacksCapture:
                 return self.latest_frame.copy()
         return None
     
+    def get_latest_frame_with_seq(self):
+        """Get the most recent captured frame together with its sequence number"""
+        with self.frame_lock:
+            if self.latest_frame is not None:
+                return self.latest_frame.copy(), self.frame_seq
+        return None, self.frame_seq
+    
     def get_frame_from_queue(self):
         """Get frame from queue (blocking)"""
         try:
@@ -147,18 +181,40 @@ class BlueStacksCapture:
     
     def stop_capture(self):
         """Stop the capture thread"""
-        self.capture_running = False
+        self._signal_stop()
         if hasattr(self, 'capture_thread'):
-            self.capture_thread.join()
-        print("Capture stopped")
+            self.clock.join(self.capture_thread)
+        log.info("Capture stopped")
+    
+    def restart_capture(self, fps=30, top_left=None, bottom_right=None):
+        """
+        Reconnect to the window and start a new capture thread after a capture stall.
+        The ROI, if given, is applied before the new thread grabs its first frame
+        """
+        self._signal_stop()
+        if hasattr(self, 'capture_thread'):
+            # A thread stuck inside a grab is abandoned rather than waited for; its
+            # stop event keeps it from publishing frames once the grab returns
+            self.clock.join(self.capture_thread, timeout=2.0)
+        self.find_bluestacks_window()
+        if top_left is not None and bottom_right is not None:
+            self.set_roi(top_left, bottom_right)
+        self.start_capture_thread(fps)
+        log.info("Capture restarted")
+    
+    def _signal_stop(self):
+        self.capture_running = False
+        if self.capture_stop is not None:
+            with self.frame_lock:
+                self.capture_stop.set()
     
     def stream_display(self, window_name="BlueStacks Stream", scale_factor=1.0):
         """Display captured frames in real-time"""
         if not self.capture_running:
-            print("Capture not running. Start capture first.")
+            log.warning("Capture not running. Start capture first.")
             return
         
-        print(f"Starting stream display. Press 'q' to stop.")
+        log.info("Starting stream display. Press 'q' to stop.")
         
         while self.capture_running:
             frame = self.get_latest_frame()
@@ -184,7 +240,7 @@ class BlueStacksCapture:
                 time.sleep(0.01)
         
         cv2.destroyAllWindows()
-        print("Stream display stopped")
+        log.info("Stream display stopped")
     
     def _calculate_fps(self):
         """Calculate approximate FPS based on queue size"""
@@ -195,12 +251,14 @@ class BlueStacksCapture:
         frame = self.get_latest_frame()
         if frame is not None:
             if filename is None:
-                timestamp = int(time.time())
+                timestamp = int(self.clock.time())
                 filename = f"bluestacks_capture_{timestamp}.png"
             
-            # cv2.imwrite(filename, frame)
-            print(f"Frame saved as {filename}")
+            if not cv2.imwrite(filename, frame):
+                log.warning("Could not write %s", filename)
+                return None
+            log.info("Frame saved as %s", filename)
             return filename
         else:
-            print("No frame available to save")
+            log.warning("No frame available to save")
             return None
\ No newline at end of file